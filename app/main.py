@@ -1,12 +1,103 @@
+import time
+
+# Startup timing starts before the app's own (and its dependencies') imports
+_import_start = time.perf_counter()
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import dl_models, ml_models
+from fastapi.responses import JSONResponse
+from app.models.model_loader import (
+    ENABLED_MODELS,
+    get_backend_import_times,
+    get_model_status,
+    is_model_loaded,
+    is_ready,
+    preload_models
+)
+from app.services.execution import get_execution_stats, run_io, shutdown_execution_pools
+from app.services.inference_scheduler import MAX_BATCH_SIZE, close_inference_schedulers
+from app.services.kepid_catalog import get_kepid_catalog
+from app.services.koi_catalog import get_koi_catalog
+from app.services.lightcurve_preprocessor import get_lightcurve_preprocessor
+from app.services.lightcurve_store import get_lightcurve_store
+from app.services.model_host import (
+    close_model_host_client,
+    connect_model_host,
+    get_model_host_stats,
+    get_model_host_status,
+    uses_model_host
+)
+from app.services.prediction_cache import get_prediction_cache
+from app.services.url_service import load_dv_paths
 import os
 
+# Routers are included only for the model families this worker loads (EXCHRON_MODELS)
+DL_ROUTER_ENABLED = any(m in ENABLED_MODELS for m in ("cnn", "dnn"))
+ML_ROUTER_ENABLED = any(m in ENABLED_MODELS for m in ("gb", "svm"))
+if DL_ROUTER_ENABLED:
+    from app.routers import dl_models
+if ML_ROUTER_ENABLED:
+    from app.routers import ml_models
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+# Seconds from the start of the app's imports until every model was loaded and warm
+_startup = {"import_seconds": IMPORT_SECONDS, "ready_seconds": None}
+
+def _preload(model_types: list):
+    preload_models(model_types, _warmup_batch_sizes())
+    _startup["ready_seconds"] = time.perf_counter() - _import_start
+
+def _warmup_batch_sizes() -> list:
+    """Batch sizes the serving functions will see (powers of two up to the batch limit)"""
+    sizes = [1]
+    while sizes[-1] < MAX_BATCH_SIZE:
+        sizes.append(sizes[-1] * 2)
+    return sizes
+
+def _load_catalogs():
+    """Build the in-memory data indexes so the first request does not pay for parsing"""
+    try:
+        get_koi_catalog()
+    except Exception as e:
+        print(f"Warning: Could not load KOI catalog: {e}")
+    try:
+        get_kepid_catalog()
+    except Exception as e:
+        print(f"Warning: Could not build Kepler ID catalog: {e}")
+    try:
+        load_dv_paths()
+    except Exception as e:
+        print(f"Warning: Could not load DV report links: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up models in the background; /health/ready reports 503 until done
+    # Models served by the model host are not loaded in this worker
+    local_models = [m for m in ENABLED_MODELS if not uses_model_host(m)]
+    preload_task = asyncio.create_task(asyncio.to_thread(_preload, local_models))
+    catalog_task = asyncio.create_task(asyncio.to_thread(_load_catalogs))
+    tasks = [preload_task, catalog_task]
+    model_host_stop = threading.Event()
+    if len(local_models) < len(ENABLED_MODELS):
+        tasks.append(asyncio.create_task(asyncio.to_thread(connect_model_host, model_host_stop)))
+    yield
+    model_host_stop.set()
+    pending = [task for task in tasks if not task.done()]
+    if pending:
+        await asyncio.wait(pending)
+    # Stop batching tasks before tearing down the pools they submit to
+    await close_inference_schedulers()
+    shutdown_execution_pools(wait=False)
+    close_model_host_client()
+
 app = FastAPI(
     title="Exoplanet Classification API",
     description="API for exoplanet classification using various ML models with real Kepler data",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS to allow requests from your Next.js frontend
@@ -19,8 +110,10 @@ app.add_middleware(
 )
 
 # Include routers  
-app.include_router(dl_models.router, prefix="/api/dl", tags=["Deep Learning Models"])
-app.include_router(ml_models.router, prefix="/api/ml", tags=["Machine Learning Models"])
+if DL_ROUTER_ENABLED:
+    app.include_router(dl_models.router, prefix="/api/dl", tags=["Deep Learning Models"])
+if ML_ROUTER_ENABLED:
+    app.include_router(ml_models.router, prefix="/api/ml", tags=["Machine Learning Models"])
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -38,26 +131,58 @@ async def read_root():
             "dl_predict": "/api/dl/predict",
             "ml_predict": "/api/ml/predict", 
             "available_ids": "/api/dl/available-ids",
+            "archive_links": "/api/dl/archive-links",
             "docs": "/docs"
         }
     }
 
 @app.get("/health", tags=["Health"])
 async def health_check():
-    # Check if model files exist
-    cnn_exists = os.path.exists("models/cnn/exchron-cnn.keras")
-    dnn_exists = os.path.exists("models/dnn/exchron-dnn.keras")
-    data_exists = os.path.exists("data/lightkurve_data")
+    data_exists = os.path.exists("data/lightkurve_data") or get_lightcurve_store() is not None
     
     return {
         "status": "healthy",
         "models": {
-            "cnn_loaded": cnn_exists,
-            "dnn_loaded": dnn_exists,
+            "cnn_loaded": is_model_loaded("cnn"),
+            "dnn_loaded": is_model_loaded("dnn"),
             "data_available": data_exists
         }
     }
 
+@app.get("/health/live", tags=["Health"])
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Health"])
+async def readiness_check():
+    """Readiness probe: every configured model is loaded and warmed up"""
+    model_host = get_model_host_status()
+    ready = is_ready() and (model_host is None or model_host["connected"])
+    content = {
+        "status": "ready" if ready else "not_ready",
+        "models": get_model_status(),
+        "startup": _startup_report()
+    }
+    if model_host is not None:
+        content["model_host"] = model_host
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+def _startup_report() -> dict:
+    return dict(_startup, models=ENABLED_MODELS, backend_import_seconds=get_backend_import_times())
+
+@app.get("/stats", tags=["Health"])
+async def runtime_stats():
+    """Cache hit rates and execution pool load for this worker"""
+    prediction_cache = get_prediction_cache()
+    return {
+        "prediction_cache": await run_io(prediction_cache.stats) if prediction_cache is not None else None,
+        "preprocessing_cache": get_lightcurve_preprocessor().stats(),
+        "execution": get_execution_stats(),
+        "model_host": await run_io(get_model_host_stats),
+        "startup": _startup_report()
+    }
+
 @app.get("/models", tags=["Models"])
 async def list_models():
     return {
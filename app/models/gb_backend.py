@@ -0,0 +1,257 @@
+"""
+Compiled array-based predictor for the gradient-boosting KOI models.
+
+``compile`` flattens a fitted ``GradientBoostingClassifier`` into node arrays
+(feature, threshold, leaf value), each tree padded to a complete binary tree
+in heap order, and writes them to an ``.npz``. ``CompiledGradientBoosting``
+then predicts a whole batch with a fixed number of NumPy steps: every sample
+descends every tree at once, one tree level per step, and the leaf values
+are summed tree by tree.
+
+Results are bit-identical to scikit-learn's ``predict_proba``:
+
+- inputs are cast to float32 and compared against the float64 thresholds, as
+  scikit-learn's tree traversal does
+- leaf values are pre-multiplied by the learning rate (the same float64
+  product ``predict_stages`` computes) and added to the init estimator's raw
+  prediction sequentially, in stage order, with a cumulative sum
+- the raw prediction goes through the loss's inverse link with the same
+  libm ``exp`` scipy's ``expit`` uses
+
+Loading and predicting does not import scikit-learn; compiling does.
+
+    python -m app.models.gb_backend compile [--models gb svm]
+
+Use ``python -m scripts.check_parity gb`` to compare against scikit-learn on
+``KOI-Playground-Test-Data.csv``.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.model_bundle import file_sha256
+
+MODEL_DIR = "models"
+ESTIMATOR_PATHS = {
+    "gb": os.path.join(MODEL_DIR, "gb", "exchron-gb.joblib"),
+    "svm": os.path.join(MODEL_DIR, "svm", "exchron-svm.joblib")
+}
+
+COMPILED_FORMAT_VERSION = 1
+
+
+def compiled_model_path(model_type: str) -> str:
+    """Path of a compiled model, e.g. models/gb/exchron-gb.compiled.npz"""
+    return os.path.join(MODEL_DIR, model_type, f"exchron-{model_type}.compiled.npz")
+
+
+def is_gradient_boosting(estimator: Any) -> bool:
+    return type(estimator).__name__ == "GradientBoostingClassifier"
+
+
+def _heap_layout(tree: Any, depth: int) -> Dict[str, np.ndarray]:
+    """
+    Lay one fitted tree out as a complete binary tree of the given depth.
+
+    Node ``i``'s children are ``2i + 1`` (left) and ``2i + 2`` (right). A leaf
+    above the last level becomes a chain of always-left nodes (threshold
+    +inf) ending on the last level, which holds the leaf values.
+    """
+    n_nodes = 2 ** (depth + 1) - 1
+    first_leaf = 2 ** depth - 1
+    feature = np.zeros(n_nodes, dtype=np.int64)
+    threshold = np.full(n_nodes, np.inf, dtype=np.float64)
+    value = np.zeros(2 ** depth, dtype=np.float64)
+
+    stack = [(0, 0)]
+    while stack:
+        node, position = stack.pop()
+        if tree.children_left[node] != -1:
+            feature[position] = tree.feature[node]
+            threshold[position] = tree.threshold[node]
+            stack.append((tree.children_left[node], 2 * position + 1))
+            stack.append((tree.children_right[node], 2 * position + 2))
+            continue
+        while position < first_leaf:
+            position = 2 * position + 1
+        value[position - first_leaf] = tree.value[node, 0, 0]
+    return {"feature": feature, "threshold": threshold, "value": value}
+
+
+def compile_gradient_boosting(estimator: Any) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted binary log-loss ``GradientBoostingClassifier`` into node arrays.
+
+    Every tree is padded to a complete binary tree of the ensemble's
+    ``max_depth`` (see ``_heap_layout``), so child positions are computed
+    rather than looked up and every sample reaches the last level after
+    exactly ``max_depth`` steps. Returns ``(n_trees, n_nodes)`` feature and
+    threshold arrays and ``(n_trees, 2 ** max_depth)`` leaf values.
+    """
+    if not is_gradient_boosting(estimator):
+        raise ValueError(f"Expected a GradientBoostingClassifier, got {type(estimator).__name__}")
+    if estimator.estimators_.shape[1] != 1 or estimator.loss != "log_loss":
+        raise ValueError("Only binary log-loss gradient boosting is supported")
+
+    n_features = estimator.n_features_in_
+    # The init estimator's raw prediction does not depend on the input
+    baseline = estimator._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0, 0]
+
+    trees = [stage[0].tree_ for stage in estimator.estimators_]
+    max_depth = int(max(tree.max_depth for tree in trees))
+    layouts = [_heap_layout(tree, max_depth) for tree in trees]
+
+    metadata = {
+        "format_version": COMPILED_FORMAT_VERSION,
+        "estimator": type(estimator).__name__,
+        "n_features": n_features,
+        "n_trees": len(trees),
+        "n_nodes": int(sum(tree.node_count for tree in trees)),
+        "max_depth": max_depth,
+        "classes": estimator.classes_.tolist(),
+        "feature_names": [str(name) for name in getattr(estimator, "feature_names_in_", [])]
+    }
+    return {
+        "__metadata__": np.array(json.dumps(metadata)),
+        "baseline": np.array(baseline, dtype=np.float64),
+        "feature": np.stack([layout["feature"] for layout in layouts]),
+        "threshold": np.stack([layout["threshold"] for layout in layouts]),
+        # predict_stages adds learning_rate * value; the product is the same computed here
+        "value": estimator.learning_rate * np.stack([layout["value"] for layout in layouts])
+    }
+
+
+def save_compiled_model(arrays: Dict[str, np.ndarray], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _expit(raw: np.ndarray) -> np.ndarray:
+    """scipy.special.expit through libm's exp, elementwise; NumPy's vectorized exp can differ in the last bit."""
+    return np.array([1.0 / (1.0 + math.exp(-x)) for x in raw.tolist()], dtype=np.float64)
+
+
+class CompiledGradientBoosting:
+    """
+    Array-based gradient-boosting classifier.
+
+    Supports ``predict_proba``, ``predict``, ``classes_`` and
+    ``n_features_in_`` like the scikit-learn estimator it was compiled from.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with np.load(path, allow_pickle=False) as data:
+            self.metadata = json.loads(str(data["__metadata__"]))
+            self.source_sha256 = str(data["__source_sha256__"])
+            self.baseline = float(data["baseline"])
+            feature = data["feature"]
+            threshold = data["threshold"]
+            value = data["value"]
+        if self.metadata.get("format_version") != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported format, recompile it")
+        self.classes_ = np.array(self.metadata["classes"])
+        self.n_features_in_ = self.metadata["n_features"]
+        self.max_depth = self.metadata["max_depth"]
+        self.n_trees = self.metadata["n_trees"]
+
+        # Flat arrays; tree t's nodes start at t * nodes_per_tree, its leaves at t * 2 ** max_depth
+        nodes_per_tree = feature.shape[1]
+        self._feature = feature.ravel()
+        self._threshold = threshold.ravel()
+        self._value = value.ravel()
+        self._node_offsets = np.arange(self.n_trees, dtype=np.int64) * nodes_per_tree
+        self._leaf_offsets = np.arange(self.n_trees, dtype=np.int64) * value.shape[1] - (2 ** self.max_depth - 1)
+
+    def _validate(self, X) -> np.ndarray:
+        # float32, as scikit-learn's tree traversal sees the input
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, but the model expects (n_samples, {self.n_features_in_})")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        return X
+
+    def decision_function(self, X) -> np.ndarray:
+        """Raw (log-odds) predictions."""
+        X = self._validate(X)
+        n_samples = len(X)
+        # Row offsets into the flattened input, so one gather reads each sample's split feature
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.int64) * self.n_features_in_)[:, None]
+
+        # Every sample descends every tree, one level per step; position is the heap index within the tree
+        position = np.zeros((n_samples, self.n_trees), dtype=np.int64)
+        for _ in range(self.max_depth):
+            nodes = self._node_offsets + position
+            go_right = flat_X[row_offsets + self._feature[nodes]] > self._threshold[nodes]
+            position = 2 * position + 1 + go_right
+
+        # Stage-ordered sum starting from the baseline (cumsum adds strictly left to right)
+        terms = np.empty((n_samples, self.n_trees + 1), dtype=np.float64)
+        terms[:, 0] = self.baseline
+        terms[:, 1:] = self._value[self._leaf_offsets + position]
+        return np.cumsum(terms, axis=1)[:, -1]
+
+    def predict_proba(self, X) -> np.ndarray:
+        candidate = _expit(self.decision_function(X))
+        return np.column_stack([1 - candidate, candidate])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(np.int64)]
+
+
+def load_compiled_model(model_type: str) -> CompiledGradientBoosting:
+    path = compiled_model_path(model_type)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Compiled model not found at {path} (run python -m app.models.gb_backend compile --models {model_type})"
+        )
+    model = CompiledGradientBoosting(path)
+    estimator_path = ESTIMATOR_PATHS[model_type]
+    if os.path.exists(estimator_path) and file_sha256(estimator_path) != model.source_sha256:
+        raise ValueError(f"{path} is stale: {estimator_path} changed since it was compiled")
+    return model
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile the gradient-boosting models to node arrays")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser("compile", help="Write the flattened trees of each GB estimator to .npz")
+    compile_parser.add_argument("--models", nargs="+", choices=list(ESTIMATOR_PATHS), default=list(ESTIMATOR_PATHS))
+
+    args = parser.parse_args(argv)
+    if args.command == "compile":
+        import joblib
+
+        for model_type in args.models:
+            estimator_path = ESTIMATOR_PATHS[model_type]
+            if not os.path.exists(estimator_path):
+                print(f"{model_type}: skipped, {estimator_path} not found")
+                continue
+            estimator = joblib.load(estimator_path)
+            if not is_gradient_boosting(estimator):
+                print(f"{model_type}: skipped, {estimator_path} is a {type(estimator).__name__}, not gradient boosting")
+                continue
+            start = time.perf_counter()
+            arrays = compile_gradient_boosting(estimator)
+            arrays["__source_sha256__"] = np.array(file_sha256(estimator_path))
+            path = compiled_model_path(model_type)
+            save_compiled_model(arrays, path)
+            print(
+                f"{model_type}: wrote {path} ({len(arrays['value'])} trees of depth {arrays['value'].shape[1].bit_length() - 1}) "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Versioned bundles of the scikit-learn KOI models.
+
+A bundle groups a model's estimator with the artifacts shipped next to it
+(feature scaler, target encoder, training metadata) into one file. The
+scaler is applied as a fused step inside ``predict_proba``/``predict``, so
+callers pass raw KOI features exactly as they do to a bare estimator.
+
+Bundles are written uncompressed with ``joblib.dump`` and loaded with
+``mmap_mode="c"``: NumPy arrays in the bundle (support vectors, dual
+coefficients, scaler statistics) are then copy-on-write memory maps of the
+file, so every worker process on a node shares the same physical pages.
+(libsvm rejects read-only buffers but never writes to them, so the pages are
+never actually copied.) Objects that copy their arrays on unpickling, such
+as the node arrays of scikit-learn's ``Tree``, still get a private copy per
+worker.
+
+A bundle records the SHA-256 of the estimator file it was built from and is
+ignored once that file changes. Build bundles with:
+
+    python -m app.models.model_bundle build [--models gb svm]
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MODEL_DIR = "models"
+BUNDLE_MODEL_TYPES = ["gb", "svm"]
+ESTIMATOR_PATHS = {
+    "gb": os.path.join(MODEL_DIR, "gb", "exchron-gb.joblib"),
+    "svm": os.path.join(MODEL_DIR, "svm", "exchron-svm.joblib")
+}
+BUNDLE_PATHS = {
+    model_type: os.path.join(MODEL_DIR, model_type, f"exchron-{model_type}.bundle.joblib")
+    for model_type in BUNDLE_MODEL_TYPES
+}
+# Load bundles when present and current (set EXCHRON_USE_MODEL_BUNDLES=0 to load bare estimators)
+USE_MODEL_BUNDLES = os.getenv("EXCHRON_USE_MODEL_BUNDLES", "1") != "0"
+
+BUNDLE_FORMAT_VERSION = 1
+
+# Companion artifacts, newest first when several training runs are present
+SCALER_PATTERNS = ["koi_scaler_*.joblib", "scaler.joblib"]
+ENCODER_PATTERNS = ["koi_target_encoder_*.joblib", "label_encoder.joblib"]
+METADATA_PATTERNS = ["koi_model_metadata_*.joblib"]
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _find_artifact(model_dir: str, patterns: List[str]) -> Optional[str]:
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.join(model_dir, pattern)), reverse=True)
+        if matches:
+            return matches[0]
+    return None
+
+
+def _is_svm(estimator: Any) -> bool:
+    return type(estimator).__module__.startswith("sklearn.svm")
+
+
+class ModelBundle:
+    """
+    Estimator plus its scaler, target encoder and metadata.
+
+    Behaves like the wrapped estimator for ``predict_proba``, ``predict``,
+    ``classes_`` and ``n_features_in_``.
+    """
+
+    def __init__(
+        self,
+        model_type: str,
+        estimator: Any,
+        estimator_sha256: str,
+        scaler: Any = None,
+        label_encoder: Any = None,
+        metadata: Optional[dict] = None,
+        sources: Optional[Dict[str, str]] = None
+    ):
+        self.format_version = BUNDLE_FORMAT_VERSION
+        self.model_type = model_type
+        self.estimator = estimator
+        self.estimator_sha256 = estimator_sha256
+        self.label_encoder = label_encoder
+        self.class_names = list(label_encoder.classes_) if label_encoder is not None else None
+        self.metadata = dict(metadata or {})
+        self.sources = dict(sources or {})
+
+        # Fused scaler: StandardScaler.transform as (X - mean) / scale on plain arrays
+        self.scaler_mean: Optional[np.ndarray] = None
+        self.scaler_scale: Optional[np.ndarray] = None
+        if scaler is not None:
+            n_features = getattr(scaler, "n_features_in_", None)
+            if n_features != self.n_features_in_:
+                raise ValueError(f"Scaler expects {n_features} features, estimator expects {self.n_features_in_}")
+            if getattr(scaler, "with_mean", True) and scaler.mean_ is not None:
+                self.scaler_mean = np.ascontiguousarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, "with_std", True) and scaler.scale_ is not None:
+                self.scaler_scale = np.ascontiguousarray(scaler.scale_, dtype=np.float64)
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.estimator.classes_
+
+    @property
+    def n_features_in_(self) -> int:
+        return self.estimator.n_features_in_
+
+    @property
+    def scaled(self) -> bool:
+        return self.scaler_mean is not None or self.scaler_scale is not None
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Apply the fused scaler (no-op when the bundle has none)."""
+        if not self.scaled:
+            return X
+        X = np.array(X, dtype=np.float64)
+        if self.scaler_mean is not None:
+            X -= self.scaler_mean
+        if self.scaler_scale is not None:
+            X /= self.scaler_scale
+        return X
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.estimator.predict_proba(self.transform(X))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.estimator.predict(self.transform(X))
+
+    def describe(self) -> dict:
+        return {
+            "model_type": self.model_type,
+            "format_version": self.format_version,
+            "estimator": type(self.estimator).__name__,
+            "estimator_sha256": self.estimator_sha256,
+            "scaled": self.scaled,
+            "class_names": self.class_names,
+            "sources": self.sources
+        }
+
+
+def build_model_bundle(model_type: str, estimator_path: Optional[str] = None) -> ModelBundle:
+    """
+    Assemble a bundle from a model directory's loose artifacts.
+
+    The scaler is fused only when the metadata describes the estimator that is
+    actually on disk (an SVM trained on scaled features); otherwise applying it
+    would change the estimator's inputs, and it is left out with a warning.
+    """
+    import joblib
+
+    estimator_path = estimator_path or ESTIMATOR_PATHS[model_type]
+    model_dir = os.path.dirname(estimator_path)
+    estimator = joblib.load(estimator_path)
+    sources = {"estimator": estimator_path}
+
+    metadata = {}
+    metadata_path = _find_artifact(model_dir, METADATA_PATTERNS)
+    if metadata_path:
+        metadata = dict(joblib.load(metadata_path))
+        sources["metadata"] = metadata_path
+
+    label_encoder = None
+    encoder_path = _find_artifact(model_dir, ENCODER_PATTERNS)
+    if encoder_path:
+        label_encoder = joblib.load(encoder_path)
+        sources["label_encoder"] = encoder_path
+
+    scaler = None
+    scaler_path = _find_artifact(model_dir, SCALER_PATTERNS)
+    if scaler_path:
+        trained_as_svm = str(metadata.get("model_type", "")).upper() == "SVM"
+        if trained_as_svm and _is_svm(estimator):
+            scaler = joblib.load(scaler_path)
+            sources["scaler"] = scaler_path
+        else:
+            print(
+                f"Warning: Not fusing {scaler_path} into the {model_type} bundle: "
+                f"{estimator_path} is a {type(estimator).__name__}, not the "
+                f"{metadata.get('model_type', 'unknown')} model the scaler was fitted for"
+            )
+
+    return ModelBundle(
+        model_type,
+        estimator,
+        file_sha256(estimator_path),
+        scaler=scaler,
+        label_encoder=label_encoder,
+        metadata=metadata,
+        sources=sources
+    )
+
+
+def save_model_bundle(bundle: ModelBundle, path: str):
+    """Write a bundle uncompressed (so it can be memory-mapped), atomically."""
+    import joblib
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(bundle, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+
+def load_model_bundle(model_type: str, estimator_sha256: str) -> Optional[ModelBundle]:
+    """
+    Memory-map a model's bundle, or None if there is none or it is stale.
+
+    Args:
+        model_type: gb or svm
+        estimator_sha256: SHA-256 of the estimator file currently on disk
+    """
+    import joblib
+
+    path = BUNDLE_PATHS.get(model_type)
+    if not USE_MODEL_BUNDLES or path is None or not os.path.exists(path):
+        return None
+    try:
+        bundle = joblib.load(path, mmap_mode="c")
+    except Exception as e:
+        print(f"Warning: Could not load model bundle {path}: {e}")
+        return None
+
+    if not isinstance(bundle, ModelBundle) or getattr(bundle, "format_version", None) != BUNDLE_FORMAT_VERSION:
+        print(f"Warning: Ignoring model bundle {path}: unsupported format")
+        return None
+    if bundle.estimator_sha256 != estimator_sha256:
+        print(f"Warning: Ignoring stale model bundle {path}: estimator file changed since it was built")
+        return None
+    return bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build memory-mappable bundles of the scikit-learn models")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Bundle estimator, scaler, encoder and metadata")
+    build_parser.add_argument("--models", nargs="+", choices=BUNDLE_MODEL_TYPES, default=BUNDLE_MODEL_TYPES)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        for model_type in args.models:
+            if not os.path.exists(ESTIMATOR_PATHS[model_type]):
+                print(f"{model_type}: skipped, {ESTIMATOR_PATHS[model_type]} not found")
+                continue
+            start = time.perf_counter()
+            bundle = build_model_bundle(model_type)
+            save_model_bundle(bundle, BUNDLE_PATHS[model_type])
+            info = bundle.describe()
+            print(
+                f"{model_type}: wrote {BUNDLE_PATHS[model_type]} ({info['estimator']}, "
+                f"scaled={info['scaled']}, classes={info['class_names']}) in {time.perf_counter() - start:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    # Run the importable module's main so bundles pickle ModelBundle by its
+    # module path rather than as __main__.ModelBundle
+    from app.models.model_bundle import main as bundle_main
+    bundle_main()
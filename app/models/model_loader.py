@@ -1,9 +1,19 @@
+import importlib
 import os
+import threading
+import time
 import numpy as np
-import tensorflow as tf
-import joblib
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-from typing import Any
+from typing import Any, Callable, Dict, List
+
+# TensorFlow, scikit-learn and the TFLite interpreter are imported on first
+# use, so a worker only pays for the backends of the models it serves
+from app.models.gb_backend import compiled_model_path, load_compiled_model
+from app.models.model_bundle import file_sha256, load_model_bundle
+from app.models.numpy_backend import load_numpy_model, numpy_model_path
+from app.models.svm_backend import KERNEL_BACKENDS, kernel_model_path, load_kernel_model
+from app.models.tflite_backend import TFLITE_VARIANTS, interpreter_class, load_tflite_model, tflite_path
 
 # Paths to model files (updated for new subdirectory structure)
 MODEL_DIR = "models"
@@ -12,40 +22,381 @@ DNN_MODEL_PATH = os.path.join(MODEL_DIR, "dnn", "exchron-dnn.keras")
 GB_MODEL_PATH = os.path.join(MODEL_DIR, "gb", "exchron-gb.joblib")
 SVM_MODEL_PATH = os.path.join(MODEL_DIR, "svm", "exchron-svm.joblib")
 
-# Cache for loaded models to avoid reloading
+MODEL_PATHS = {
+    "cnn": CNN_MODEL_PATH,
+    "dnn": DNN_MODEL_PATH,
+    "gb": GB_MODEL_PATH,
+    "svm": SVM_MODEL_PATH
+}
+
+
+def _parse_models(spec: str) -> List[str]:
+    models = [m.strip().lower() for m in spec.split(",") if m.strip()]
+    unknown = [m for m in models if m not in MODEL_PATHS]
+    if unknown:
+        raise ValueError(f"Invalid EXCHRON_MODELS entries: {unknown}. Supported models: cnn, dnn, gb, svm")
+    return models
+
+
+# Models this worker loads at startup (comma-separated, e.g. "gb,svm")
+ENABLED_MODELS = _parse_models(os.getenv("EXCHRON_MODELS", "cnn,dnn,gb,svm"))
+
+# Serving backends per model type; the first one is the default
+SUPPORTED_BACKENDS = {
+    "cnn": ["keras", "numpy"] + [f"tflite-{variant}" for variant in TFLITE_VARIANTS],
+    "dnn": ["keras", "numpy"] + [f"tflite-{variant}" for variant in TFLITE_VARIANTS],
+    "gb": ["sklearn", "compiled"],
+    "svm": ["sklearn", "compiled"] + KERNEL_BACKENDS
+}
+
+
+def _parse_backends(spec: str) -> Dict[str, str]:
+    backends = {model_type: choices[0] for model_type, choices in SUPPORTED_BACKENDS.items()}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        model_type, _, backend = item.partition("=")
+        model_type, backend = model_type.strip().lower(), backend.strip().lower()
+        if backend not in SUPPORTED_BACKENDS.get(model_type, []):
+            raise ValueError(f"Invalid EXCHRON_MODEL_BACKENDS entry: {item.strip()!r}")
+        backends[model_type] = backend
+    return backends
+
+
+# Backend overrides, e.g. "cnn=numpy,dnn=tflite-float16,gb=compiled,svm=kernel"
+MODEL_BACKENDS = _parse_backends(os.getenv("EXCHRON_MODEL_BACKENDS", ""))
+
+
+def get_model_backend(model_type: str, backend: str = None) -> str:
+    """Resolve the serving backend for a model (the configured one unless given)"""
+    model_type = model_type.lower()
+    if model_type not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unknown model type: {model_type}. Supported models: cnn, dnn, gb, svm")
+    backend = (backend or MODEL_BACKENDS[model_type]).lower()
+    if backend not in SUPPORTED_BACKENDS[model_type]:
+        raise ValueError(
+            f"Unknown backend {backend} for {model_type}. Supported backends: {', '.join(SUPPORTED_BACKENDS[model_type])}"
+        )
+    return backend
+
+
+def get_model_path(model_type: str, backend: str = None) -> str:
+    """Path of the artifact a model is served from with the given backend"""
+    backend = get_model_backend(model_type, backend)
+    if backend.startswith("tflite-"):
+        return tflite_path(model_type.lower(), backend[len("tflite-"):])
+    if backend == "numpy":
+        return numpy_model_path(model_type.lower())
+    if backend == "compiled":
+        return compiled_model_path(model_type.lower())
+    if backend in KERNEL_BACKENDS:
+        return kernel_model_path(model_type.lower(), backend)
+    return MODEL_PATHS[model_type.lower()]
+
+
+# Modules each backend imports on first use
+BACKEND_MODULES = {
+    "keras": ["tensorflow"],
+    "sklearn": ["joblib", "sklearn.ensemble", "sklearn.svm"],
+    "numpy": [],
+    "compiled": [],
+    "kernel": [],
+    "kernel-approx": []
+}
+
+# Seconds spent importing each backend in this process
+_backend_import_seconds: Dict[str, float] = {}
+_backend_import_lock = threading.Lock()
+
+
+def import_backend(backend: str) -> float:
+    """Import a backend's modules once; returns the seconds this call spent importing"""
+    with _backend_import_lock:
+        if backend in _backend_import_seconds:
+            return 0.0
+        start = time.perf_counter()
+        if backend.startswith("tflite-"):
+            interpreter_class()
+        else:
+            for module in BACKEND_MODULES[backend]:
+                importlib.import_module(module)
+        _backend_import_seconds[backend] = time.perf_counter() - start
+        return _backend_import_seconds[backend]
+
+
+def get_backend_import_times() -> Dict[str, float]:
+    """Import seconds per backend imported so far in this worker"""
+    return dict(_backend_import_seconds)
+
+
+def _tensorflow():
+    import_backend("keras")
+    import tensorflow as tf
+    return tf
+
+
+# Cache for loaded models to avoid reloading (keyed by model type, plus the
+# backend when it is not the configured one)
 _model_cache = {}
+# One lock per model type so concurrent first requests load a model only once
+_model_locks: Dict[str, threading.Lock] = {}
 
-def get_model(model_type: str) -> Any:
-    """Load and cache ML models (CNN/DNN/GB/SVM)"""
+def get_model(model_type: str, backend: str = None) -> Any:
+    """Load and cache ML models (CNN/DNN/GB/SVM), served with the configured backend unless one is given"""
     model_type = model_type.lower()
+    backend = get_model_backend(model_type, backend)
+    key = model_type if backend == MODEL_BACKENDS[model_type] else f"{model_type}:{backend}"
     
     # Return cached model if available
-    if model_type in _model_cache:
-        return _model_cache[model_type]
+    if key in _model_cache:
+        return _model_cache[key]
     
-    try:
-        if model_type == "cnn":
-            if not os.path.exists(CNN_MODEL_PATH):
-                raise FileNotFoundError(f"CNN model file not found at {CNN_MODEL_PATH}")
-            model = tf.keras.models.load_model(CNN_MODEL_PATH)
-        elif model_type == "dnn":
-            if not os.path.exists(DNN_MODEL_PATH):
-                raise FileNotFoundError(f"DNN model file not found at {DNN_MODEL_PATH}")
-            model = tf.keras.models.load_model(DNN_MODEL_PATH)
-        elif model_type == "gb":
-            if not os.path.exists(GB_MODEL_PATH):
-                raise FileNotFoundError(f"GB model file not found at {GB_MODEL_PATH}")
-            model = joblib.load(GB_MODEL_PATH)
-        elif model_type == "svm":
-            if not os.path.exists(SVM_MODEL_PATH):
-                raise FileNotFoundError(f"SVM model file not found at {SVM_MODEL_PATH}")
-            model = joblib.load(SVM_MODEL_PATH)
-        else:
-            raise ValueError(f"Unknown model type: {model_type}. Supported models: cnn, dnn, gb, svm")
-        
-        # Cache the model
-        _model_cache[model_type] = model
-        return model
+    with _model_locks.setdefault(key, threading.Lock()):
+        # Another thread may have finished loading while we waited
+        if key in _model_cache:
+            return _model_cache[key]
         
+        try:
+            import_backend(backend)
+            if backend.startswith("tflite-"):
+                model = load_tflite_model(model_type, backend[len("tflite-"):])
+            elif backend == "numpy":
+                model = load_numpy_model(model_type)
+            elif backend == "compiled":
+                model = load_compiled_model(model_type)
+            elif backend in KERNEL_BACKENDS:
+                model = load_kernel_model(model_type, backend)
+            elif model_type == "cnn":
+                if not os.path.exists(CNN_MODEL_PATH):
+                    raise FileNotFoundError(f"CNN model file not found at {CNN_MODEL_PATH}")
+                model = _tensorflow().keras.models.load_model(CNN_MODEL_PATH)
+            elif model_type == "dnn":
+                if not os.path.exists(DNN_MODEL_PATH):
+                    raise FileNotFoundError(f"DNN model file not found at {DNN_MODEL_PATH}")
+                model = _tensorflow().keras.models.load_model(DNN_MODEL_PATH)
+            elif model_type == "gb":
+                import joblib
+                if not os.path.exists(GB_MODEL_PATH):
+                    raise FileNotFoundError(f"GB model file not found at {GB_MODEL_PATH}")
+                # Memory-mapped bundle (shared across workers) when built and current
+                model = load_model_bundle("gb", get_model_hash("gb")) or joblib.load(GB_MODEL_PATH)
+            elif model_type == "svm":
+                import joblib
+                if not os.path.exists(SVM_MODEL_PATH):
+                    raise FileNotFoundError(f"SVM model file not found at {SVM_MODEL_PATH}")
+                model = load_model_bundle("svm", get_model_hash("svm")) or joblib.load(SVM_MODEL_PATH)
+            else:
+                raise ValueError(f"Unknown model type: {model_type}. Supported models: cnn, dnn, gb, svm")
+            
+            # Cache the model
+            _model_cache[key] = model
+            return model
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to load model {model_type}: {str(e)}")
+
+def is_model_loaded(model_type: str) -> bool:
+    """Check whether a model is loaded in this worker"""
+    return model_type.lower() in _model_cache
+
+# Content hashes of model files, keyed by path: (mtime, size, sha256)
+_model_hashes: Dict[str, tuple] = {}
+
+def get_model_hash(model_type: str, backend: str = None) -> str:
+    """SHA-256 of the served model file's contents (recomputed only when the file changes)"""
+    path = get_model_path(model_type, backend)
+    
+    stat = os.stat(path)
+    cached = _model_hashes.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+    
+    digest = file_sha256(path)
+    _model_hashes[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+# Fixed inputs of the serving functions: (name, per-row shape); the batch dimension is dynamic
+SERVING_INPUTS = {
+    "cnn": [("time_series", (3000, 1))],
+    "dnn": [("time_series", (3000,)), ("features", (12,))]
+}
+
+# Try XLA compilation for the serving functions (set EXCHRON_XLA=0 to disable)
+USE_XLA = os.getenv("EXCHRON_XLA", "1") != "0"
+
+# Cache for compiled serving functions
+_serving_cache: Dict[str, "ServingFunction"] = {}
+_serving_lock = threading.Lock()
+
+
+class ServingFunction:
+    """
+    Compiled inference callable for a Keras model.
+
+    Wraps the model in a ``tf.function`` with a fixed input signature, traced
+    once, so calls skip ``model.predict``'s data adapter and callback setup.
+    Takes and returns NumPy arrays. With XLA, batches are zero-padded up to a
+    power of two so only a handful of batch shapes are ever compiled.
+    """
+
+    def __init__(self, model_type: str, model: Any):
+        tf = _tensorflow()
+        self.model_type = model_type
+        self.input_signature = [
+            tf.TensorSpec(shape=(None,) + shape, dtype=tf.float32, name=name)
+            for name, shape in SERVING_INPUTS[model_type]
+        ]
+        self.jit_compile = False
+
+        if USE_XLA:
+            try:
+                self._fn = self._compile(model, jit_compile=True)
+                self._run(self.dummy_inputs(1))
+                self.jit_compile = True
+            except Exception as e:
+                print(f"Warning: XLA compilation failed for {model_type}, using graph mode: {e}")
+        if not self.jit_compile:
+            self._fn = self._compile(model, jit_compile=False)
+
+    def _compile(self, model: Any, jit_compile: bool) -> Callable:
+        tf = _tensorflow()
+        n_inputs = len(self.input_signature)
+
+        @tf.function(input_signature=self.input_signature, jit_compile=jit_compile)
+        def serve(*inputs):
+            return model(inputs[0] if n_inputs == 1 else list(inputs), training=False)
+
+        return serve
+
+    def dummy_inputs(self, batch_size: int) -> List[np.ndarray]:
+        return [
+            np.zeros((batch_size,) + tuple(spec.shape[1:]), dtype=np.float32)
+            for spec in self.input_signature
+        ]
+
+    def _run(self, inputs: List[np.ndarray]) -> np.ndarray:
+        return self._fn(*inputs).numpy()
+
+    def __call__(self, *inputs: np.ndarray) -> np.ndarray:
+        """Run inference on a batch; one array per model input, float32-castable."""
+        if len(inputs) != len(self.input_signature):
+            raise ValueError(f"{self.model_type} expects {len(self.input_signature)} inputs, got {len(inputs)}")
+        arrays = [np.asarray(x, dtype=np.float32) for x in inputs]
+        batch_size = arrays[0].shape[0]
+
+        if not self.jit_compile:
+            return self._run(arrays)
+
+        # Pad the batch to a power of two to bound the number of XLA compilations
+        padded_size = 1 << max(batch_size - 1, 0).bit_length()
+        if padded_size != batch_size:
+            arrays = [
+                np.concatenate([x, np.zeros((padded_size - batch_size,) + x.shape[1:], dtype=np.float32)])
+                for x in arrays
+            ]
+        return self._run(arrays)[:batch_size]
+
+
+def get_serving_fn(model_type: str) -> Callable[..., np.ndarray]:
+    """Get the compiled serving function for a deep learning model (cnn/dnn)"""
+    model_type = model_type.lower()
+    if model_type not in SERVING_INPUTS:
+        raise ValueError(f"No serving function for model type: {model_type}. Supported models: cnn, dnn")
+
+    with _serving_lock:
+        if model_type not in _serving_cache:
+            model = get_model(model_type)
+            # NumPy and TFLite models are already NumPy-in, NumPy-out callables
+            if MODEL_BACKENDS[model_type] == "keras":
+                model = ServingFunction(model_type, model)
+            _serving_cache[model_type] = model
+        return _serving_cache[model_type]
+
+
+# Startup load/warm-up status per model
+_model_status: Dict[str, dict] = {}
+_preload_complete = threading.Event()
+
+
+def _warm_up(model_type: str, warmup_batch_sizes: List[int]):
+    """Run dummy inference so the first real request does not pay tracing/compilation."""
+    if model_type in SERVING_INPUTS:
+        serving_fn = get_serving_fn(model_type)
+        for batch_size in warmup_batch_sizes:
+            serving_fn(*serving_fn.dummy_inputs(batch_size))
+    else:
+        model = get_model(model_type)
+        model.predict_proba(np.zeros((1, model.n_features_in_), dtype=np.float64))
+
+
+def _preload_one(model_type: str, warmup_batch_sizes: List[int]):
+    status = _model_status[model_type]
+    model_path = get_model_path(model_type)
+    if not os.path.exists(model_path):
+        status.update(state="missing", error=f"Model file not found at {model_path}")
+        return
+
+    try:
+        status["state"] = "importing"
+        status["import_seconds"] = import_backend(status["backend"])
+
+        status["state"] = "loading"
+        start = time.perf_counter()
+        get_model(model_type)
+        status["load_seconds"] = time.perf_counter() - start
+
+        status["state"] = "warming_up"
+        start = time.perf_counter()
+        _warm_up(model_type, warmup_batch_sizes)
+        status["warmup_seconds"] = time.perf_counter() - start
+
+        # Latency of a single warm inference, i.e. what a request will see
+        start = time.perf_counter()
+        _warm_up(model_type, [1])
+        status["warm_latency_ms"] = (time.perf_counter() - start) * 1000.0
+        status["state"] = "ready"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to load model {model_type}: {str(e)}")
\ No newline at end of file
+        status.update(state="failed", error=getattr(e, "detail", None) or str(e))
+
+
+def preload_models(model_types: List[str] = None, warmup_batch_sizes: List[int] = (1,)):
+    """
+    Load the given models in parallel (one load per model) and warm each one up.
+
+    Models whose artifact is not on disk are reported as ``missing`` and do
+    not block readiness; models that fail to load or warm up do.
+    """
+    model_types = list(ENABLED_MODELS if model_types is None else model_types)
+    for model_type in model_types:
+        if model_type not in MODEL_PATHS:
+            raise ValueError(f"Unknown model type: {model_type}. Supported models: cnn, dnn, gb, svm")
+
+    _preload_complete.clear()
+    for model_type in model_types:
+        _model_status[model_type] = {
+            "state": "pending",
+            "backend": MODEL_BACKENDS[model_type],
+            "import_seconds": None,
+            "load_seconds": None,
+            "warmup_seconds": None,
+            "warm_latency_ms": None,
+            "error": None
+        }
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(model_types), 1), thread_name_prefix="exchron-preload") as pool:
+            list(pool.map(lambda m: _preload_one(m, list(warmup_batch_sizes)), model_types))
+    finally:
+        _preload_complete.set()
+
+
+def get_model_status() -> Dict[str, dict]:
+    """Return per-model load state, load time and warm-up latency"""
+    return {model_type: dict(status) for model_type, status in _model_status.items()}
+
+
+def is_ready() -> bool:
+    """True once preloading finished and every available model is warm"""
+    return _preload_complete.is_set() and all(
+        status["state"] in ("ready", "missing") for status in _model_status.values()
+    )
@@ -0,0 +1,413 @@
+"""
+Pure-NumPy inference for the deep learning models.
+
+``export`` reads a ``.keras`` archive directly (its ``config.json`` layer
+graph and ``model.weights.h5`` weights, through ``zipfile`` and ``h5py``) and
+writes an ``.npz`` holding the graph and the inference weights. Neither
+exporting nor serving imports TensorFlow.
+
+At export, each BatchNormalization is folded into one per-channel scale and
+shift. At inference, a Conv1D is one matmul over the whole batch: a strided
+window view of the padded input is laid out as an im2col matrix of
+(batch * steps, kernel * channels) and multiplied by the reshaped kernel.
+Dense layers are batched matmuls, and Dropout is the identity. The forward
+pass runs in float32, as Keras does.
+
+Supported layers cover the shipped architectures: InputLayer, Reshape,
+Conv1D, BatchNormalization, MaxPooling1D, GlobalMaxPooling1D, Flatten,
+Dropout, Dense and Concatenate, in Sequential or Functional models.
+
+    python -m app.models.numpy_backend export [--models cnn dnn]
+
+Use ``python -m scripts.check_parity numpy`` to compare the exported model
+against Keras.
+"""
+
+import argparse
+import json
+import os
+import time
+import zipfile
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.models.model_bundle import file_sha256
+
+MODEL_DIR = "models"
+KERAS_MODEL_PATHS = {
+    "cnn": os.path.join(MODEL_DIR, "cnn", "exchron-cnn.keras"),
+    "dnn": os.path.join(MODEL_DIR, "dnn", "exchron-dnn.keras")
+}
+
+# Per-row input shapes, in the order the serving functions take them
+INPUT_SHAPES = {
+    "cnn": [(3000, 1)],
+    "dnn": [(3000,), (12,)]
+}
+
+NPZ_FORMAT_VERSION = 1
+
+# Layer classes with no inference-time effect
+_IDENTITY_LAYERS = {"Dropout", "SpatialDropout1D", "GaussianNoise", "GaussianDropout", "ActivityRegularization"}
+# Ops whose output shares memory with their input
+_VIEW_OPS = {"InputLayer", "Identity", "Reshape", "Flatten"}
+
+
+def numpy_model_path(model_type: str) -> str:
+    """Path of an exported model, e.g. models/cnn/exchron-cnn.npz"""
+    return os.path.join(MODEL_DIR, model_type, f"exchron-{model_type}.npz")
+
+
+# --- Export ---------------------------------------------------------------
+
+def _read_keras_archive(path: str):
+    """The model config and a name -> [weight arrays] map from a .keras archive."""
+    import h5py
+
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read("config.json"))
+        with archive.open("model.weights.h5") as f, h5py.File(f, "r") as weights_file:
+            weights = {}
+            for path, group in weights_file["layers"].items():
+                if "vars" in group:
+                    variables = group["vars"]
+                    # Groups are named after the layer class ("dense_3"); the
+                    # layer's own name is kept as an attribute
+                    name = variables.attrs.get("name", path)
+                    weights[name] = [np.asarray(variables[str(i)]) for i in range(len(variables))]
+    return config, weights
+
+
+def _tensor_source(tensor) -> str:
+    """Producing layer name of a serialized Keras tensor."""
+    return tensor["config"]["keras_history"][0]
+
+
+def _inbound_layers(layer: dict) -> List[str]:
+    """Names of the layers feeding a Functional model layer."""
+    if not layer.get("inbound_nodes"):
+        return []
+    args = layer["inbound_nodes"][0]["args"]
+    sources = []
+    for arg in args:
+        for tensor in (arg if isinstance(arg, list) else [arg]):
+            if isinstance(tensor, dict) and tensor.get("class_name") == "__keras_tensor__":
+                sources.append(_tensor_source(tensor))
+    return sources
+
+
+def _layer_weights(weights: Dict[str, List[np.ndarray]], name: str) -> List[np.ndarray]:
+    if name not in weights:
+        raise ValueError(f"{name}: no weights found in model.weights.h5")
+    return weights[name]
+
+
+def _fold_batch_norm(config: dict, variables: List[np.ndarray]):
+    """BatchNormalization as y = x * scale + shift."""
+    variables = list(variables)
+    gamma = variables.pop(0) if config.get("scale", True) else None
+    beta = variables.pop(0) if config.get("center", True) else None
+    moving_mean, moving_variance = variables
+    scale = 1.0 / np.sqrt(moving_variance.astype(np.float64) + config["epsilon"])
+    if gamma is not None:
+        scale = scale * gamma
+    shift = -moving_mean * scale
+    if beta is not None:
+        shift = shift + beta
+    return scale.astype(np.float32), shift.astype(np.float32)
+
+
+def _convert_layer(layer: dict, weights: Dict[str, List[np.ndarray]], arrays: Dict[str, np.ndarray]) -> dict:
+    """Graph node for a Keras layer; its weights go into ``arrays``."""
+    class_name, config = layer["class_name"], layer["config"]
+    name = config["name"]
+    node = {"name": name, "op": class_name}
+
+    if class_name in _IDENTITY_LAYERS:
+        node["op"] = "Identity"
+    elif class_name == "InputLayer":
+        node["shape"] = list(config.get("batch_shape") or config["batch_input_shape"])[1:]
+    elif class_name == "Reshape":
+        node["target_shape"] = list(config["target_shape"])
+    elif class_name in ("Flatten", "GlobalMaxPooling1D"):
+        pass
+    elif class_name == "Concatenate":
+        node["axis"] = config.get("axis", -1)
+    elif class_name == "MaxPooling1D":
+        node["pool_size"] = int(np.ravel(config["pool_size"])[0])
+        node["strides"] = int(np.ravel(config["strides"] or config["pool_size"])[0])
+        node["padding"] = config["padding"]
+    elif class_name == "BatchNormalization":
+        if config.get("axis", -1) not in (-1, [-1]):
+            raise ValueError(f"{name}: only last-axis BatchNormalization is supported")
+        arrays[f"{name}/scale"], arrays[f"{name}/shift"] = _fold_batch_norm(config, _layer_weights(weights, name))
+    elif class_name in ("Conv1D", "Dense"):
+        if class_name == "Conv1D":
+            if config.get("data_format", "channels_last") != "channels_last" or config.get("groups", 1) != 1:
+                raise ValueError(f"{name}: only channels_last, ungrouped Conv1D is supported")
+            if int(np.ravel(config["dilation_rate"])[0]) != 1:
+                raise ValueError(f"{name}: dilated Conv1D is not supported")
+            node["strides"] = int(np.ravel(config["strides"])[0])
+            node["padding"] = config["padding"]
+        node["activation"] = config.get("activation", "linear")
+        variables = _layer_weights(weights, name)
+        arrays[f"{name}/kernel"] = variables[0].astype(np.float32)
+        if config.get("use_bias", True):
+            arrays[f"{name}/bias"] = variables[1].astype(np.float32)
+    else:
+        raise ValueError(f"{name}: unsupported layer type {class_name}")
+
+    if node.get("activation") not in (None, "linear", "relu", "softmax", "sigmoid"):
+        raise ValueError(f"{name}: unsupported activation {node['activation']}")
+    return node
+
+
+def export_numpy_model(keras_path: str) -> Dict[str, np.ndarray]:
+    """
+    Convert a .keras archive to the arrays of an .npz model.
+
+    The graph (nodes in evaluation order, their inputs, the model inputs and
+    output) is stored as JSON under ``__graph__``; weights are stored as
+    ``<layer>/<name>`` float32 arrays.
+    """
+    config, weights = _read_keras_archive(keras_path)
+    model_class, model_config = config["class_name"], config["config"]
+    layers = model_config["layers"]
+    arrays: Dict[str, np.ndarray] = {}
+    nodes = []
+
+    if model_class == "Sequential":
+        if layers and layers[0]["class_name"] == "InputLayer":
+            input_layer = layers.pop(0)
+        else:
+            input_layer = {
+                "class_name": "InputLayer",
+                "config": {"name": "input", "batch_shape": model_config.get("build_input_shape") or config["build_config"]["input_shape"]}
+            }
+        previous = input_layer["config"]["name"]
+        nodes.append(_convert_layer(input_layer, weights, arrays))
+        for layer in layers:
+            node = _convert_layer(layer, weights, arrays)
+            node["inputs"] = [previous]
+            nodes.append(node)
+            previous = node["name"]
+        inputs, output = [input_layer["config"]["name"]], previous
+    elif model_class == "Functional":
+        for layer in layers:
+            node = _convert_layer(layer, weights, arrays)
+            node["inputs"] = _inbound_layers(layer)
+            nodes.append(node)
+        inputs = [entry[0] for entry in model_config["input_layers"]]
+        output_layers = model_config["output_layers"]
+        if output_layers and isinstance(output_layers[0], list):
+            if len(output_layers) != 1:
+                raise ValueError("Only single-output models are supported")
+            output_layers = output_layers[0]
+        output = output_layers[0]
+    else:
+        raise ValueError(f"Unsupported model class {model_class}")
+
+    graph = {"format_version": NPZ_FORMAT_VERSION, "nodes": nodes, "inputs": inputs, "output": output}
+    arrays["__graph__"] = np.array(json.dumps(graph))
+    arrays["__source_sha256__"] = np.array(file_sha256(keras_path))
+    return arrays
+
+
+def save_numpy_model(arrays: Dict[str, np.ndarray], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+# --- Inference ------------------------------------------------------------
+
+def _same_padding(length: int, window: int, stride: int):
+    """(left, right) padding for 'same' convolutions and pooling, as TensorFlow computes it."""
+    out_length = -(-length // stride)
+    total = max((out_length - 1) * stride + window - length, 0)
+    return total // 2, total - total // 2
+
+
+def _activate(x: np.ndarray, activation: Optional[str]) -> np.ndarray:
+    if activation == "relu":
+        return np.maximum(x, 0, out=x)
+    if activation == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    if activation == "sigmoid":
+        return 1.0 / (1.0 + np.exp(-x))
+    return x
+
+
+def conv1d(x: np.ndarray, kernel: np.ndarray, bias: Optional[np.ndarray], stride: int, padding: str) -> np.ndarray:
+    """(N, L, C_in) x (K, C_in, C_out) convolution as one im2col matmul."""
+    window = kernel.shape[0]
+    if padding == "same":
+        left, right = _same_padding(x.shape[1], window, stride)
+        x = np.pad(x, ((0, 0), (left, right), (0, 0)))
+    elif padding != "valid":
+        raise ValueError(f"Unsupported padding: {padding}")
+
+    # (N, L_out, C_in, K) view -> (N * L_out, K * C_in) matrix ordered like the kernel
+    windows = sliding_window_view(x, window, axis=1)[:, ::stride]
+    n_rows, out_length = windows.shape[:2]
+    columns = windows.transpose(0, 1, 3, 2).reshape(n_rows * out_length, -1)
+    out = columns @ kernel.reshape(-1, kernel.shape[2])
+    if bias is not None:
+        out += bias
+    return out.reshape(n_rows, out_length, -1)
+
+
+def max_pool1d(x: np.ndarray, pool_size: int, stride: int, padding: str) -> np.ndarray:
+    if padding == "same":
+        left, right = _same_padding(x.shape[1], pool_size, stride)
+        x = np.pad(x, ((0, 0), (left, right), (0, 0)), constant_values=-np.inf)
+    if stride == pool_size:
+        # Non-overlapping windows: a reshape instead of a window view
+        out_length = (x.shape[1] - pool_size) // stride + 1
+        return x[:, :out_length * pool_size].reshape(x.shape[0], out_length, pool_size, x.shape[2]).max(axis=2)
+    return sliding_window_view(x, pool_size, axis=1)[:, ::stride].max(axis=-1)
+
+
+class NumpyModel:
+    """
+    An exported model evaluated with NumPy.
+
+    Called like ``model_loader.ServingFunction``: one float32 array per model
+    input, the output batch back. Stateless, so safe to call from several
+    threads at once.
+    """
+
+    def __init__(self, model_type: str, path: str):
+        self.model_type = model_type
+        self.path = path
+        self.input_shapes = INPUT_SHAPES[model_type]
+        # Never XLA-compiled; kept for parity with ServingFunction
+        self.jit_compile = False
+
+        with np.load(path, allow_pickle=False) as data:
+            graph = json.loads(str(data["__graph__"]))
+            self.source_sha256 = str(data["__source_sha256__"])
+            self.weights = {key: data[key] for key in data.files if not key.startswith("__")}
+        if graph.get("format_version") != NPZ_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported format, re-export it")
+        self.nodes = graph["nodes"]
+        self.output = graph["output"]
+
+        # Match graph inputs to the serving order by their per-row shape
+        input_nodes = {node["name"]: node for node in self.nodes if node["op"] == "InputLayer"}
+        self.inputs = []
+        for shape in self.input_shapes:
+            matches = [name for name in graph["inputs"] if tuple(input_nodes[name]["shape"]) == shape]
+            if len(matches) != 1:
+                raise ValueError(f"{path} has no unique input of shape (None, {', '.join(map(str, shape))})")
+            self.inputs.append(matches[0])
+
+        # BatchNormalization overwrites its input when that is a fresh array
+        # (not a model input or a view of another value) no other layer reads
+        consumers: Dict[str, int] = {}
+        for node in self.nodes:
+            for source in node.get("inputs", []):
+                consumers[source] = consumers.get(source, 0) + 1
+        ops = {node["name"]: node["op"] for node in self.nodes}
+        self._in_place = {
+            node["name"] for node in self.nodes
+            if node["op"] == "BatchNormalization"
+            and consumers[node["inputs"][0]] == 1
+            and ops[node["inputs"][0]] not in _VIEW_OPS
+        }
+
+    def _evaluate(self, node: dict, args: List[np.ndarray]) -> np.ndarray:
+        op, name = node["op"], node["name"]
+        x = args[0] if args else None
+        if op == "Identity":
+            return x
+        if op == "Reshape":
+            return x.reshape((x.shape[0], *node["target_shape"]))
+        if op == "Flatten":
+            return x.reshape(x.shape[0], -1)
+        if op == "Concatenate":
+            return np.concatenate(args, axis=node["axis"])
+        if op == "GlobalMaxPooling1D":
+            return x.max(axis=1)
+        if op == "MaxPooling1D":
+            return max_pool1d(x, node["pool_size"], node["strides"], node["padding"])
+        if op == "BatchNormalization":
+            out = x if name in self._in_place else None
+            x = np.multiply(x, self.weights[f"{name}/scale"], out=out)
+            return np.add(x, self.weights[f"{name}/shift"], out=x)
+        if op == "Conv1D":
+            x = conv1d(x, self.weights[f"{name}/kernel"], self.weights.get(f"{name}/bias"), node["strides"], node["padding"])
+            return _activate(x, node["activation"])
+        if op == "Dense":
+            x = x @ self.weights[f"{name}/kernel"]
+            if f"{name}/bias" in self.weights:
+                x += self.weights[f"{name}/bias"]
+            return _activate(x, node["activation"])
+        raise ValueError(f"{name}: unsupported op {op}")
+
+    def dummy_inputs(self, batch_size: int) -> List[np.ndarray]:
+        return [np.zeros((batch_size,) + shape, dtype=np.float32) for shape in self.input_shapes]
+
+    def __call__(self, *inputs: np.ndarray) -> np.ndarray:
+        """Run inference on a batch; one array per model input, float32-castable."""
+        if len(inputs) != len(self.input_shapes):
+            raise ValueError(f"{self.model_type} expects {len(self.input_shapes)} inputs, got {len(inputs)}")
+        values = {name: np.asarray(x, dtype=np.float32) for name, x in zip(self.inputs, inputs)}
+        for node in self.nodes:
+            if node["op"] != "InputLayer":
+                values[node["name"]] = self._evaluate(node, [values[source] for source in node["inputs"]])
+        return values[self.output]
+
+    def predict(self, x, batch_size: int = 32, verbose: int = 0) -> np.ndarray:
+        """``keras.Model.predict``-style call over a whole input set, in batches."""
+        inputs = x if isinstance(x, (list, tuple)) else [x]
+        return np.concatenate([
+            self(*[array[i:i + batch_size] for array in inputs])
+            for i in range(0, len(inputs[0]), batch_size)
+        ])
+
+
+def load_numpy_model(model_type: str) -> NumpyModel:
+    path = numpy_model_path(model_type)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"NumPy model not found at {path} (run python -m app.models.numpy_backend export --models {model_type})"
+        )
+    model = NumpyModel(model_type, path)
+    keras_path = KERAS_MODEL_PATHS[model_type]
+    if os.path.exists(keras_path) and file_sha256(keras_path) != model.source_sha256:
+        raise ValueError(f"{path} is stale: {keras_path} changed since it was exported")
+    return model
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export the Keras models for NumPy inference")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the graph and folded weights of each .keras model to .npz")
+    export_parser.add_argument("--models", nargs="+", choices=list(KERAS_MODEL_PATHS), default=list(KERAS_MODEL_PATHS))
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        for model_type in args.models:
+            keras_path = KERAS_MODEL_PATHS[model_type]
+            if not os.path.exists(keras_path):
+                print(f"{model_type}: skipped, {keras_path} not found")
+                continue
+            start = time.perf_counter()
+            arrays = export_numpy_model(keras_path)
+            path = numpy_model_path(model_type)
+            save_numpy_model(arrays, path)
+            n_layers = len(json.loads(str(arrays["__graph__"]))["nodes"])
+            print(
+                f"{model_type}: wrote {path} ({n_layers} layers, {os.path.getsize(path) / 1e6:.2f} MB) "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
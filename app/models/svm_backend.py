@@ -0,0 +1,462 @@
+"""
+Batched kernel serving for the SVM KOI model, exact or approximate.
+
+``compile`` reads the SVM from its model bundle (so the fitted feature scaler
+is fused as it is in ``ModelBundle``) and writes two artifacts:
+
+- ``kernel``: the support vectors and dual coefficients as contiguous float32
+  arrays. ``KernelSVM`` computes the float32 kernel matrix of a whole batch
+  against all support vectors around one BLAS matrix product, then sums it
+  against the dual coefficients in float64, instead of going through libsvm
+  row by row.
+- ``kernel-approx``: a low-rank approximation fitted offline from the support
+  vectors, either Nyström (the model's kernel against a few hundred
+  landmark vectors, for any kernel) or random Fourier features (RBF kernel
+  only). Per-row cost drops from ``n_support`` kernel evaluations to
+  ``n_components``.
+
+Probabilities use the model's Platt sigmoid followed by libsvm's pairwise
+coupling iteration, which for two classes still stops at a tolerance of
+0.0025, so they match scikit-learn's ``predict_proba`` up to the float32
+kernel arithmetic. ``compile`` measures both artifacts against scikit-learn
+on ``KOI-Playground-Test-Data.csv`` and stores the result (maximum, p99 and
+mean probability error, flipped decisions) in the artifact's metadata. An
+artifact is not written when its error exceeds ``--max-probability-error``
+(default 0.05) or when it flips more than ``--max-decision-flips`` decisions
+(default 0).
+
+    python -m app.models.svm_backend compile [--method nystroem|random-features] [--components 256]
+
+Use ``python -m scripts.check_parity svm`` to re-check both against
+scikit-learn. The shipped ``exchron-svm.joblib`` is a gradient-boosting model;
+``compile`` skips it (serve it with the ``compiled`` backend instead).
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.model_bundle import ESTIMATOR_PATHS, build_model_bundle, file_sha256
+
+MODEL_DIR = "models"
+KERNEL_MODEL_TYPES = ["svm"]
+KERNEL_BACKENDS = ["kernel", "kernel-approx"]
+APPROXIMATION_METHODS = ["nystroem", "random-features"]
+SUPPORTED_KERNELS = ["linear", "poly", "rbf", "sigmoid"]
+
+KERNEL_FORMAT_VERSION = 1
+
+# Rows scored per kernel block, bounding the (rows, n_support) float32 kernel matrix
+BLOCK_ROWS = int(os.getenv("EXCHRON_SVM_BLOCK_ROWS", "1024"))
+
+# libsvm's clipping of pairwise probabilities
+MIN_PROBABILITY = 1e-7
+# Batches up to this size run the coupling iteration on Python floats, which beats NumPy's per-call overhead
+SCALAR_COUPLING_ROWS = 16
+# Largest probability error against scikit-learn that compile accepts by default
+MAX_PROBABILITY_ERROR = 0.05
+
+
+def kernel_model_path(model_type: str, backend: str) -> str:
+    """Path of a kernel artifact, e.g. models/svm/exchron-svm.kernel-approx.npz"""
+    return os.path.join(MODEL_DIR, model_type, f"exchron-{model_type}.{backend}.npz")
+
+
+def is_svc(estimator: Any) -> bool:
+    return type(estimator).__name__ in ("SVC", "NuSVC")
+
+
+def kernel_matrix(X: np.ndarray, Y: np.ndarray, params: dict, Y_squared_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    float32 kernel matrix between the rows of X and Y, computed in place around one BLAS product.
+
+    The RBF kernel uses the expansion ||x - y||^2 = ||x||^2 - 2 x.y + ||y||^2.
+    """
+    K = X @ Y.T
+    kernel = params["kernel"]
+    if kernel == "rbf":
+        if Y_squared_norms is None:
+            Y_squared_norms = np.einsum("ij,ij->i", Y, Y)
+        K *= -2
+        K += np.einsum("ij,ij->i", X, X)[:, None]
+        K += Y_squared_norms
+        # Rounding can leave tiny negative squared distances
+        np.maximum(K, 0, out=K)
+        K *= -params["gamma"]
+        np.exp(K, out=K)
+    elif kernel == "poly":
+        K *= params["gamma"]
+        K += params["coef0"]
+        K **= params["degree"]
+    elif kernel == "sigmoid":
+        K *= params["gamma"]
+        K += params["coef0"]
+        np.tanh(K, out=K)
+    elif kernel != "linear":
+        raise ValueError(f"Unsupported kernel: {kernel}. Supported kernels: {', '.join(SUPPORTED_KERNELS)}")
+    return K
+
+
+def compile_svm(estimator: Any, scaler_mean: Optional[np.ndarray] = None, scaler_scale: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Export a fitted binary ``SVC``/``NuSVC`` as float32 support vectors and dual coefficients.
+
+    A linear kernel is collapsed to its weight vector, stored as a single
+    "support vector" with dual coefficient 1.
+    """
+    if not is_svc(estimator):
+        raise ValueError(f"Expected an SVC or NuSVC, got {type(estimator).__name__}")
+    if len(estimator.classes_) != 2:
+        raise ValueError("Only binary SVMs are supported")
+    if estimator.kernel not in SUPPORTED_KERNELS:
+        raise ValueError(f"Unsupported kernel: {estimator.kernel}. Supported kernels: {', '.join(SUPPORTED_KERNELS)}")
+
+    support_vectors = estimator.support_vectors_
+    if hasattr(support_vectors, "toarray"):
+        support_vectors = support_vectors.toarray()
+    support_vectors = np.asarray(support_vectors, dtype=np.float64)
+    # Public dual_coef_/intercept_ already carry scikit-learn's binary sign flip
+    dual_coef = np.asarray(estimator.dual_coef_, dtype=np.float64)[0]
+    if estimator.kernel == "linear":
+        support_vectors = (dual_coef @ support_vectors)[None, :]
+        dual_coef = np.ones(1)
+
+    params = {
+        "kernel": estimator.kernel,
+        "gamma": float(estimator._gamma),
+        "coef0": float(estimator.coef0),
+        "degree": int(estimator.degree)
+    }
+    probability = bool(getattr(estimator, "probability", False)) and len(getattr(estimator, "probA_", [])) == 1
+    metadata = {
+        "format_version": KERNEL_FORMAT_VERSION,
+        "estimator": type(estimator).__name__,
+        "method": "exact",
+        "kernel": params,
+        "n_features": int(estimator.n_features_in_),
+        "n_support": int(len(estimator.support_vectors_)),
+        "n_components": int(len(support_vectors)),
+        "probability": probability,
+        "classes": estimator.classes_.tolist(),
+        "scaled": scaler_mean is not None or scaler_scale is not None
+    }
+    arrays = {
+        "__metadata__": np.array(json.dumps(metadata)),
+        "support_vectors": np.ascontiguousarray(support_vectors, dtype=np.float32),
+        "dual_coef": np.ascontiguousarray(dual_coef, dtype=np.float32),
+        "intercept": np.array(estimator.intercept_[0], dtype=np.float64)
+    }
+    if probability:
+        arrays["prob_a"] = np.array(estimator.probA_[0], dtype=np.float64)
+        arrays["prob_b"] = np.array(estimator.probB_[0], dtype=np.float64)
+    if scaler_mean is not None:
+        arrays["scaler_mean"] = np.asarray(scaler_mean, dtype=np.float64)
+    if scaler_scale is not None:
+        arrays["scaler_scale"] = np.asarray(scaler_scale, dtype=np.float64)
+    return arrays
+
+
+def approximate_svm(exact: Dict[str, np.ndarray], method: str, n_components: int, random_state: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Fit a low-rank approximation of a compiled SVM's decision function from its support vectors.
+
+    The decision function is re-expressed as ``f(x) ~ phi(x) . w + b`` for a
+    cheap feature map ``phi``:
+
+    - ``nystroem``: ``phi(x) = k(x, L)``, the model's own kernel against
+      ``n_components`` landmarks ``L``, the k-means centres of the support
+      vectors
+    - ``random-features``: ``phi(x) = cos(x W + c)``, random Fourier features
+      of the RBF kernel
+
+    The weights ``w`` are fitted by least squares to the exact decision values
+    at the support vectors. With C large, most dual coefficients sit at the
+    bound and largely cancel, so projecting them onto the approximate kernel
+    (``w = sum_i a_i phi(sv_i)``) amplifies the kernel error; fitting the
+    decision values directly does not.
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.kernel_approximation import RBFSampler
+
+    metadata = json.loads(str(exact["__metadata__"]))
+    params = metadata["kernel"]
+    support_vectors = exact["support_vectors"].astype(np.float64)
+    if params["kernel"] == "linear":
+        raise ValueError("A linear SVM is already a single weight vector; there is nothing to approximate")
+    # Targets: the exact model's decision values (less the intercept) at the support vectors
+    targets = kernel_matrix(support_vectors, support_vectors, params) @ exact["dual_coef"].astype(np.float64)
+
+    arrays = {name: value for name, value in exact.items() if name not in ("support_vectors", "dual_coef")}
+    if method == "nystroem":
+        n_components = min(n_components, len(support_vectors))
+        if n_components == len(support_vectors):
+            landmarks = support_vectors
+        else:
+            landmarks = KMeans(n_components, n_init=1, random_state=random_state).fit(support_vectors).cluster_centers_
+        # Fit against the float32 landmarks that will be served
+        landmarks = np.ascontiguousarray(landmarks, dtype=np.float32)
+        design = kernel_matrix(support_vectors, landmarks.astype(np.float64), params)
+        arrays["support_vectors"] = landmarks
+    elif method == "random-features":
+        if params["kernel"] != "rbf":
+            raise ValueError(f"Random Fourier features approximate the RBF kernel, not {params['kernel']}")
+        sampler = RBFSampler(gamma=params["gamma"], n_components=n_components, random_state=random_state).fit(support_vectors)
+        arrays["projection"] = np.ascontiguousarray(sampler.random_weights_, dtype=np.float32)
+        arrays["offset"] = np.ascontiguousarray(sampler.random_offset_, dtype=np.float32)
+        design = np.cos(support_vectors @ arrays["projection"].astype(np.float64) + arrays["offset"].astype(np.float64))
+    else:
+        raise ValueError(f"Unknown approximation method: {method}. Supported methods: {', '.join(APPROXIMATION_METHODS)}")
+
+    weights = np.linalg.lstsq(design, targets, rcond=None)[0]
+    arrays["dual_coef"] = np.ascontiguousarray(weights, dtype=np.float32)
+    metadata.update(method=method, n_components=int(n_components), random_state=random_state)
+    arrays["__metadata__"] = np.array(json.dumps(metadata))
+    return arrays
+
+
+def save_kernel_model(arrays: Dict[str, np.ndarray], path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _sigmoid_predict(decision: np.ndarray, prob_a: float, prob_b: float) -> np.ndarray:
+    """libsvm's sigmoid_predict: probability of the first class, avoiding overflow on either side."""
+    f_apb = decision * prob_a + prob_b
+    e = np.exp(-np.abs(f_apb))
+    return np.where(f_apb >= 0, e / (1.0 + e), 1.0 / (1.0 + e))
+
+
+def _pairwise_coupling_row(r: float, max_iter: int = 100) -> List[float]:
+    """``_pairwise_coupling`` for a single row, with the same floating-point operations."""
+    q = ((((1.0 - r) * (1.0 - r)), -(1.0 - r) * r), (-(1.0 - r) * r, r * r))
+    p = [0.5, 0.5]
+    for _ in range(max_iter):
+        qp = [q[0][0] * p[0] + q[0][1] * p[1], q[1][0] * p[0] + q[1][1] * p[1]]
+        pqp = p[0] * qp[0] + p[1] * qp[1]
+        if max(abs(qp[0] - pqp), abs(qp[1] - pqp)) < 0.005 / 2:
+            break
+        for t in (0, 1):
+            diff = (pqp - qp[t]) / q[t][t]
+            p[t] = p[t] + diff
+            pqp = (pqp + diff * (diff * q[t][t] + 2 * qp[t])) / (1 + diff) / (1 + diff)
+            qp = [(qp[j] + diff * q[t][j]) / (1 + diff) for j in (0, 1)]
+            p = [p[j] / (1 + diff) for j in (0, 1)]
+    return p
+
+
+def _pairwise_coupling(r: np.ndarray, max_iter: int = 100) -> np.ndarray:
+    """
+    libsvm's multiclass_probability for two classes, vectorized over rows.
+
+    The fixed point is ``[r, 1 - r]``, but libsvm starts from ``[0.5, 0.5]``
+    and stops once the error is below 0.005 / k, so the iteration is
+    reproduced step for step.
+    """
+    if len(r) <= SCALAR_COUPLING_ROWS:
+        return np.array([_pairwise_coupling_row(value, max_iter) for value in r.tolist()], dtype=np.float64).reshape(-1, 2)
+    r01, r10 = r, 1.0 - r
+    q = ((r10 * r10, -r10 * r01), (-r10 * r01, r01 * r01))
+    p = [np.full_like(r, 0.5), np.full_like(r, 0.5)]
+    active = np.ones(len(r), dtype=bool)
+    for _ in range(max_iter):
+        qp = [q[0][0] * p[0] + q[0][1] * p[1], q[1][0] * p[0] + q[1][1] * p[1]]
+        pqp = p[0] * qp[0] + p[1] * qp[1]
+        active &= np.maximum(np.abs(qp[0] - pqp), np.abs(qp[1] - pqp)) >= 0.005 / 2
+        if not active.any():
+            break
+        for t in (0, 1):
+            diff = np.where(active, (pqp - qp[t]) / q[t][t], 0.0)
+            p[t] = p[t] + diff
+            pqp = (pqp + diff * (diff * q[t][t] + 2 * qp[t])) / (1 + diff) / (1 + diff)
+            qp = [(qp[j] + diff * q[t][j]) / (1 + diff) for j in (0, 1)]
+            p = [p[j] / (1 + diff) for j in (0, 1)]
+    return np.column_stack(p)
+
+
+class KernelSVM:
+    """
+    Binary SVM scored with batched float32 kernel matrices.
+
+    Supports ``predict_proba`` (when the SVM was fitted with
+    ``probability=True``), ``predict``, ``decision_function``, ``classes_``
+    and ``n_features_in_`` like the scikit-learn model, with the bundle's
+    scaler applied first.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], path: Optional[str] = None):
+        self.path = path
+        self.metadata = json.loads(str(arrays["__metadata__"]))
+        if self.metadata.get("format_version") != KERNEL_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported format, recompile it")
+        self.source_sha256 = str(arrays["__source_sha256__"]) if "__source_sha256__" in arrays else None
+        self.method = self.metadata["method"]
+        self.params = self.metadata["kernel"]
+        self.classes_ = np.array(self.metadata["classes"])
+        self.n_features_in_ = self.metadata["n_features"]
+        # Probability error against scikit-learn, measured at compile time
+        self.error = self.metadata.get("error")
+
+        self.intercept = float(arrays["intercept"])
+        # Stored float32; accumulated in float64, since large dual coefficients cancel
+        self.dual_coef = arrays["dual_coef"].astype(np.float64)
+        self.support_vectors = arrays.get("support_vectors")
+        self.projection = arrays.get("projection")
+        self.offset = arrays.get("offset")
+        self.prob_a = float(arrays["prob_a"]) if "prob_a" in arrays else None
+        self.prob_b = float(arrays["prob_b"]) if "prob_b" in arrays else None
+        self.scaler_mean = arrays.get("scaler_mean")
+        self.scaler_scale = arrays.get("scaler_scale")
+        self.support_squared_norms = None
+        if self.support_vectors is not None and self.params["kernel"] == "rbf":
+            self.support_squared_norms = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+
+    def _transform(self, X) -> np.ndarray:
+        """Fused scaler in float64 (as ``ModelBundle``), then float32 for the kernel products."""
+        X = np.array(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, but the model expects (n_samples, {self.n_features_in_})")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        if self.scaler_mean is not None:
+            X -= self.scaler_mean
+        if self.scaler_scale is not None:
+            X /= self.scaler_scale
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def _features(self, X: np.ndarray) -> np.ndarray:
+        """Kernel (or feature map) values of a block, one row per sample, matching ``dual_coef``."""
+        if self.projection is not None:
+            Z = X @ self.projection
+            Z += self.offset
+            np.cos(Z, out=Z)
+            return Z
+        return kernel_matrix(X, self.support_vectors, self.params, self.support_squared_norms)
+
+    def decision_function(self, X) -> np.ndarray:
+        X = self._transform(X)
+        decision = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            decision[start:start + len(block)] = self._features(block).astype(np.float64) @ self.dual_coef
+        return decision + self.intercept
+
+    def _predict_proba(self, X) -> np.ndarray:
+        # libsvm's decision value for the first class is the negated public one
+        r = _sigmoid_predict(-self.decision_function(X), self.prob_a, self.prob_b)
+        return _pairwise_coupling(np.clip(r, MIN_PROBABILITY, 1 - MIN_PROBABILITY))
+
+    @property
+    def predict_proba(self):
+        # Absent, as on the scikit-learn model, when fitted without probability estimates
+        if self.prob_a is None:
+            raise AttributeError("predict_proba is not available when the SVM was fitted with probability=False")
+        return self._predict_proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(np.int64)]
+
+
+def load_kernel_model(model_type: str, backend: str) -> KernelSVM:
+    path = kernel_model_path(model_type, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"SVM {backend} model not found at {path} (run python -m app.models.svm_backend compile --models {model_type})"
+        )
+    with np.load(path, allow_pickle=False) as data:
+        model = KernelSVM(dict(data), path)
+    estimator_path = ESTIMATOR_PATHS[model_type]
+    if os.path.exists(estimator_path) and file_sha256(estimator_path) != model.source_sha256:
+        raise ValueError(f"{path} is stale: {estimator_path} changed since it was compiled")
+    return model
+
+
+def probability_error(model: KernelSVM, reference: Any, X: np.ndarray) -> dict:
+    """Error of a kernel model against the scikit-learn model (or bundle) on raw feature rows."""
+    decision_flips = int((model.predict(X) != reference.predict(X)).sum())
+    error = {"rows": int(len(X)), "decision_flips": decision_flips}
+    if model.prob_a is not None:
+        diff = np.abs(model.predict_proba(X)[:, 1] - reference.predict_proba(X)[:, 1])
+        error.update(max=float(diff.max()), p99=float(np.quantile(diff, 0.99)), mean=float(diff.mean()))
+    return error
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile the SVM to batched float32 kernel arrays")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser("compile", help="Write the exact and approximate kernel artifacts")
+    compile_parser.add_argument("--models", nargs="+", choices=KERNEL_MODEL_TYPES, default=KERNEL_MODEL_TYPES)
+    compile_parser.add_argument("--method", choices=APPROXIMATION_METHODS, default="nystroem")
+    compile_parser.add_argument("--components", type=int, default=256, help="Landmarks or random features")
+    compile_parser.add_argument(
+        "--max-probability-error", type=float, default=MAX_PROBABILITY_ERROR,
+        help="Do not write an artifact whose maximum probability error exceeds this"
+    )
+    compile_parser.add_argument(
+        "--max-decision-flips", type=int, default=0,
+        help="Do not write an artifact that flips more decisions than this"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "compile":
+        import warnings
+
+        from app.services.koi_catalog import KOI_TEST_DATA_PATH, KOICatalog
+
+        for model_type in args.models:
+            estimator_path = ESTIMATOR_PATHS[model_type]
+            if not os.path.exists(estimator_path):
+                print(f"{model_type}: skipped, {estimator_path} not found")
+                continue
+            bundle = build_model_bundle(model_type)
+            if not is_svc(bundle.estimator):
+                print(f"{model_type}: skipped, {estimator_path} is a {type(bundle.estimator).__name__}, not an SVM")
+                continue
+
+            features = KOICatalog(KOI_TEST_DATA_PATH).features
+            source_sha256 = np.array(file_sha256(estimator_path))
+            start = time.perf_counter()
+            exact = compile_svm(bundle.estimator, bundle.scaler_mean, bundle.scaler_scale)
+            variants = {"kernel": exact}
+            if exact["support_vectors"].shape[0] > 1:
+                variants["kernel-approx"] = approximate_svm(exact, args.method, args.components)
+
+            for backend, arrays in variants.items():
+                arrays["__source_sha256__"] = source_sha256
+                with warnings.catch_warnings():
+                    # The estimator was fitted on a DataFrame; the catalog is a plain array
+                    warnings.simplefilter("ignore", UserWarning)
+                    error = probability_error(KernelSVM(arrays), bundle, features)
+                metadata = json.loads(str(arrays["__metadata__"]))
+                metadata["error"] = error
+                arrays["__metadata__"] = np.array(json.dumps(metadata))
+
+                summary = (
+                    f"{metadata['method']}, {metadata['n_components']} of {metadata['n_support']} vectors, "
+                    f"max probability error {error.get('max', float('nan')):.2e}, "
+                    f"{error['decision_flips']} of {error['rows']} decisions flipped"
+                )
+                path = kernel_model_path(model_type, backend)
+                if error.get("max", 0.0) > args.max_probability_error or error["decision_flips"] > args.max_decision_flips:
+                    # Remove an artifact from an earlier compile too, so the backend cannot be selected with it
+                    removed = ""
+                    if os.path.exists(path):
+                        os.remove(path)
+                        removed = f", removed the previous {path}"
+                    print(
+                        f"{model_type} {backend}: not written, {summary} (limits: probability error "
+                        f"{args.max_probability_error:g}, {args.max_decision_flips} flips){removed}"
+                    )
+                    continue
+                save_kernel_model(arrays, path)
+                print(f"{model_type} {backend}: wrote {path} ({summary}) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
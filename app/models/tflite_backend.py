@@ -0,0 +1,219 @@
+"""
+TensorFlow Lite variants of the deep learning models.
+
+The Keras models are converted once, offline, into two TFLite variants:
+
+- ``float16``: weights stored as float16, computation in float32
+- ``int8``: dynamic-range quantization (int8 weights, activations quantized
+  on the fly per batch)
+
+and served through the TFLite interpreter instead of the TensorFlow runtime.
+A ``TFLiteModel`` is called like ``model_loader.ServingFunction``: one
+float32 array per model input in, the model's output batch out.
+
+The interpreter comes from ``ai_edge_litert`` or ``tflite_runtime`` when one
+of them is installed, so serving a TFLite variant does not need TensorFlow
+itself; otherwise ``tensorflow.lite`` is used. Converting needs TensorFlow:
+
+    python -m app.models.tflite_backend convert [--models cnn dnn] [--variants float16 int8]
+
+Use ``python -m scripts.check_parity tflite`` to compare each variant's
+accuracy and latency against the Keras model before switching a backend.
+"""
+
+import argparse
+import os
+import threading
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MODEL_DIR = "models"
+KERAS_MODEL_PATHS = {
+    "cnn": os.path.join(MODEL_DIR, "cnn", "exchron-cnn.keras"),
+    "dnn": os.path.join(MODEL_DIR, "dnn", "exchron-dnn.keras")
+}
+TFLITE_VARIANTS = ["float16", "int8"]
+
+# Per-row input shapes, in the order the serving functions take them
+INPUT_SHAPES = {
+    "cnn": [(3000, 1)],
+    "dnn": [(3000,), (12,)]
+}
+
+# Interpreter threads per call (0: let the runtime decide)
+TFLITE_THREADS = int(os.getenv("EXCHRON_TFLITE_THREADS", "0"))
+
+
+def tflite_path(model_type: str, variant: str) -> str:
+    """Path of a converted model, e.g. models/cnn/exchron-cnn.int8.tflite"""
+    return os.path.join(MODEL_DIR, model_type, f"exchron-{model_type}.{variant}.tflite")
+
+
+def interpreter_class():
+    """The lightest available TFLite interpreter implementation."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """
+    A converted model served through the TFLite interpreter.
+
+    Interpreters are not thread-safe and are sized for one batch shape, so
+    batches are zero-padded up to a power of two and each padded size gets
+    its own interpreter, used under a lock.
+    """
+
+    def __init__(self, model_type: str, path: str):
+        self.model_type = model_type
+        self.path = path
+        self.variant = os.path.basename(path).split(".")[-2]
+        self.input_shapes = INPUT_SHAPES[model_type]
+        # Never XLA-compiled; kept for parity with ServingFunction
+        self.jit_compile = False
+        with open(path, "rb") as f:
+            self._content = f.read()
+
+        self._interpreter_cls = interpreter_class()
+        self._interpreters: Dict[int, Tuple[threading.Lock, object, List[int], int]] = {}
+        self._lock = threading.Lock()
+        self._interpreter(1)
+
+    def _new_interpreter(self, batch_size: int) -> Tuple[threading.Lock, object, List[int], int]:
+        kwargs = {"model_content": self._content}
+        if TFLITE_THREADS:
+            kwargs["num_threads"] = TFLITE_THREADS
+        with warnings.catch_warnings():
+            # tf.lite.Interpreter warns that it moved to ai_edge_litert
+            warnings.simplefilter("ignore")
+            interpreter = self._interpreter_cls(**kwargs)
+
+        # Match interpreter inputs to the serving order by their per-row shape
+        details = interpreter.get_input_details()
+        input_indices = []
+        for shape in self.input_shapes:
+            matches = [d["index"] for d in details if tuple(d["shape"][1:]) == shape]
+            if len(matches) != 1:
+                raise ValueError(f"{self.path} has no unique input of shape (None, {', '.join(map(str, shape))})")
+            input_indices.append(matches[0])
+            interpreter.resize_tensor_input(matches[0], [batch_size, *shape])
+        interpreter.allocate_tensors()
+        output_index = interpreter.get_output_details()[0]["index"]
+        return threading.Lock(), interpreter, input_indices, output_index
+
+    def _interpreter(self, batch_size: int) -> Tuple[threading.Lock, object, List[int], int]:
+        with self._lock:
+            if batch_size not in self._interpreters:
+                self._interpreters[batch_size] = self._new_interpreter(batch_size)
+            return self._interpreters[batch_size]
+
+    def dummy_inputs(self, batch_size: int) -> List[np.ndarray]:
+        return [np.zeros((batch_size,) + shape, dtype=np.float32) for shape in self.input_shapes]
+
+    def __call__(self, *inputs: np.ndarray) -> np.ndarray:
+        """Run inference on a batch; one array per model input, float32-castable."""
+        if len(inputs) != len(self.input_shapes):
+            raise ValueError(f"{self.model_type} expects {len(self.input_shapes)} inputs, got {len(inputs)}")
+        arrays = [np.asarray(x, dtype=np.float32) for x in inputs]
+        batch_size = arrays[0].shape[0]
+
+        # Pad the batch to a power of two to bound the number of interpreters
+        padded_size = 1 << max(batch_size - 1, 0).bit_length()
+        if padded_size != batch_size:
+            arrays = [
+                np.concatenate([x, np.zeros((padded_size - batch_size,) + x.shape[1:], dtype=np.float32)])
+                for x in arrays
+            ]
+
+        lock, interpreter, input_indices, output_index = self._interpreter(padded_size)
+        with lock:
+            for index, x in zip(input_indices, arrays):
+                interpreter.set_tensor(index, np.ascontiguousarray(x))
+            interpreter.invoke()
+            # get_tensor copies, so the result outlives the next invoke
+            return interpreter.get_tensor(output_index)[:batch_size]
+
+    def predict(self, x, batch_size: int = 32, verbose: int = 0) -> np.ndarray:
+        """``keras.Model.predict``-style call over a whole input set, in batches."""
+        inputs = x if isinstance(x, (list, tuple)) else [x]
+        return np.concatenate([
+            self(*[array[i:i + batch_size] for array in inputs])
+            for i in range(0, len(inputs[0]), batch_size)
+        ])
+
+
+def load_tflite_model(model_type: str, variant: str) -> TFLiteModel:
+    path = tflite_path(model_type, variant)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"TFLite {variant} model not found at {path} "
+            f"(run python -m app.models.tflite_backend convert --models {model_type})"
+        )
+    return TFLiteModel(model_type, path)
+
+
+def convert_model(keras_model, variant: str) -> bytes:
+    """Convert a loaded Keras model to a TFLite flatbuffer."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant != "int8":
+        raise ValueError(f"Unknown TFLite variant: {variant}. Supported variants: {', '.join(TFLITE_VARIANTS)}")
+    return converter.convert()
+
+
+def write_tflite_model(content: bytes, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert the Keras models to TFLite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Write float16 and dynamic-range int8 TFLite variants")
+    convert_parser.add_argument("--models", nargs="+", choices=list(KERAS_MODEL_PATHS), default=list(KERAS_MODEL_PATHS))
+    convert_parser.add_argument("--variants", nargs="+", choices=TFLITE_VARIANTS, default=TFLITE_VARIANTS)
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        import tensorflow as tf
+
+        for model_type in args.models:
+            keras_path = KERAS_MODEL_PATHS[model_type]
+            if not os.path.exists(keras_path):
+                print(f"{model_type}: skipped, {keras_path} not found")
+                continue
+            model = tf.keras.models.load_model(keras_path)
+            for variant in args.variants:
+                start = time.perf_counter()
+                content = convert_model(model, variant)
+                path = tflite_path(model_type, variant)
+                write_tflite_model(content, path)
+                print(
+                    f"{model_type}: wrote {path} ({len(content) / 1e6:.2f} MB, "
+                    f"keras {os.path.getsize(keras_path) / 1e6:.2f} MB) in {time.perf_counter() - start:.2f}s"
+                )
+
+
+if __name__ == "__main__":
+    main()
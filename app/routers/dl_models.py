@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.requests import DLModelRequest
-from app.schemas.responses import DLPredictionResponse, ErrorResponse
+from fastapi import APIRouter, HTTPException, Query
+from app.schemas.requests import ArchiveLinksRequest, DLModelRequest
+from app.schemas.responses import BulkArchiveLinksResponse, DLPredictionResponse, ErrorResponse
 from app.services.prediction_service import get_dl_prediction
 from app.services.data_service import check_kepid_exists, get_ground_truth
-from typing import Union
-import os
-import pandas as pd
+from app.services.execution import run_io
+from app.services.kepid_catalog import get_kepid_catalog
+from app.services.url_service import get_bulk_archive_links
+from typing import Optional, Union
 
 router = APIRouter()
 
@@ -61,72 +62,69 @@ async def list_dl_models():
     }
 
 @router.get("/available-ids")
-async def get_available_kepler_ids():
-    """Get list of available Kepler IDs in the dataset"""
+async def get_available_kepler_ids(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=1000),
+    label: Optional[str] = None,
+    min_length: Optional[int] = Query(None, ge=0),
+    max_length: Optional[int] = Query(None, ge=0)
+):
+    """Get a page of available Kepler IDs, optionally filtered by label or lightcurve length"""
     try:
-        data_dir = "data/lightkurve_data"
-        if not os.path.exists(data_dir):
+        catalog = await run_io(get_kepid_catalog)
+        if len(catalog) == 0:
             return {"error": "Data directory not found"}
         
-        # Get all kepler files
-        files = [f for f in os.listdir(data_dir) if f.startswith("kepler_") and f.endswith(".csv")]
-        
-        # Extract kepler IDs
-        kepler_ids = []
-        for file in files:
-            try:
-                # Extract ID from filename like "kepler_10904857_lightkurve.csv"
-                kepid = file.replace("kepler_", "").replace("_lightkurve.csv", "")
-                kepler_ids.append(kepid)
-            except:
-                continue
-        
-        # Sort numerically
-        kepler_ids.sort(key=lambda x: int(x))
-        
-        # Get ground truth labels if available
-        labeled_ids = []
         try:
-            metadata_path = "data/lightkurve_test_metadata.csv"
-            if os.path.exists(metadata_path):
-                metadata = pd.read_csv(metadata_path)
-                for kepid in kepler_ids[:20]:  # Show first 20 with labels
-                    label = None
-                    row = metadata[metadata['kepid'] == int(kepid)]
-                    if not row.empty:
-                        label = row.iloc[0]['koi_disposition']
-                    labeled_ids.append({"kepid": kepid, "ground_truth": label})
-        except:
-            labeled_ids = [{"kepid": kepid, "ground_truth": None} for kepid in kepler_ids[:20]]
+            entries, next_cursor, total_matching = catalog.page(
+                cursor=cursor, limit=limit, label=label, min_length=min_length, max_length=max_length
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
-            "total_available": len(kepler_ids),
-            "sample_ids": labeled_ids,
-            "note": "Use any of these Kepler IDs for predictions"
+            "total_available": len(catalog),
+            "total_matching": total_matching,
+            "sample_ids": entries,
+            "next_cursor": next_cursor,
+            "note": "Use any of these Kepler IDs for predictions. Pass next_cursor as ?cursor= for the next page."
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": f"Failed to retrieve available IDs: {str(e)}"}
 
+@router.post("/archive-links", response_model=BulkArchiveLinksResponse)
+async def get_archive_links_bulk(request: ArchiveLinksRequest):
+    """Resolve lightcurve, target pixel file and DV report links for many Kepler IDs at once"""
+    invalid = [kepid for kepid in request.kepids if not kepid.isdigit()]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid Kepler IDs (must be numeric): {invalid[:10]}"
+        )
+    
+    # Links come from the in-memory DV path index; off the event loop in case it is still being built
+    links = await run_io(get_bulk_archive_links, request.kepids)
+    return {"total": len(links), "links": links}
+
 @router.get("/debug-features/{kepid}")
 async def debug_features(kepid: str):
     """Debug endpoint to inspect feature extraction and normalization"""
     try:
-        from app.services.data_service import get_engineered_features
+        from app.services.data_service import get_preprocessed_lightcurve
         from app.services.feature_normalizer import get_feature_normalizer
         
-        # Get raw and normalized features
-        normalized_features = await get_engineered_features(kepid)
+        # Get raw and normalized features from the same preprocessing pass
+        lightcurve = await get_preprocessed_lightcurve(kepid)
+        normalized_features = lightcurve.features
+        raw_features = lightcurve.raw_features.reshape(1, -1)
         
         # Get normalizer info
         normalizer = get_feature_normalizer()
         feature_info = normalizer.get_feature_info()
         
-        # Calculate raw features for comparison
-        import numpy as np
-        raw_features = (normalized_features * np.array([info['std'] for info in feature_info]).reshape(1, -1) + 
-                       np.array([info['mean'] for info in feature_info]).reshape(1, -1))
-        
         # Format response
         features_comparison = []
         for i, info in enumerate(feature_info):
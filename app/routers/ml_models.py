@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from app.schemas.requests import MLModelRequest
 from app.schemas.responses import MLPredictionResponse, AveragedMLPredictionResponse, UploadMLPredictionResponse, ErrorResponse
 from app.services.prediction_service import get_ml_prediction, get_averaged_ml_prediction, get_upload_ml_prediction
+from app.services.csv_scoring import CSV_CHUNK_ROWS, CSVScoringJob
 from typing import Union, Dict, Any
 
 router = APIRouter()
@@ -106,6 +108,24 @@ async def predict_with_ml_model(request: Dict[str, Any]):
     except Exception as e:
         return ErrorResponse(error=str(e))
 
+@router.post("/predict-csv")
+async def predict_csv_with_ml_model(
+    file: UploadFile = File(..., description="KOI CSV with the 14 columns listed by /api/ml/features"),
+    model: str = Form(..., description="ML model type (gb or svm)"),
+    output_format: str = Form("ndjson", description="Result format: ndjson or csv"),
+    chunk_rows: int = Form(CSV_CHUNK_ROWS, description="Rows parsed and scored per chunk")
+):
+    """Score every row of an uploaded KOI CSV, streaming results back while scoring continues"""
+    job = CSVScoringJob(model, file.file, output_format=output_format, chunk_rows=chunk_rows)
+    
+    # Header and model problems are reported as a normal error status before streaming starts
+    await job.start()
+    return StreamingResponse(
+        job.stream(),
+        media_type=job.media_type,
+        headers={"Content-Disposition": f"attachment; filename=predictions-{model}.{output_format}"}
+    )
+
 @router.get("/models")
 async def list_ml_models():
     """List available machine learning models"""
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from pydantic import BaseModel, Field
 
 class ModelType(str, Enum):
@@ -23,6 +23,9 @@ class DLModelRequest(BaseModel):
     kepid: str = Field(..., description="Kepler ID for the target exoplanet")
     predict: bool = Field(True, description="Flag to run prediction")
 
+class ArchiveLinksRequest(BaseModel):
+    kepids: List[str] = Field(..., description="Kepler IDs to resolve archive links for", max_length=10000, examples=[["10904857", "9652632"]])
+
 class MLModelRequest(BaseModel):
     model: ModelType = Field(..., description="ML model type (gb or svm)", examples=["gb", "svm"])
     datasource: DataSource = Field(..., description="Source of input data", examples=["manual", "test", "pre-loaded", "upload"])
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 
 class DLPredictionResponse(BaseModel):
     candidate_probability: float = Field(..., description="Probability of being an exoplanet candidate")
@@ -10,6 +10,16 @@ class DLPredictionResponse(BaseModel):
     kepid: str = Field(..., description="Kepler ID used for prediction")
     model_used: str = Field(..., description="Model used for prediction")
 
+class ArchiveLinks(BaseModel):
+    kepid: str = Field(..., description="Kepler ID")
+    lightcurve_link: str = Field(..., description="Link to the STScI archive for lightcurve data files")
+    target_pixel_file_link: str = Field(..., description="Link to the STScI archive for target pixel files")
+    dv_report_link: str = Field(..., description="Link to the NASA Exoplanet Archive DV report")
+
+class BulkArchiveLinksResponse(BaseModel):
+    total: int = Field(..., description="Number of Kepler IDs resolved")
+    links: List[ArchiveLinks] = Field(..., description="Archive links for each Kepler ID, in request order")
+
 class MLPredictionResponse(BaseModel):
     candidate_probability: float = Field(..., description="Probability of being an exoplanet candidate")
     non_candidate_probability: float = Field(..., description="Probability of not being an exoplanet candidate")
@@ -0,0 +1,150 @@
+"""
+Streaming GB/SVM scoring of uploaded KOI CSV files.
+
+The CSV is parsed in fixed-size chunks; each chunk is turned into an
+(N, 14) feature matrix, scored with one model call and serialized before
+the next chunk is read. Only one chunk is held in memory at a time, so
+memory stays flat regardless of the number of rows.
+"""
+
+import json
+import os
+from typing import AsyncIterator, BinaryIO, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.models.model_loader import get_model
+from app.services.execution import run_io
+from app.services.koi_catalog import IMPUTE_VALUE, get_koi_feature_names
+from app.services.prediction_service import score_feature_matrix
+
+# Rows parsed and scored per chunk
+CSV_CHUNK_ROWS = int(os.getenv("EXCHRON_CSV_CHUNK_ROWS", "10000"))
+# Largest chunk a client may request, so one chunk cannot hold the whole upload in memory
+CSV_MAX_CHUNK_ROWS = int(os.getenv("EXCHRON_CSV_MAX_CHUNK_ROWS", "100000"))
+
+OUTPUT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+OUTPUT_COLUMNS = ["row", "kepid", "candidate_probability", "non_candidate_probability", "error"]
+
+
+class CSVScoringJob:
+    """Chunked reader and scorer for one uploaded KOI CSV file."""
+
+    def __init__(self, model_type: str, file: BinaryIO, output_format: str = "ndjson", chunk_rows: int = CSV_CHUNK_ROWS):
+        if model_type not in ['gb', 'svm']:
+            raise HTTPException(status_code=400, detail=f"Invalid model type: {model_type}. Must be 'gb' or 'svm'")
+        if output_format not in OUTPUT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid output format: {output_format}. Must be one of {list(OUTPUT_FORMATS)}"
+            )
+        if not 1 <= chunk_rows <= CSV_MAX_CHUNK_ROWS:
+            raise HTTPException(status_code=400, detail=f"chunk_rows must be between 1 and {CSV_MAX_CHUNK_ROWS}")
+
+        self.model_type = model_type
+        self.file = file
+        self.output_format = output_format
+        self.chunk_rows = chunk_rows
+        self.feature_names = get_koi_feature_names()
+        self.rows_scored = 0
+        self._model = None
+        self._reader = None
+        self._first_chunk: Optional[pd.DataFrame] = None
+
+    @property
+    def media_type(self) -> str:
+        return OUTPUT_FORMATS[self.output_format]
+
+    async def start(self):
+        """Load the model and validate the CSV header before any output is sent"""
+        self._model = await run_io(get_model, self.model_type)
+        try:
+            self._reader = await run_io(pd.read_csv, self.file, chunksize=self.chunk_rows)
+            self._first_chunk = await run_io(next, self._reader, None)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
+
+        if self._first_chunk is None:
+            raise HTTPException(status_code=400, detail="Invalid CSV file: no data rows")
+        missing = [name for name in self.feature_names if name not in self._first_chunk.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV file: missing required KOI features: {missing}")
+
+    async def _chunks(self) -> AsyncIterator[pd.DataFrame]:
+        chunk, self._first_chunk = self._first_chunk, None
+        while chunk is not None:
+            yield chunk
+            chunk = await run_io(next, self._reader, None)
+
+    def _parse_features(self, chunk: pd.DataFrame):
+        """
+        (N, 14) float64 features and a per-row error (None for valid rows).
+
+        Blank cells are missing values and imputed, as in the test datasource's
+        KOI catalog. Any other cell that is not a finite number makes the row
+        invalid, so it is reported instead of scored on an imputed value.
+        """
+        raw = chunk[self.feature_names]
+        features = raw.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        invalid = np.isinf(features)
+        for column, name in enumerate(self.feature_names):
+            values = raw[name]
+            if not pd.api.types.is_numeric_dtype(values):
+                # Strings that failed to parse; NaN and whitespace-only cells are blanks
+                blank = values.isna() | values.astype(str).str.strip().eq("")
+                invalid[:, column] |= np.isnan(features[:, column]) & ~blank.to_numpy()
+        features[np.isnan(features)] = IMPUTE_VALUE
+
+        errors = [None] * len(chunk)
+        for row in np.flatnonzero(invalid.any(axis=1)):
+            columns = [self.feature_names[column] for column in np.flatnonzero(invalid[row])]
+            errors[row] = f"Invalid value for {', '.join(columns)}"
+        return features, errors
+
+    async def _score_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        features, errors = self._parse_features(chunk)
+        valid = np.array([error is None for error in errors], dtype=bool)
+
+        candidate_probs = np.full(len(chunk), np.nan)
+        non_candidate_probs = np.full(len(chunk), np.nan)
+        if valid.any():
+            candidate_probs[valid], non_candidate_probs[valid] = await score_feature_matrix(self._model, features[valid])
+        start = self.rows_scored
+        self.rows_scored += len(chunk)
+        return pd.DataFrame({
+            "row": np.arange(start, self.rows_scored),
+            "kepid": chunk["kepid"].to_numpy() if "kepid" in chunk.columns else None,
+            "candidate_probability": candidate_probs,
+            "non_candidate_probability": non_candidate_probs,
+            "error": errors
+        }, columns=OUTPUT_COLUMNS)
+
+    def _serialize(self, results: pd.DataFrame, header: bool) -> str:
+        if self.output_format == "csv":
+            return results.to_csv(index=False, header=header, float_format="%.17g")
+        text = results.to_json(orient="records", lines=True, double_precision=15)
+        return text if text.endswith("\n") else text + "\n"
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Yield serialized results chunk by chunk; scoring of the next chunk starts after the previous is sent"""
+        header = True
+        try:
+            async for chunk in self._chunks():
+                results = await self._score_chunk(chunk)
+                yield await run_io(self._serialize, results, header)
+                header = False
+        except Exception as e:
+            # The status code is already sent, so report the failure in-band
+            message = f"Failed to score CSV at row {self.rows_scored}: {str(e)}"
+            if self.output_format == "csv":
+                yield f"# error: {message}\n"
+            else:
+                yield json.dumps({"error": message}) + "\n"
+        finally:
+            self.file.close()
@@ -0,0 +1,145 @@
+"""
+Execution pools that keep blocking work off the asyncio event loop.
+
+Work is split into three stages, each with its own executor and a bounded
+number of pending jobs:
+
+- ``io``: file and CSV reads (thread pool)
+- ``preprocess``: lightcurve clipping and feature extraction (thread or process pool)
+- ``inference``: model calls such as ``predict_on_batch`` and ``predict_proba`` (thread pool)
+
+When a stage is full, callers wait for a slot instead of piling more work
+onto the executor, so a burst of slow requests applies back-pressure rather
+than growing an unbounded queue.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+_CPU_COUNT = os.cpu_count() or 1
+
+# Pool configuration
+IO_WORKERS = int(os.getenv("EXCHRON_IO_WORKERS", "8"))
+PREPROCESS_POOL = os.getenv("EXCHRON_PREPROCESS_POOL", "thread").lower()
+PREPROCESS_WORKERS = int(os.getenv("EXCHRON_PREPROCESS_WORKERS", str(min(4, _CPU_COUNT))))
+INFERENCE_WORKERS = int(os.getenv("EXCHRON_INFERENCE_WORKERS", "2"))
+
+# Maximum jobs queued or running per stage before callers wait
+IO_QUEUE_SIZE = int(os.getenv("EXCHRON_IO_QUEUE_SIZE", "256"))
+PREPROCESS_QUEUE_SIZE = int(os.getenv("EXCHRON_PREPROCESS_QUEUE_SIZE", "256"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("EXCHRON_INFERENCE_QUEUE_SIZE", "64"))
+
+
+class ExecutionStage:
+    """An executor plus a bound on how many jobs may be pending on it."""
+
+    def __init__(self, name: str, executor_factory: Callable[[], Executor], max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending = 0
+        self.completed = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._executor_factory()
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; recreate if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` on this stage's executor and await the result."""
+        async with self._get_semaphore():
+            self.pending += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, functools.partial(fn, *args, **kwargs)
+                )
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "started": self._executor is not None,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed
+        }
+
+
+def _make_preprocess_executor() -> Executor:
+    if PREPROCESS_POOL == "process":
+        # Spawn rather than fork: the parent may already hold TensorFlow threads
+        return ProcessPoolExecutor(
+            max_workers=PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="exchron-preprocess")
+
+
+_stages: Dict[str, ExecutionStage] = {
+    "io": ExecutionStage(
+        "io",
+        lambda: ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="exchron-io"),
+        IO_QUEUE_SIZE
+    ),
+    "preprocess": ExecutionStage("preprocess", _make_preprocess_executor, PREPROCESS_QUEUE_SIZE),
+    "inference": ExecutionStage(
+        "inference",
+        lambda: ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="exchron-inference"),
+        INFERENCE_QUEUE_SIZE
+    ),
+}
+
+
+def get_execution_stage(name: str) -> ExecutionStage:
+    """Get an execution stage by name (io, preprocess or inference)."""
+    if name not in _stages:
+        raise ValueError(f"Unknown execution stage: {name}. Supported stages: {', '.join(_stages)}")
+    return _stages[name]
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run blocking file/CSV work on the I/O pool."""
+    return await _stages["io"].run(fn, *args, **kwargs)
+
+
+async def run_preprocess(fn: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound preprocessing on the preprocessing pool."""
+    return await _stages["preprocess"].run(fn, *args, **kwargs)
+
+
+async def run_inference(fn: Callable, *args, **kwargs) -> Any:
+    """Run a model call on the inference pool."""
+    return await _stages["inference"].run(fn, *args, **kwargs)
+
+
+def get_execution_stats() -> dict:
+    """Return pending/completed counters for every stage."""
+    return {name: stage.stats() for name, stage in _stages.items()}
+
+
+def shutdown_execution_pools(wait: bool = True):
+    """Shut down all executors; they are recreated on next use."""
+    for stage in _stages.values():
+        stage.shutdown(wait=wait)
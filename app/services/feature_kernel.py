@@ -0,0 +1,119 @@
+"""
+Fused kernel for the 12 engineered lightcurve features used by the DNN.
+
+All features come from one sort and one pass over the centered flux: the
+sorted values give min, max and the quartiles, and the centered values give
+the standard deviation, skewness, kurtosis and mean absolute deviation. The
+arithmetic follows what ``np.std``, ``np.quantile`` and ``scipy.stats``
+skew/kurtosis do, in the same order, so results are identical to computing
+each feature separately with those functions.
+
+Works on a single 1-D flux array or on a zero-padded (N, L) batch with
+per-row lengths (see ``lightcurve_preprocessor.pack_flux``).
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# Feature order expected by the DNN and the feature normalizer
+FEATURE_NAMES = [
+    "mean", "std", "skewness", "kurtosis", "min", "max",
+    "range", "median", "q25", "q75", "iqr", "mad"
+]
+
+_QUANTILES = np.array([0.25, 0.5, 0.75])
+
+
+def valid_mask(lengths: np.ndarray, width: int) -> np.ndarray:
+    """(N, width) boolean mask of the valid (non-padding) entries of packed rows."""
+    return np.arange(width) < lengths[:, None]
+
+
+def row_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Sum the first ``lengths[i]`` entries of each row, exactly as ``values[i, :lengths[i]].sum()``."""
+    # A 2-D reduction adds in a different order than NumPy's 1-D pairwise
+    # sum, so each row's valid prefix is reduced on its own
+    sums = np.empty(len(values), dtype=np.float64)
+    for i, n in enumerate(lengths.tolist()):
+        sums[i] = values[i, :n].sum()
+    return sums
+
+
+def _scalar_power(values: np.ndarray, exponent: float) -> np.ndarray:
+    """Elementwise power through the scalar pow scipy uses; NumPy's vectorized pow can differ in the last bit."""
+    return np.array([value ** exponent for value in values.tolist()], dtype=np.float64)
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Linear interpolation in the form ``np.quantile`` uses."""
+    diff_b_a = b - a
+    return np.where(t >= 0.5, b - diff_b_a * (1 - t), a + diff_b_a * t)
+
+
+def engineered_features(values: np.ndarray, lengths: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compute the 12 engineered features.
+
+    Args:
+        values: 1-D clipped flux, or (N, L) packed rows
+        lengths: Valid entries per row when ``values`` is 2-D (default: all L)
+
+    Returns:
+        (12,) float64 features for a 1-D input, otherwise (N, 12)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return engineered_features(values[None, :])[0]
+
+    n_rows, width = values.shape
+    if lengths is None:
+        lengths = np.full(n_rows, width, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    mask = valid_mask(lengths, width)
+    rows = np.arange(n_rows)
+    features = np.empty((n_rows, len(FEATURE_NAMES)), dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Moments: one centered array, powers built as scipy's _moment does
+        mean = row_sums(values, lengths) / lengths
+        centered = np.where(mask, values - mean[:, None], 0.0)
+        squared = centered * centered
+        sum_squared = row_sums(squared, lengths)
+        m2 = sum_squared / lengths
+        m3 = row_sums(squared * centered, lengths) / lengths
+        m4 = row_sums(squared * squared, lengths) / lengths
+
+        # scipy returns NaN for (numerically) constant input
+        zero = m2 <= (np.finfo(np.float64).eps * mean) ** 2
+        features[:, 0] = mean
+        features[:, 1] = np.sqrt(sum_squared / (lengths - 1))
+        features[:, 2] = np.where(zero, np.nan, m3 / _scalar_power(m2, 1.5))
+        features[:, 3] = np.where(zero, np.nan, m4 / _scalar_power(m2, 2.0)) - 3
+        features[:, 11] = row_sums(np.abs(centered), lengths) / lengths
+
+        # Order statistics: one sort, padding sorted to the end of each row
+        ordered = np.sort(np.where(mask, values, np.inf), axis=1)
+        last = np.maximum(lengths - 1, 0)
+        minimum = ordered[:, 0]
+        maximum = ordered[rows, last]
+
+        # Linear interpolation between the closest ranks, as np.quantile's default method
+        virtual = (lengths - 1)[:, None] * _QUANTILES
+        previous = np.floor(virtual).astype(np.int64)
+        following = np.minimum(previous + 1, last[:, None])
+        gamma = virtual - previous
+        q25, median, q75 = _lerp(
+            np.take_along_axis(ordered, previous, axis=1),
+            np.take_along_axis(ordered, following, axis=1),
+            gamma
+        ).T
+
+    features[:, 4] = minimum
+    features[:, 5] = maximum
+    features[:, 6] = maximum - minimum
+    features[:, 7] = median
+    features[:, 8] = q25
+    features[:, 9] = q75
+    features[:, 10] = q75 - q25
+    return features
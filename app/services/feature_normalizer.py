@@ -1,13 +1,28 @@
 """
 Feature normalization parameters for DNN model.
-These parameters were derived from the training dataset to ensure 
-consistent preprocessing for inference.
+
+Statistics are loaded from a persisted ``.npz`` artifact written by
+``scripts.fit_feature_stats`` (one streaming pass over the lightcurve store).
+When no artifact is present, the built-in estimates below are used.
 """
 
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
 import numpy as np
 
-# Feature normalization parameters derived from training data
-# These ensure that inference features match the distribution the model was trained on
+from .feature_kernel import FEATURE_NAMES
+
+# Normalization statistics artifact (means, stds) written by scripts.fit_feature_stats
+FEATURE_STATS_PATH = os.getenv("EXCHRON_FEATURE_STATS", os.path.join("models", "dnn", "feature_stats.npz"))
+
+FEATURE_STATS_FORMAT_VERSION = 1
+
+# Normalized features are clipped to this range to prevent model instability
+CLIP_VALUE = 5.0
 
 class FeatureNormalizer:
     """
@@ -15,18 +30,21 @@ class FeatureNormalizer:
     Applies StandardScaler-like normalization using pre-computed statistics.
     """
     
-    def __init__(self):
-        # Mean and standard deviation values for each of the 12 engineered features
-        # These should be computed from the actual training dataset
-        # For now, using reasonable estimates based on normalized lightcurve data
+    def __init__(self, means: Optional[np.ndarray] = None, stds: Optional[np.ndarray] = None, source: str = "builtin"):
+        self.feature_names = list(FEATURE_NAMES)
+        self.source = source
+        self.metadata = {}
         
-        self.feature_names = [
-            'mean', 'std', 'skewness', 'kurtosis', 'min', 'max', 
-            'range', 'median', 'q25', 'q75', 'iqr', 'mad'
-        ]
+        if means is not None and stds is not None:
+            self.means = np.asarray(means, dtype=np.float64).reshape(-1)
+            self.stds = np.asarray(stds, dtype=np.float64).reshape(-1)
+            if self.means.shape != (12,) or self.stds.shape != (12,):
+                raise ValueError(f"Expected 12 means and stds, got {self.means.shape} and {self.stds.shape}")
+            self._fingerprint()
+            return
         
-        # Training set statistics (these would come from actual training data analysis)
-        # Currently using estimates - in production, these should be loaded from saved scaler
+        # Built-in estimates based on normalized lightcurve data, used until
+        # statistics are fitted with scripts.fit_feature_stats
         self.means = np.array([
             0.0,     # mean (flux already normalized to ~0 mean)
             1.0,     # std (flux normalized to ~1 std) 
@@ -56,26 +74,51 @@ class FeatureNormalizer:
             1.0,     # IQR std
             0.6      # MAD std
         ])
+        self._fingerprint()
+    
+    def _fingerprint(self):
+        # Identifies the statistics in cache keys and prediction table metadata
+        digest = hashlib.sha256(self.means.tobytes() + self.stds.tobytes()).hexdigest()
+        self.fingerprint = digest[:16]
     
-    def normalize(self, features):
+    @classmethod
+    def load(cls, path: str = FEATURE_STATS_PATH) -> "FeatureNormalizer":
+        """Load normalization statistics from an artifact written by ``write_feature_stats``."""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("format_version") != FEATURE_STATS_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported feature stats format {metadata.get('format_version')} "
+                    f"(expected {FEATURE_STATS_FORMAT_VERSION})"
+                )
+            if [str(name) for name in data["feature_names"]] != list(FEATURE_NAMES):
+                raise ValueError(f"Feature names in {path} do not match {FEATURE_NAMES}")
+            normalizer = cls(data["means"], data["stds"], source=path)
+        normalizer.metadata = metadata
+        return normalizer
+    
+    def normalize(self, features, out=None):
         """
         Normalize features using z-score normalization.
         
         Args:
-            features: np.array of shape (1, 12) containing raw engineered features
+            features: np.array of shape (N, 12) containing raw engineered features
+            out: Optional float64 (N, 12) array to write into (may be ``features`` itself)
             
         Returns:
-            np.array of shape (1, 12) containing normalized features
+            np.array of shape (N, 12) containing normalized features
         """
-        if features.shape != (1, 12):
-            raise ValueError(f"Expected features shape (1, 12), got {features.shape}")
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != 12:
+            raise ValueError(f"Expected features shape (N, 12), got {features.shape}")
         
-        # Apply z-score normalization: (x - mean) / std
-        normalized = (features - self.means.reshape(1, -1)) / self.stds.reshape(1, -1)
+        # Apply z-score normalization: (x - mean) / std, in a single output buffer
+        normalized = np.subtract(features, self.means, out=out)
+        np.divide(normalized, self.stds, out=normalized)
         
         # Clip extreme values to prevent model instability
         # This handles outliers that might cause extreme predictions
-        normalized = np.clip(normalized, -5.0, 5.0)
+        np.clip(normalized, -CLIP_VALUE, CLIP_VALUE, out=normalized)
         
         return normalized
     
@@ -109,12 +152,43 @@ class FeatureNormalizer:
         }
         return descriptions.get(name, 'Unknown feature')
 
+def write_feature_stats(path: str, means: np.ndarray, stds: np.ndarray, metadata: dict):
+    """
+    Write normalization statistics atomically.
+    
+    Args:
+        path: Output .npz path
+        means: (12,) feature means
+        stds: (12,) feature standard deviations
+        metadata: Artifact metadata (sample count, source, preprocessing version)
+    """
+    metadata = dict(metadata, format_version=FEATURE_STATS_FORMAT_VERSION)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        means=np.asarray(means, dtype=np.float64),
+        stds=np.asarray(stds, dtype=np.float64),
+        feature_names=np.array(FEATURE_NAMES),
+        metadata=np.array(json.dumps(metadata))
+    )
+    os.replace(tmp_path, path)
+
 # Global normalizer instance
 _feature_normalizer = None
+_feature_normalizer_lock = threading.Lock()
 
 def get_feature_normalizer():
-    """Get the global feature normalizer instance."""
+    """Get the global feature normalizer, loading fitted statistics if the artifact exists."""
     global _feature_normalizer
     if _feature_normalizer is None:
-        _feature_normalizer = FeatureNormalizer()
+        with _feature_normalizer_lock:
+            if _feature_normalizer is None:
+                normalizer = None
+                if os.path.exists(FEATURE_STATS_PATH):
+                    try:
+                        normalizer = FeatureNormalizer.load(FEATURE_STATS_PATH)
+                    except Exception as e:
+                        print(f"Warning: Could not load feature stats {FEATURE_STATS_PATH}, using built-in estimates: {e}")
+                _feature_normalizer = normalizer or FeatureNormalizer()
     return _feature_normalizer
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Dynamic micro-batching for CNN/DNN inference.
+
+Concurrent requests for the same model are collected into one batch, up to
+a maximum batch size or a maximum wait window after the first request
+arrives, and served by a single model call. Each caller receives its own
+output row.
+"""
+
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.models.model_loader import get_serving_fn
+from app.services.execution import run_inference
+from app.services.model_host import get_model_host_client, uses_model_host
+
+# Batching limits (max wait is measured from the first queued request)
+MAX_BATCH_SIZE = int(os.getenv("EXCHRON_BATCH_MAX_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EXCHRON_BATCH_MAX_WAIT_MS", "5"))
+
+
+class _PendingRequest:
+    __slots__ = ("inputs", "future")
+
+    def __init__(self, inputs: Sequence[np.ndarray], future: asyncio.Future):
+        self.inputs = inputs
+        self.future = future
+
+
+class InferenceScheduler:
+    """
+    Collects single-sample requests for one model into batches.
+
+    ``predict_fn`` receives a list with one stacked array per model input
+    (leading dimension = batch size) and must return an array whose rows
+    line up with the batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        predict_fn: Callable[[List[np.ndarray]], np.ndarray],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, inputs: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Queue one sample and wait for its prediction.
+
+        Args:
+            inputs: One array per model input, each with a leading batch
+                dimension of 1 (e.g. ``(1, 3000, 1)``)
+
+        Returns:
+            The model output row for this sample
+        """
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(inputs, future))
+        return await future
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # Keep collecting until the batch is full or the wait window closes
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests that arrived while we waited are taken without further delay
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._execute(batch)
+
+    async def _execute(self, batch: List[_PendingRequest]):
+        try:
+            n_inputs = len(batch[0].inputs)
+            stacked = [
+                np.concatenate([request.inputs[i] for request in batch], axis=0)
+                for i in range(n_inputs)
+            ]
+            outputs = await run_inference(self.predict_fn, stacked)
+            outputs = np.asarray(outputs)
+            # One output row per request, or zip below would leave some futures unresolved
+            if outputs.ndim == 0 or len(outputs) != len(batch):
+                raise RuntimeError(
+                    f"{self.name}: model returned {outputs.shape} outputs for a batch of {len(batch)} requests"
+                )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.requests += len(batch)
+        for row, request in zip(outputs, batch):
+            if not request.future.done():
+                request.future.set_result(row)
+
+    async def close(self):
+        """Stop the batching task; queued requests are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._queue.get_nowait().future.cancel()
+
+    def stats(self) -> dict:
+        """Return batch counters for this scheduler."""
+        return {
+            "model": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0
+        }
+
+
+def _keras_predict_fn(model_type: str) -> Callable[[List[np.ndarray]], np.ndarray]:
+    if uses_model_host(model_type):
+        def predict_on_host(inputs: List[np.ndarray]) -> np.ndarray:
+            # The model host batches this worker's batch again with other workers'
+            return get_model_host_client().predict(model_type, inputs)
+        return predict_on_host
+
+    def predict(inputs: List[np.ndarray]) -> np.ndarray:
+        # One compiled call for the whole batch
+        return get_serving_fn(model_type)(*inputs)
+    return predict
+
+
+# Schedulers per model type
+_schedulers: Dict[str, InferenceScheduler] = {}
+
+
+def get_inference_scheduler(model_type: str) -> InferenceScheduler:
+    """Get the batching scheduler for a deep learning model (cnn/dnn)."""
+    model_type = model_type.lower()
+    if model_type not in _schedulers:
+        _schedulers[model_type] = InferenceScheduler(model_type, _keras_predict_fn(model_type))
+    return _schedulers[model_type]
+
+
+async def close_inference_schedulers():
+    """Stop all batching tasks."""
+    for scheduler in _schedulers.values():
+        await scheduler.close()
@@ -0,0 +1,269 @@
+"""
+Catalog of every Kepler ID with lightcurve data.
+
+Built once at startup from the compiled lightcurve store and/or the
+lightcurve CSV directory, joined with the ground-truth labels in
+``lightkurve_test_metadata.csv``. Each entry records the label, the number
+of cadences and the CSV file size. The catalog refreshes incrementally:
+only new or changed files are inspected when the directory, store or
+metadata file changes.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .lightcurve_store import LIGHTKURVE_DATA_DIR, get_lightcurve_store
+
+DATA_DIR = "data"
+TEST_METADATA_PATH = os.path.join(DATA_DIR, "lightkurve_test_metadata.csv")
+
+_FILE_PREFIX = "kepler_"
+_FILE_SUFFIX = "_lightkurve.csv"
+
+
+def _count_csv_rows(path: str) -> int:
+    """Count data rows in a CSV file without parsing it."""
+    newlines = 0
+    last = b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            newlines += chunk.count(b"\n")
+            last = chunk[-1:]
+    lines = newlines + (1 if last not in (b"", b"\n") else 0)
+    return max(lines - 1, 0)
+
+
+class _CatalogSnapshot:
+    """Immutable arrays for one version of the catalog, sorted by kepid."""
+
+    def __init__(self, entries: Dict[int, dict]):
+        kepids = sorted(entries)
+        self.kepids = np.asarray(kepids, dtype=np.int64)
+        self.n_cadences = np.asarray([entries[k]["n_cadences"] for k in kepids], dtype=np.int64)
+        self.file_sizes = [entries[k]["file_size"] for k in kepids]
+        self.labels = [entries[k]["ground_truth"] for k in kepids]
+        self.labels_upper = np.asarray([(label or "").upper() for label in self.labels], dtype=object)
+        self._rows = {kepid: row for row, kepid in enumerate(kepids)}
+
+    def row(self, kepid: int) -> Optional[int]:
+        return self._rows.get(kepid)
+
+
+class KepidCatalog:
+    """
+    Index of lightcurve Kepler IDs with labels, cadence counts and file sizes.
+
+    ``refresh()`` is cheap when nothing changed (three ``stat`` calls) and is
+    run on every access, so new lightcurve files show up without a restart.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = LIGHTKURVE_DATA_DIR,
+        metadata_path: str = TEST_METADATA_PATH
+    ):
+        self.data_dir = data_dir
+        self.metadata_path = metadata_path
+        self._lock = threading.Lock()
+
+        # Per-source state used to detect changes
+        self._dir_mtime: Optional[float] = None
+        self._store_mtime: Optional[float] = None
+        self._metadata_mtime: Optional[float] = None
+        self._csv_files: Dict[int, Tuple[float, int, Optional[int]]] = {}  # kepid -> (mtime, size, rows)
+        self._store_rows: Dict[int, int] = {}
+        self._labels: Dict[int, str] = {}
+
+        self._snapshot = _CatalogSnapshot({})
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Pick up changes to the data directory, store and metadata; returns True if anything changed."""
+        with self._lock:
+            changed = self._refresh_store()
+            changed |= self._refresh_csv_files()
+            changed |= self._refresh_labels()
+            if changed:
+                self._rebuild()
+            return changed
+
+    def _refresh_csv_files(self) -> bool:
+        try:
+            dir_mtime = os.stat(self.data_dir).st_mtime
+        except OSError:
+            dir_mtime = None
+        if dir_mtime == self._dir_mtime:
+            return False
+        self._dir_mtime = dir_mtime
+
+        files = {}
+        if dir_mtime is not None:
+            for name in os.listdir(self.data_dir):
+                if not (name.startswith(_FILE_PREFIX) and name.endswith(_FILE_SUFFIX)):
+                    continue
+                try:
+                    kepid = int(name[len(_FILE_PREFIX):-len(_FILE_SUFFIX)])
+                except ValueError:
+                    continue
+                path = os.path.join(self.data_dir, name)
+                stat = os.stat(path)
+                previous = self._csv_files.get(kepid)
+                if previous is not None and previous[:2] == (stat.st_mtime, stat.st_size):
+                    files[kepid] = previous
+                else:
+                    # Only new or modified files are read, and only if the store does not cover them
+                    rows = None if kepid in self._store_rows else _count_csv_rows(path)
+                    files[kepid] = (stat.st_mtime, stat.st_size, rows)
+
+        self._csv_files = files
+        return True
+
+    def _refresh_store(self) -> bool:
+        store = get_lightcurve_store()
+        store_mtime = store.mtime if store is not None else None
+        if store_mtime == self._store_mtime:
+            return False
+        self._store_mtime = store_mtime
+        self._store_rows = (
+            {int(kepid): store.length(kepid) for kepid in store.kepids()} if store is not None else {}
+        )
+        return True
+
+    def _refresh_labels(self) -> bool:
+        try:
+            metadata_mtime = os.path.getmtime(self.metadata_path)
+        except OSError:
+            metadata_mtime = None
+        if metadata_mtime == self._metadata_mtime:
+            return False
+        self._metadata_mtime = metadata_mtime
+
+        labels = {}
+        if metadata_mtime is not None:
+            metadata = pd.read_csv(self.metadata_path)
+            for kepid, label in zip(metadata["kepid"], metadata["koi_disposition"]):
+                labels.setdefault(int(kepid), None if pd.isna(label) else str(label))
+        self._labels = labels
+        return True
+
+    def _rebuild(self):
+        entries = {}
+        for kepid in set(self._csv_files) | set(self._store_rows):
+            csv_info = self._csv_files.get(kepid)
+            if kepid not in self._store_rows and csv_info[2] is None:
+                # Row count was skipped while the store covered this file
+                path = os.path.join(self.data_dir, f"{_FILE_PREFIX}{kepid}{_FILE_SUFFIX}")
+                csv_info = self._csv_files[kepid] = csv_info[:2] + (_count_csv_rows(path),)
+            entries[kepid] = {
+                "n_cadences": self._store_rows[kepid] if kepid in self._store_rows else csv_info[2],
+                "file_size": csv_info[1] if csv_info is not None else None,
+                "ground_truth": self._labels.get(kepid)
+            }
+        self._snapshot = _CatalogSnapshot(entries)
+
+    def __contains__(self, kepid: Union[str, int]) -> bool:
+        key = _as_kepid(kepid)
+        return key is not None and self._snapshot.row(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._snapshot.kepids)
+
+    def kepids(self) -> np.ndarray:
+        """All Kepler IDs in the catalog, ascending."""
+        return self._snapshot.kepids.copy()
+
+    def get_entry(self, kepid: Union[str, int]) -> Optional[dict]:
+        """Return the catalog entry for a Kepler ID, or None if it has no lightcurve."""
+        snapshot = self._snapshot
+        key = _as_kepid(kepid)
+        row = snapshot.row(key) if key is not None else None
+        if row is None:
+            return None
+        return _entry(snapshot, row)
+
+    def get_ground_truth(self, kepid: Union[str, int]) -> Optional[str]:
+        """Return the ground-truth label for a Kepler ID, if known."""
+        key = _as_kepid(kepid)
+        return self._labels.get(key) if key is not None else None
+
+    def page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        label: Optional[str] = None,
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None
+    ) -> Tuple[List[dict], Optional[str], int]:
+        """
+        Return one page of catalog entries in ascending kepid order.
+
+        Args:
+            cursor: Kepid after which the page starts (the previous page's ``next_cursor``)
+            limit: Maximum number of entries to return
+            label: Only entries with this ground-truth label (case-insensitive);
+                ``unlabeled`` selects entries without one
+            min_length: Minimum number of cadences
+            max_length: Maximum number of cadences
+
+        Returns:
+            (entries, next_cursor, total matching the filters)
+        """
+        snapshot = self._snapshot
+        mask = np.ones(len(snapshot.kepids), dtype=bool)
+        if label is not None:
+            wanted = "" if label.lower() == "unlabeled" else label.upper()
+            mask &= snapshot.labels_upper == wanted
+        if min_length is not None:
+            mask &= snapshot.n_cadences >= min_length
+        if max_length is not None:
+            mask &= snapshot.n_cadences <= max_length
+        total_matching = int(mask.sum())
+
+        start = 0
+        if cursor:
+            after = _as_kepid(cursor)
+            if after is None:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            start = int(np.searchsorted(snapshot.kepids, after, side="right"))
+
+        rows = start + np.flatnonzero(mask[start:])
+        page_rows = rows[:limit]
+        next_cursor = str(snapshot.kepids[page_rows[-1]]) if len(rows) > limit else None
+        return [_entry(snapshot, int(row)) for row in page_rows], next_cursor, total_matching
+
+
+def _as_kepid(kepid: Union[str, int]) -> Optional[int]:
+    try:
+        return int(kepid)
+    except (TypeError, ValueError):
+        return None
+
+
+def _entry(snapshot: _CatalogSnapshot, row: int) -> dict:
+    return {
+        "kepid": str(snapshot.kepids[row]),
+        "ground_truth": snapshot.labels[row],
+        "n_cadences": int(snapshot.n_cadences[row]),
+        "file_size": snapshot.file_sizes[row]
+    }
+
+
+# Global catalog instance
+_kepid_catalog: Optional[KepidCatalog] = None
+_kepid_catalog_lock = threading.Lock()
+
+
+def get_kepid_catalog() -> KepidCatalog:
+    """Get the global Kepler ID catalog, refreshed against the files on disk."""
+    global _kepid_catalog
+    if _kepid_catalog is None:
+        with _kepid_catalog_lock:
+            if _kepid_catalog is None:
+                _kepid_catalog = KepidCatalog()
+                return _kepid_catalog
+    _kepid_catalog.refresh()
+    return _kepid_catalog
@@ -0,0 +1,106 @@
+"""
+In-memory KOI catalog for the ML "test" datasource.
+
+``KOI-Playground-Test-Data.csv`` is parsed once into a contiguous float32
+(N, 14) feature matrix in the column order of ``models/gb/feature_names.csv``,
+with missing values already imputed, plus a kepid -> row index. Lookups are a
+dict access and a row slice; the table is reloaded when the file changes.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# Data paths
+DATA_DIR = "data"
+KOI_TEST_DATA_PATH = os.path.join(DATA_DIR, "KOI-Playground-Test-Data.csv")
+FEATURE_NAMES_PATH = os.path.join("models", "gb", "feature_names.csv")
+
+# Value used for missing KOI features
+IMPUTE_VALUE = 0.0
+
+_feature_names: Optional[List[str]] = None
+
+
+def get_koi_feature_names() -> List[str]:
+    """Return the 14 KOI feature names in the order the GB/SVM models expect."""
+    global _feature_names
+    if _feature_names is None:
+        _feature_names = pd.read_csv(FEATURE_NAMES_PATH)["feature_names"].tolist()
+    return _feature_names
+
+
+class KOICatalog:
+    """Indexed, model-ready view of a KOI table."""
+
+    def __init__(self, path: str = KOI_TEST_DATA_PATH, feature_names: Optional[List[str]] = None):
+        self.path = path
+        self.feature_names = feature_names or get_koi_feature_names()
+        self.mtime = os.path.getmtime(path)
+        # Content hash of the file, so results persisted across restarts can tell which data they came from
+        with open(path, "rb") as f:
+            self.fingerprint = hashlib.sha256(f.read()).hexdigest()[:16]
+
+        data = pd.read_csv(path)
+        missing = [name for name in self.feature_names if name not in data.columns]
+        if missing:
+            raise ValueError(f"KOI data file {path} is missing feature columns: {missing}")
+
+        features = data[self.feature_names].to_numpy(dtype=np.float32)
+        features[np.isnan(features)] = IMPUTE_VALUE
+        self.features = np.ascontiguousarray(features)
+        self.features.flags.writeable = False
+
+        self.kepids = data["kepid"].to_numpy(dtype=np.int64)
+        self.labels = data["koi_disposition"].astype(str).tolist() if "koi_disposition" in data.columns else None
+
+        # First row wins for Kepler IDs with several KOIs, matching the previous iloc[0] lookup
+        self._index: Dict[int, int] = {}
+        for row, kepid in enumerate(self.kepids.tolist()):
+            self._index.setdefault(kepid, row)
+
+    def __contains__(self, kepid: Union[str, int]) -> bool:
+        return self.row_index(kepid) is not None
+
+    def __len__(self) -> int:
+        return len(self.kepids)
+
+    def row_index(self, kepid: Union[str, int]) -> Optional[int]:
+        """Return the row of a Kepler ID, or None if it is not in the catalog."""
+        try:
+            return self._index.get(int(kepid))
+        except (TypeError, ValueError):
+            return None
+
+    def get_features(self, kepid: Union[str, int]) -> np.ndarray:
+        """Return the (1, 14) float32 feature row for a Kepler ID (a read-only view)."""
+        row = self.row_index(kepid)
+        if row is None:
+            raise ValueError(f"Kepler ID {kepid} not found in KOI test data")
+        return self.features[row:row + 1]
+
+
+# Global catalog instance
+_koi_catalog: Optional[KOICatalog] = None
+_koi_catalog_lock = threading.Lock()
+
+
+def get_koi_catalog() -> KOICatalog:
+    """Get the global KOI catalog, reloading it if the data file changed."""
+    global _koi_catalog
+    if not os.path.exists(KOI_TEST_DATA_PATH):
+        raise FileNotFoundError(f"KOI test data file not found at {KOI_TEST_DATA_PATH}")
+
+    mtime = os.path.getmtime(KOI_TEST_DATA_PATH)
+    catalog = _koi_catalog
+    if catalog is not None and catalog.mtime == mtime:
+        return catalog
+
+    with _koi_catalog_lock:
+        if _koi_catalog is None or _koi_catalog.mtime != mtime:
+            _koi_catalog = KOICatalog(KOI_TEST_DATA_PATH)
+        return _koi_catalog
@@ -0,0 +1,310 @@
+"""
+Single-parse lightcurve preprocessing for the CNN/DNN models.
+
+A target's flux is read and sigma-clipped once, and both model inputs (the
+padded time series and the 12 engineered features) are produced from that
+one pass. Results are kept in a size-bounded LRU so repeated Kepler IDs skip
+I/O and preprocessing entirely.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .execution import run_io, run_preprocess
+from .feature_kernel import engineered_features, row_sums, valid_mask
+from .feature_normalizer import get_feature_normalizer
+from .lightcurve_store import get_flux_mtime, load_flux
+
+# Preprocessing parameters expected by the models
+TARGET_LENGTH = 3000
+SIGMA = 3.0
+
+# Bump when a change to preprocessing changes model inputs; results derived from
+# earlier inputs (prediction tables, caches) are then treated as stale
+PREPROCESSING_VERSION = 1
+
+# Maximum number of preprocessed targets kept in memory
+DEFAULT_CACHE_SIZE = int(os.getenv("EXCHRON_PREPROCESS_CACHE_SIZE", "1024"))
+
+
+class PreprocessedLightcurve:
+    """Model-ready inputs for one Kepler ID."""
+
+    __slots__ = ("kepid", "time_series", "raw_features", "features")
+
+    def __init__(self, kepid: str, time_series: np.ndarray, raw_features: np.ndarray, features: np.ndarray):
+        self.kepid = kepid
+        # (target_length, 1) float32, zero-mean/unit-variance, zero padded
+        self.time_series = time_series
+        # (12,) float64 engineered features before normalization
+        self.raw_features = raw_features
+        # (1, 12) float32 normalized engineered features
+        self.features = features
+
+
+def clip_outliers(flux: np.ndarray, sigma: float = SIGMA) -> np.ndarray:
+    """Remove values more than ``sigma`` standard deviations from the mean."""
+    mean_flux = flux.mean()
+    std_flux = flux.std(ddof=1)
+    return flux[np.abs(flux - mean_flux) <= sigma * std_flux]
+
+
+def build_time_series(flux_clean: np.ndarray, target_length: int = TARGET_LENGTH) -> np.ndarray:
+    """Normalize clipped flux and pad or truncate it to ``target_length`` points."""
+    flux_normalized = (flux_clean - flux_clean.mean()) / flux_clean.std(ddof=1)
+
+    # Truncate to the first target_length points, or zero-pad shorter curves
+    time_series = np.zeros((target_length, 1), dtype=np.float32)
+    n = min(len(flux_normalized), target_length)
+    time_series[:n, 0] = flux_normalized[:n]
+    return time_series
+
+
+def compute_engineered_features(flux_clean: np.ndarray) -> np.ndarray:
+    """Compute the 12 engineered features used by the DNN from clipped flux."""
+    # mean, std, skewness, kurtosis, min, max, range, median, q25, q75, iqr, mad
+    return engineered_features(flux_clean)
+
+
+def preprocess_lightcurve(kepid: str, target_length: int = TARGET_LENGTH, sigma: float = SIGMA) -> PreprocessedLightcurve:
+    """
+    Read, clip and transform a target's flux into CNN/DNN inputs.
+
+    Module-level so it can run in a process pool.
+    """
+    flux_clean = clip_outliers(load_flux(kepid), sigma)
+
+    time_series = build_time_series(flux_clean, target_length)
+    raw_features = compute_engineered_features(flux_clean)
+
+    # Apply feature normalization using the trained model's statistics
+    normalizer = get_feature_normalizer()
+    features = normalizer.normalize(raw_features.reshape(1, -1)).astype(np.float32)
+
+    return PreprocessedLightcurve(kepid, time_series, raw_features, features)
+
+
+# Batched preprocessing
+#
+# Variable-length flux arrays are packed left-aligned into a zero-padded (N, L)
+# float64 array; row i holds lengths[i] valid cadences. Clipping, normalization
+# and padding are elementwise over the whole array. Per-row sums reduce each
+# row's valid prefix with NumPy's own 1-D sum, because a 2-D reduction (or
+# np.add.reduceat) adds in a different order and would not match the
+# single-target functions above bit for bit.
+
+# Rows packed together; targets are grouped by length so little of each batch is padding
+BATCH_BUCKET_SIZE = int(os.getenv("EXCHRON_PREPROCESS_BUCKET_SIZE", "32"))
+
+
+def pack_flux(fluxes: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack flux arrays into a zero-padded 2-D array.
+
+    Returns:
+        (values, lengths): (N, L) float64 array with row i's flux in its first
+        ``lengths[i]`` columns, and the (N,) int64 lengths
+    """
+    lengths = np.fromiter((len(flux) for flux in fluxes), dtype=np.int64, count=len(fluxes))
+    width = int(lengths.max(initial=1))
+    values = np.zeros((len(fluxes), width), dtype=np.float64)
+    values[valid_mask(lengths, width)] = np.concatenate(fluxes) if len(fluxes) else []
+    return values, lengths
+
+
+def row_mean_std(values: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row mean and sample standard deviation (ddof=1) of packed rows, as ``np.mean``/``np.std``."""
+    mean = row_sums(values, lengths) / lengths
+    centered = values - mean[:, None]
+    std = np.sqrt(row_sums(centered * centered, lengths) / (lengths - 1))
+    return mean, std
+
+
+def clip_outliers_batch(values: np.ndarray, lengths: np.ndarray, sigma: float = SIGMA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sigma-clip every packed row (batched ``clip_outliers``).
+
+    Returns:
+        (clean_values, clean_lengths) with the kept cadences of each row
+        packed left-aligned, zero-padded, in their original order
+    """
+    mean, std = row_mean_std(values, lengths)
+    keep = (np.abs(values - mean[:, None]) <= (sigma * std)[:, None]) & valid_mask(lengths, values.shape[1])
+
+    clean_lengths = keep.sum(axis=1)
+    clean_values = np.zeros_like(values)
+    clean_values[valid_mask(clean_lengths, values.shape[1])] = values[keep]
+    return clean_values, clean_lengths
+
+
+def build_time_series_batch(clean_values: np.ndarray, clean_lengths: np.ndarray, target_length: int = TARGET_LENGTH) -> np.ndarray:
+    """Normalize packed clipped rows and pad or truncate them to (N, target_length, 1) float32 (batched ``build_time_series``)."""
+    mean, std = row_mean_std(clean_values, clean_lengths)
+    n = min(clean_values.shape[1], target_length)
+    normalized = (clean_values[:, :n] - mean[:, None]) / std[:, None]
+
+    time_series = np.zeros((len(clean_values), target_length, 1), dtype=np.float32)
+    time_series[:, :n, 0] = np.where(valid_mask(clean_lengths, n), normalized, 0.0)
+    return time_series
+
+
+def preprocess_flux_batch(
+    kepids: Sequence[str],
+    fluxes: Sequence[np.ndarray],
+    target_length: int = TARGET_LENGTH,
+    sigma: float = SIGMA
+) -> List[PreprocessedLightcurve]:
+    """Clip, normalize and pad many flux arrays at once; results equal ``preprocess_lightcurve`` per target."""
+    normalizer = get_feature_normalizer()
+    results: List[Optional[PreprocessedLightcurve]] = [None] * len(fluxes)
+
+    order = np.argsort([len(flux) for flux in fluxes], kind="stable")
+    for start in range(0, len(order), BATCH_BUCKET_SIZE):
+        bucket = order[start:start + BATCH_BUCKET_SIZE]
+        values, lengths = pack_flux([fluxes[i] for i in bucket])
+        clean_values, clean_lengths = clip_outliers_batch(values, lengths, sigma)
+        time_series = build_time_series_batch(clean_values, clean_lengths, target_length)
+
+        raw_features = engineered_features(clean_values, clean_lengths)
+        features = normalizer.normalize(raw_features).astype(np.float32)
+
+        for row, i in enumerate(bucket.tolist()):
+            results[i] = PreprocessedLightcurve(kepids[i], time_series[row], raw_features[row], features[row:row + 1])
+    return results
+
+
+def preprocess_lightcurves(kepids: Sequence[str], target_length: int = TARGET_LENGTH, sigma: float = SIGMA) -> list:
+    """
+    Read and preprocess many Kepler IDs with the batched kernels.
+
+    Module-level so chunks of Kepler IDs can run in a process pool. Returns one
+    ``PreprocessedLightcurve`` per Kepler ID, or the exception raised while
+    reading that target's flux.
+    """
+    loaded, results = [], [None] * len(kepids)
+    for i, kepid in enumerate(kepids):
+        try:
+            loaded.append((i, kepid, load_flux(kepid)))
+        except Exception as e:
+            results[i] = e
+    batch = preprocess_flux_batch([kepid for _, kepid, _ in loaded], [flux for _, _, flux in loaded], target_length, sigma)
+    for (i, _, _), lightcurve in zip(loaded, batch):
+        results[i] = lightcurve
+    return results
+
+
+class LightcurvePreprocessor:
+    """
+    Produces CNN/DNN inputs for a Kepler ID from a single read of its flux.
+
+    Results are cached in an LRU keyed by (kepid, source mtime, target length,
+    sigma), so a rebuilt store or edited CSV is picked up automatically.
+    Cached arrays are read-only and shared between callers.
+    """
+
+    def __init__(self, target_length: int = TARGET_LENGTH, sigma: float = SIGMA, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.target_length = target_length
+        self.sigma = sigma
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, PreprocessedLightcurve]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Misses currently being computed by get_async, so concurrent requests share one job
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kepid: str) -> PreprocessedLightcurve:
+        """Return preprocessed inputs for a Kepler ID, computing them on a cache miss."""
+        key = self._key(kepid)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        return self._store(key, self.process(kepid))
+
+    async def get_async(self, kepid: str) -> PreprocessedLightcurve:
+        """Like ``get``, but runs I/O and preprocessing on the execution pools."""
+        key = await run_io(self._key, kepid)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        # The job runs in its own task, so a cancelled caller does not cancel it for the others
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, kepid))
+            self._inflight[key] = task
+            # Retrieve the outcome so a failure with no caller left is not reported as never retrieved
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Tuple, kepid: str) -> PreprocessedLightcurve:
+        try:
+            return self._store(
+                key, await run_preprocess(preprocess_lightcurve, kepid, self.target_length, self.sigma)
+            )
+        finally:
+            del self._inflight[key]
+
+    def process(self, kepid: str) -> PreprocessedLightcurve:
+        """Read, clip and transform a target's flux without touching the cache."""
+        return preprocess_lightcurve(kepid, self.target_length, self.sigma)
+
+    def _key(self, kepid: str) -> Tuple:
+        return (kepid, get_flux_mtime(kepid), self.target_length, self.sigma)
+
+    def _lookup(self, key: Tuple) -> Optional[PreprocessedLightcurve]:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return cached
+
+    def _store(self, key: Tuple, result: PreprocessedLightcurve) -> PreprocessedLightcurve:
+        # Results may come back from another process, so mark them read-only here
+        for array in (result.time_series, result.raw_features, result.features):
+            array.flags.writeable = False
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop all cached results and reset the counters."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return cache size and hit/miss counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# Global preprocessor instance
+_lightcurve_preprocessor: Optional[LightcurvePreprocessor] = None
+
+
+def get_lightcurve_preprocessor() -> LightcurvePreprocessor:
+    """Get the global lightcurve preprocessor instance."""
+    global _lightcurve_preprocessor
+    if _lightcurve_preprocessor is None:
+        _lightcurve_preprocessor = LightcurvePreprocessor()
+    return _lightcurve_preprocessor
@@ -0,0 +1,322 @@
+"""
+Memory-mapped columnar store for Kepler lightcurve flux data.
+
+The per-target ``kepler_<kepid>_lightkurve.csv`` files are compiled once into
+contiguous float32 column files plus a kepid -> (offset, length) index, so a
+request reads a zero-copy slice of a memory-mapped array instead of parsing
+a 25-column CSV.
+
+Build the store with:
+
+    python -m app.services.lightcurve_store build
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Data paths
+DATA_DIR = "data"
+LIGHTKURVE_DATA_DIR = os.path.join(DATA_DIR, "lightkurve_data")
+LIGHTCURVE_STORE_DIR = os.path.join(DATA_DIR, "lightcurve_store")
+
+# Flux columns kept in the store, in order of preference
+FLUX_COLUMNS = ["pdcsap_flux", "flux"]
+
+STORE_FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.npz"
+
+
+class LightcurveStore:
+    """
+    Read-only view over a compiled lightcurve store.
+
+    Column data is opened with ``np.load(mmap_mode='r')`` so every worker
+    process shares the same page-cache pages and slices never copy.
+    """
+
+    def __init__(self, store_dir: str = LIGHTCURVE_STORE_DIR):
+        self.store_dir = store_dir
+        manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported lightcurve store version {self.manifest.get('format_version')} "
+                f"(expected {STORE_FORMAT_VERSION}); rebuild the store"
+            )
+
+        # Manifest is written last by the builder, so its mtime identifies the build
+        self.mtime = os.path.getmtime(manifest_path)
+        self.columns = list(self.manifest["columns"])
+
+        # Content hash of the build (the manifest records its creation time), so results persisted
+        # across restarts can tell which store they were computed from
+        digest = hashlib.sha256()
+        for name in (MANIFEST_FILE, INDEX_FILE):
+            with open(os.path.join(store_dir, name), "rb") as f:
+                digest.update(f.read())
+        self.fingerprint = digest.hexdigest()[:16]
+
+        with np.load(os.path.join(store_dir, INDEX_FILE)) as index:
+            self._kepids = index["kepid"]
+            offsets = index["offset"]
+            lengths = index["length"]
+            flux_columns = index["flux_column"]
+
+        # kepid -> (offset, length, position in FLUX_COLUMNS of the flux column the target uses)
+        self._index: Dict[int, Tuple[int, int, int]] = {
+            int(k): (int(o), int(n), int(c)) for k, o, n, c in zip(self._kepids, offsets, lengths, flux_columns)
+        }
+        self._data = {
+            column: np.load(os.path.join(store_dir, f"{column}.npy"), mmap_mode="r")
+            for column in self.columns
+        }
+
+    def __contains__(self, kepid: Union[str, int]) -> bool:
+        key = _as_kepid(kepid)
+        return key is not None and key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def kepids(self) -> np.ndarray:
+        """Return all Kepler IDs in the store, sorted ascending."""
+        return self._kepids
+
+    def length(self, kepid: Union[str, int]) -> int:
+        """Return the number of stored cadences for a Kepler ID."""
+        return self._lookup(kepid)[1]
+
+    def get_column(self, kepid: Union[str, int], column: str) -> np.ndarray:
+        """Return a zero-copy float32 slice of one column for a Kepler ID."""
+        if column not in self._data:
+            raise KeyError(f"Column {column} not in lightcurve store")
+        offset, length, _ = self._lookup(kepid)
+        return self._data[column][offset:offset + length]
+
+    def get_flux(self, kepid: Union[str, int]) -> np.ndarray:
+        """
+        Return the flux for a Kepler ID with NaNs dropped.
+
+        Same rule as the CSV path: ``pdcsap_flux`` if the target's CSV had that
+        column, otherwise ``flux``, even when the chosen column holds no valid values.
+        """
+        offset, length, column = self._lookup(kepid)
+        values = self._data[FLUX_COLUMNS[column]][offset:offset + length]
+        valid = ~np.isnan(values)
+        return values if valid.all() else values[valid]
+
+    def _lookup(self, kepid: Union[str, int]) -> Tuple[int, int, int]:
+        key = _as_kepid(kepid)
+        if key is None or key not in self._index:
+            raise FileNotFoundError(f"Lightcurve data not found for Kepler ID: {kepid}")
+        return self._index[key]
+
+
+def _as_kepid(kepid: Union[str, int]) -> Optional[int]:
+    try:
+        return int(kepid)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lightcurve_csv_path(kepid: str) -> str:
+    return os.path.join(LIGHTKURVE_DATA_DIR, f"kepler_{kepid}_lightkurve.csv")
+
+
+def load_flux(kepid: str) -> np.ndarray:
+    """
+    Load the flux for a Kepler ID with NaNs dropped, as float64.
+
+    Reads a zero-copy slice from the compiled store when it is available and
+    falls back to parsing only the flux columns of the lightcurve CSV.
+    """
+    store = get_lightcurve_store()
+    if store is not None and kepid in store:
+        # Upcast so statistics match the CSV path
+        return store.get_flux(kepid).astype(np.float64)
+
+    file_path = _lightcurve_csv_path(kepid)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Lightcurve data not found for Kepler ID: {kepid}")
+
+    # Read only the flux columns (prefer pdcsap_flux, fallback to flux)
+    data = pd.read_csv(file_path, usecols=lambda c: c in FLUX_COLUMNS)
+    for column in FLUX_COLUMNS:
+        if column in data.columns:
+            return data[column].dropna().to_numpy(dtype=np.float64)
+    raise ValueError("No flux data found in the lightcurve file")
+
+
+def get_flux_mtime(kepid: str) -> float:
+    """Return the modification time of the data backing a Kepler ID's flux"""
+    store = get_lightcurve_store()
+    if store is not None and kepid in store:
+        return store.mtime
+
+    file_path = _lightcurve_csv_path(kepid)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Lightcurve data not found for Kepler ID: {kepid}")
+    return os.path.getmtime(file_path)
+
+
+def get_flux_fingerprint(kepid: str) -> str:
+    """
+    Identify the data backing a Kepler ID's flux for persisted results.
+
+    The store's content hash for targets in the store, otherwise the CSV's
+    modification time and size.
+    """
+    store = get_lightcurve_store()
+    if store is not None and kepid in store:
+        return store.fingerprint
+
+    file_path = _lightcurve_csv_path(kepid)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Lightcurve data not found for Kepler ID: {kepid}")
+    stat = os.stat(file_path)
+    return f"csv:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def build_lightcurve_store(
+    source_dir: str = LIGHTKURVE_DATA_DIR,
+    store_dir: str = LIGHTCURVE_STORE_DIR
+) -> dict:
+    """
+    Compile ``kepler_*_lightkurve.csv`` files into a memory-mappable store.
+
+    Args:
+        source_dir: Directory containing the lightcurve CSV files
+        store_dir: Output directory for the compiled store
+
+    Returns:
+        The manifest written alongside the store
+    """
+    files = []
+    for name in os.listdir(source_dir):
+        if name.startswith("kepler_") and name.endswith("_lightkurve.csv"):
+            kepid = _as_kepid(name[len("kepler_"):-len("_lightkurve.csv")])
+            if kepid is not None:
+                files.append((kepid, name))
+    files.sort()
+
+    kepids, offsets, lengths, flux_columns = [], [], [], []
+    chunks = {column: [] for column in FLUX_COLUMNS}
+    offset = 0
+
+    for kepid, name in files:
+        data = pd.read_csv(
+            os.path.join(source_dir, name),
+            usecols=lambda c: c in FLUX_COLUMNS,
+            dtype=np.float32
+        )
+        if not any(column in data.columns for column in FLUX_COLUMNS):
+            print(f"Warning: skipping {name}, no flux columns")
+            continue
+
+        n_rows = len(data)
+        # The first flux column the CSV has, as load_flux picks it
+        flux_columns.append(next(i for i, column in enumerate(FLUX_COLUMNS) if column in data.columns))
+        for column in FLUX_COLUMNS:
+            if column in data.columns:
+                chunks[column].append(data[column].to_numpy(dtype=np.float32))
+            else:
+                chunks[column].append(np.full(n_rows, np.nan, dtype=np.float32))
+
+        kepids.append(kepid)
+        offsets.append(offset)
+        lengths.append(n_rows)
+        offset += n_rows
+
+    # Write into a sibling directory and swap it in, so readers never see a half-built store
+    tmp_dir = f"{store_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for column in FLUX_COLUMNS:
+        values = np.concatenate(chunks[column]) if chunks[column] else np.empty(0, dtype=np.float32)
+        np.save(os.path.join(tmp_dir, f"{column}.npy"), values)
+
+    np.savez(
+        os.path.join(tmp_dir, INDEX_FILE),
+        kepid=np.asarray(kepids, dtype=np.int64),
+        offset=np.asarray(offsets, dtype=np.int64),
+        length=np.asarray(lengths, dtype=np.int64),
+        flux_column=np.asarray(flux_columns, dtype=np.int8)
+    )
+
+    manifest = {
+        "format_version": STORE_FORMAT_VERSION,
+        "columns": FLUX_COLUMNS,
+        "dtype": "float32",
+        "n_targets": len(kepids),
+        "n_rows": offset,
+        "source_dir": source_dir,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return manifest
+
+
+# Global store instance
+_lightcurve_store = None
+
+
+def get_lightcurve_store() -> Optional[LightcurveStore]:
+    """
+    Get the global lightcurve store, or None if it has not been built.
+
+    The store is reopened when its manifest changes, so rebuilding it does
+    not require a restart.
+    """
+    global _lightcurve_store
+    manifest_path = os.path.join(LIGHTCURVE_STORE_DIR, MANIFEST_FILE)
+    try:
+        mtime = os.path.getmtime(manifest_path)
+    except OSError:
+        _lightcurve_store = None
+        return None
+
+    if _lightcurve_store is None or _lightcurve_store.mtime != mtime:
+        try:
+            _lightcurve_store = LightcurveStore(LIGHTCURVE_STORE_DIR)
+        except Exception as e:
+            print(f"Warning: Could not open lightcurve store at {LIGHTCURVE_STORE_DIR}: {e}")
+            _lightcurve_store = None
+    return _lightcurve_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped lightcurve store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Compile lightcurve CSVs into the store")
+    build_parser.add_argument("--source", default=LIGHTKURVE_DATA_DIR, help="Lightcurve CSV directory")
+    build_parser.add_argument("--output", default=LIGHTCURVE_STORE_DIR, help="Store output directory")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        start = time.perf_counter()
+        manifest = build_lightcurve_store(args.source, args.output)
+        print(
+            f"Built lightcurve store at {args.output}: {manifest['n_targets']} targets, "
+            f"{manifest['n_rows']} cadences in {time.perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
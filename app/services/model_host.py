@@ -0,0 +1,529 @@
+"""
+Optional model-host process that owns the CNN/DNN models for a whole node.
+
+By default every uvicorn worker loads its own copy of the Keras models. With
+``EXCHRON_MODEL_HOST`` set to a Unix socket path, workers instead forward
+CNN/DNN batches to a single host process started with:
+
+    python -m app.services.model_host serve [--socket /tmp/exchron-model-host.sock]
+
+Transport: each worker creates a ``multiprocessing.shared_memory`` segment
+divided into a ring of fixed-size slots. To run a batch it writes the float32
+input tensors into a free slot and sends a small control message (slot,
+model, shapes) over a ``multiprocessing.connection`` socket. The host reads
+the tensors straight out of the slot, writes the probabilities back into the
+same slot and replies with the output shape. Tensors never go through pickle.
+
+The host batches requests from all workers together (up to
+``EXCHRON_BATCH_MAX_SIZE`` rows or ``EXCHRON_BATCH_MAX_WAIT_MS`` after the first
+request), so worker count can grow with HTTP concurrency while inference
+memory stays at one copy of each model.
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Host socket path; empty (default) keeps the models in each worker
+MODEL_HOST_ADDRESS = os.getenv("EXCHRON_MODEL_HOST", "")
+# Shared secret for worker connections; messages are pickled, so this is what keeps other users out
+MODEL_HOST_AUTHKEY = os.getenv("EXCHRON_MODEL_HOST_AUTHKEY", "").encode()
+# Slots in each worker's ring and rows per slot (larger batches are split across slots)
+MODEL_HOST_SLOTS = int(os.getenv("EXCHRON_MODEL_HOST_SLOTS", "8"))
+MODEL_HOST_SLOT_ROWS = int(os.getenv("EXCHRON_MODEL_HOST_SLOT_ROWS", "32"))
+# Seconds a worker waits for the host to answer a batch
+MODEL_HOST_TIMEOUT = float(os.getenv("EXCHRON_MODEL_HOST_TIMEOUT", "30"))
+
+DEFAULT_SOCKET = "/tmp/exchron-model-host.sock"
+HOST_MODEL_TYPES = ("cnn", "dnn")
+
+# float32 values per row a slot must hold: the DNN's time series plus its 12 features
+_INPUT_ROW_FLOATS = 3000 + 12
+# Output values per row (CNN: 1 sigmoid, DNN: softmax classes)
+_OUTPUT_ROW_FLOATS = 16
+_FLOAT_SIZE = np.dtype(np.float32).itemsize
+
+if MODEL_HOST_ADDRESS and not MODEL_HOST_AUTHKEY:
+    raise RuntimeError("EXCHRON_MODEL_HOST_AUTHKEY must be set when EXCHRON_MODEL_HOST is enabled")
+
+
+def _authkey() -> bytes:
+    if not MODEL_HOST_AUTHKEY:
+        raise RuntimeError("EXCHRON_MODEL_HOST_AUTHKEY is not set")
+    return MODEL_HOST_AUTHKEY
+
+
+def uses_model_host(model_type: str) -> bool:
+    """True if this worker forwards inference for a model to the model host."""
+    return bool(MODEL_HOST_ADDRESS) and model_type.lower() in HOST_MODEL_TYPES
+
+
+class _SlotRing:
+    """Views into a shared-memory segment split into equal input/output slots."""
+
+    def __init__(self, shm: SharedMemory, n_slots: int, slot_rows: int):
+        self.shm = shm
+        self.n_slots = n_slots
+        self.slot_rows = slot_rows
+        self.input_floats = slot_rows * _INPUT_ROW_FLOATS
+        self.output_floats = slot_rows * _OUTPUT_ROW_FLOATS
+        slot_floats = self.input_floats + self.output_floats
+        self._buffer = np.ndarray((n_slots, slot_floats), dtype=np.float32, buffer=shm.buf)
+
+    @staticmethod
+    def size(n_slots: int, slot_rows: int) -> int:
+        return n_slots * slot_rows * (_INPUT_ROW_FLOATS + _OUTPUT_ROW_FLOATS) * _FLOAT_SIZE
+
+    def inputs(self, slot: int, shapes: Sequence[Tuple[int, ...]]) -> List[np.ndarray]:
+        """Input tensor views of a slot, laid out back to back."""
+        views, offset = [], 0
+        for shape in shapes:
+            count = int(np.prod(shape))
+            views.append(self._buffer[slot, offset:offset + count].reshape(shape))
+            offset += count
+        return views
+
+    def output(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        count = int(np.prod(shape))
+        return self._buffer[slot, self.input_floats:self.input_floats + count].reshape(shape)
+
+    def release(self):
+        # Views must go before the segment can be closed
+        self._buffer = None
+
+
+class ModelHostClient:
+    """
+    Worker-side connection to the model host.
+
+    Thread-safe: concurrent ``predict`` calls each take a slot from the ring
+    and wait for their own reply.
+    """
+
+    def __init__(
+        self,
+        address: str = MODEL_HOST_ADDRESS,
+        n_slots: int = MODEL_HOST_SLOTS,
+        slot_rows: int = MODEL_HOST_SLOT_ROWS,
+        timeout: float = MODEL_HOST_TIMEOUT
+    ):
+        self.address = address
+        self.timeout = timeout
+        self._conn = Client(address, family="AF_UNIX", authkey=_authkey())
+        self._shm = SharedMemory(create=True, size=_SlotRing.size(n_slots, slot_rows))
+        self._ring = _SlotRing(self._shm, n_slots, slot_rows)
+
+        self._send_lock = threading.Lock()
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(n_slots):
+            self._free_slots.put(slot)
+        self._replies: Dict[int, tuple] = {}
+        self._reply_events = [threading.Event() for _ in range(n_slots)]
+        self._pong: Optional[dict] = None
+        self._pong_event = threading.Event()
+        self.closed = False
+
+        self._conn.send(("attach", self._shm.name, n_slots, slot_rows))
+        reply = self._conn.recv()
+        if reply[0] != "ok":
+            self.close()
+            raise ConnectionError(f"Model host rejected worker: {reply[1]}")
+        self.host_info = reply[1]
+
+        self._reader = threading.Thread(target=self._read_replies, name="exchron-model-host-client", daemon=True)
+        self._reader.start()
+
+    def _read_replies(self):
+        try:
+            while True:
+                message = self._conn.recv()
+                if message[0] == "pong":
+                    self._pong = message[2]
+                    self._pong_event.set()
+                    continue
+                slot = message[1]
+                self._replies[slot] = message
+                self._reply_events[slot].set()
+        except (EOFError, OSError):
+            self.closed = True
+            # Wake every waiter so it can report the lost connection
+            for event in self._reply_events + [self._pong_event]:
+                event.set()
+
+    def _run_slot(self, model_type: str, inputs: List[np.ndarray]) -> np.ndarray:
+        slot = self._free_slots.get()
+        try:
+            shapes = [tuple(x.shape) for x in inputs]
+            for view, x in zip(self._ring.inputs(slot, shapes), inputs):
+                view[...] = x
+
+            event = self._reply_events[slot]
+            event.clear()
+            with self._send_lock:
+                self._conn.send(("predict", slot, model_type, shapes))
+            if not event.wait(self.timeout):
+                self.closed = True
+                raise TimeoutError(f"Model host did not answer within {self.timeout:g}s")
+
+            reply = self._replies.pop(slot, None)
+            if reply is None:
+                raise ConnectionError("Lost connection to the model host")
+            if reply[0] == "error":
+                raise RuntimeError(f"Model host inference failed: {reply[2]}")
+            return self._ring.output(slot, reply[2]).copy()
+        finally:
+            self._free_slots.put(slot)
+
+    def predict(self, model_type: str, inputs: Sequence[np.ndarray]) -> np.ndarray:
+        """Run a batch on the host; one float32-castable array per model input."""
+        if self.closed:
+            raise ConnectionError("Lost connection to the model host")
+        arrays = [np.asarray(x, dtype=np.float32) for x in inputs]
+        row_floats = sum(int(np.prod(x.shape[1:])) for x in arrays)
+        if row_floats > _INPUT_ROW_FLOATS:
+            raise ValueError(f"{model_type} inputs need {row_floats} floats per row, slots hold {_INPUT_ROW_FLOATS}")
+
+        rows = self._ring.slot_rows
+        batch_size = arrays[0].shape[0]
+        if batch_size <= rows:
+            return self._run_slot(model_type, arrays)
+        return np.concatenate([
+            self._run_slot(model_type, [x[start:start + rows] for x in arrays])
+            for start in range(0, batch_size, rows)
+        ])
+
+    def ping(self) -> dict:
+        """Host batching statistics."""
+        self._pong_event.clear()
+        with self._send_lock:
+            self._conn.send(("ping", None))
+        if not self._pong_event.wait(self.timeout) or self.closed:
+            raise ConnectionError("Model host did not answer ping")
+        return self._pong
+
+    def close(self):
+        self.closed = True
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+        self._ring.release()
+        self._shm.close()
+        self._shm.unlink()
+
+
+# Global client instance for this worker
+_client: Optional[ModelHostClient] = None
+_client_lock = threading.Lock()
+
+
+def get_model_host_client() -> ModelHostClient:
+    """Get this worker's model-host connection, reconnecting if it was lost."""
+    global _client
+    client = _client
+    if client is not None and not client.closed:
+        return client
+    with _client_lock:
+        if _client is None or _client.closed:
+            if _client is not None:
+                # Clear it first, so a failed reconnect does not close (and unlink) it again next time
+                _client.close()
+                _client = None
+            _client = ModelHostClient()
+        return _client
+
+
+def connect_model_host(stop: threading.Event, retry_seconds: float = 0.5):
+    """
+    Keep this worker connected to the model host until ``stop`` is set.
+
+    Waits for the host to come up at startup and reconnects whenever the
+    connection is lost (host restart, batch timeout), so a worker that
+    /health/ready took out of rotation comes back without needing traffic.
+    """
+    warned = False
+    while not stop.is_set():
+        try:
+            get_model_host_client()
+            warned = False
+        except (OSError, ConnectionError) as e:
+            if not warned:
+                print(f"Warning: Could not connect to model host at {MODEL_HOST_ADDRESS}, retrying: {e}")
+                warned = True
+        stop.wait(retry_seconds)
+
+
+def get_model_host_status() -> Optional[dict]:
+    """Connection state for /health/ready, or None when the model host is not used."""
+    if not MODEL_HOST_ADDRESS:
+        return None
+    client = _client
+    return {
+        "address": MODEL_HOST_ADDRESS,
+        "connected": client is not None and not client.closed,
+        "models": client.host_info.get("models") if client is not None else None
+    }
+
+
+def get_model_host_stats() -> Optional[dict]:
+    """Batching counters reported by the model host, or None when it is not used."""
+    if not MODEL_HOST_ADDRESS:
+        return None
+    try:
+        return get_model_host_client().ping()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def close_model_host_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Host side
+
+class _HostRequest:
+    __slots__ = ("worker", "slot", "inputs")
+
+    def __init__(self, worker: "_Worker", slot: int, inputs: List[np.ndarray]):
+        self.worker = worker
+        self.slot = slot
+        self.inputs = inputs
+
+
+class _Worker:
+    """A connected worker: its control connection and its attached slot ring."""
+
+    def __init__(self, conn: Connection, shm_name: str, n_slots: int, slot_rows: int):
+        self.conn = conn
+        self.shm = SharedMemory(name=shm_name)
+        # The worker owns the segment; keep this process's tracker from unlinking it on exit
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.ring = _SlotRing(self.shm, n_slots, slot_rows)
+        self.send_lock = threading.Lock()
+
+    def send(self, message: tuple):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def close(self):
+        self.ring.release()
+        self.shm.close()
+        self.conn.close()
+
+
+class ModelHost:
+    """Owns the serving functions and batches requests from all connected workers."""
+
+    def __init__(self, address: str, model_types: Sequence[str], max_batch_size: int, max_wait_ms: float):
+        self.address = address
+        self.model_types = list(model_types)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queues = {model_type: queue.Queue() for model_type in self.model_types}
+        self._serving_fns = {}
+        self.workers = 0
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    def load_models(self):
+        from app.models.model_loader import get_serving_fn, preload_models
+
+        sizes = [1]
+        while sizes[-1] < self.max_batch_size:
+            sizes.append(sizes[-1] * 2)
+        preload_models(self.model_types, sizes)
+        for model_type in self.model_types:
+            self._serving_fns[model_type] = get_serving_fn(model_type)
+
+    def serve_forever(self):
+        for model_type in self.model_types:
+            threading.Thread(target=self._batch_loop, args=(model_type,), daemon=True).start()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # Bind the socket owner-only so other users on the node cannot connect
+        umask = os.umask(0o077)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=_authkey())
+        finally:
+            os.umask(umask)
+        with listener:
+            print(f"Model host serving {', '.join(self.model_types)} on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Warning: Rejected model host connection: {e}")
+                    continue
+                threading.Thread(target=self._handle_worker, args=(conn,), daemon=True).start()
+
+    def _handle_worker(self, conn: Connection):
+        try:
+            message = conn.recv()
+            if message[0] != "attach":
+                conn.send(("error", f"expected attach, got {message[0]}"))
+                conn.close()
+                return
+            worker = _Worker(conn, *message[1:])
+        except Exception as e:
+            try:
+                conn.send(("error", str(e)))
+            finally:
+                conn.close()
+            return
+
+        self.workers += 1
+        worker.send(("ok", {"models": self.model_types, "max_batch_size": self.max_batch_size}))
+        try:
+            while True:
+                message = conn.recv()
+                if isinstance(message, tuple) and message[:1] == ("ping",):
+                    worker.send(("pong", None, self.stats()))
+                    continue
+                slot = message[1] if isinstance(message, tuple) and len(message) == 4 and message[0] == "predict" else None
+                if not isinstance(slot, int) or not 0 <= slot < worker.ring.n_slots:
+                    # No slot to answer on; the worker reconnects once the connection drops
+                    print(f"Warning: Dropping model host worker after a malformed message: {str(message)[:200]}")
+                    break
+                _, slot, model_type, shapes = message
+                error = self._check_request(worker, model_type, shapes)
+                if error is not None:
+                    worker.send(("error", slot, error))
+                    continue
+                self._queues[model_type].put(_HostRequest(worker, slot, worker.ring.inputs(slot, shapes)))
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            print(f"Warning: Model host worker connection failed: {e}")
+        finally:
+            self.workers -= 1
+            worker.close()
+
+    def _check_request(self, worker: _Worker, model_type: str, shapes) -> Optional[str]:
+        """Why a predict request cannot be served, or None if its shapes fit the model and the slot."""
+        from app.models.model_loader import SERVING_INPUTS
+
+        if model_type not in self._queues:
+            return f"Model {model_type} is not served by this host"
+        expected = [shape for _, shape in SERVING_INPUTS[model_type]]
+        if (
+            not isinstance(shapes, (list, tuple)) or len(shapes) != len(expected)
+            or not all(isinstance(shape, tuple) and all(isinstance(n, int) for n in shape) for shape in shapes)
+        ):
+            return f"Invalid input shapes for {model_type}: {str(shapes)[:200]}"
+        rows = {shape[0] if shape else None for shape in shapes}
+        if [shape[1:] for shape in shapes] != expected or len(rows) != 1:
+            return f"Input shapes {shapes} do not match {model_type} inputs {expected}"
+        if not 1 <= rows.pop() <= worker.ring.slot_rows:
+            return f"Batches must have 1 to {worker.ring.slot_rows} rows per slot, got {shapes[0][0]}"
+        return None
+
+    def _batch_loop(self, model_type: str):
+        requests = self._queues[model_type]
+        while True:
+            batch = [requests.get()]
+            rows = len(batch[0].inputs[0])
+            deadline = time.monotonic() + self.max_wait
+
+            # Collect requests from any worker until the batch is full or the window closes
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                rows += len(request.inputs[0])
+            self._execute(model_type, batch)
+
+    def _execute(self, model_type: str, batch: List[_HostRequest]):
+        try:
+            n_inputs = len(batch[0].inputs)
+            stacked = [np.concatenate([request.inputs[i] for request in batch]) for i in range(n_inputs)]
+            outputs = np.asarray(self._serving_fns[model_type](*stacked), dtype=np.float32)
+            if outputs.shape[1:] and int(np.prod(outputs.shape[1:])) > _OUTPUT_ROW_FLOATS:
+                raise ValueError(f"{model_type} output has {outputs.shape[1:]} values per row, slots hold {_OUTPUT_ROW_FLOATS}")
+        except Exception as e:
+            for request in batch:
+                self._reply(request, ("error", request.slot, str(e)))
+            return
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += len(outputs)
+        start = 0
+        for request in batch:
+            rows = len(request.inputs[0])
+            result = outputs[start:start + rows]
+            start += rows
+            try:
+                request.worker.ring.output(request.slot, result.shape)[...] = result
+            except Exception as e:
+                self._reply(request, ("error", request.slot, str(e)))
+                continue
+            self._reply(request, ("result", request.slot, result.shape))
+
+    @staticmethod
+    def _reply(request: _HostRequest, message: tuple):
+        try:
+            request.worker.send(message)
+        except (OSError, ValueError):
+            # Worker went away; its connection handler cleans up
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "models": self.model_types,
+            "workers": self.workers,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_rows": self.rows / self.batches if self.batches else 0.0
+        }
+
+
+def main(argv=None):
+    from app.services.inference_scheduler import MAX_BATCH_SIZE, MAX_WAIT_MS
+
+    parser = argparse.ArgumentParser(description="Serve the CNN/DNN models to all workers on this node")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Load the models and accept worker connections")
+    serve_parser.add_argument("--socket", default=MODEL_HOST_ADDRESS or DEFAULT_SOCKET, help="Unix socket path")
+    serve_parser.add_argument("--models", nargs="+", choices=HOST_MODEL_TYPES, default=list(HOST_MODEL_TYPES))
+    serve_parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    serve_parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+
+    args = parser.parse_args(argv)
+    if not MODEL_HOST_AUTHKEY:
+        parser.error("EXCHRON_MODEL_HOST_AUTHKEY must be set to the key the workers use")
+    if args.command == "serve":
+        from app.models.model_loader import get_model_path
+
+        models = [m for m in args.models if os.path.exists(get_model_path(m))]
+        for model_type in sorted(set(args.models) - set(models)):
+            print(f"{model_type}: skipped, {get_model_path(model_type)} not found")
+        host = ModelHost(args.socket, models, args.max_batch_size, args.max_wait_ms)
+        start = time.perf_counter()
+        host.load_models()
+        print(f"Loaded {', '.join(models) or 'no models'} in {time.perf_counter() - start:.1f}s")
+        host.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Persistent prediction cache shared by all workers on a host.
+
+Results are stored in a SQLite database (WAL mode, so uvicorn workers can
+read concurrently while one writes) and survive restarts. Keys include the
+SHA-256 of the model file, the preprocessing version (plus the feature
+normalization statistics for the DNN) and a fingerprint of the input data
+(the lightcurve store build or CSV, or the KOI file), so replacing
+``exchron-cnn.keras`` or a joblib artifact, changing preprocessing or
+rebuilding the data makes old entries unreachable; they age out through LRU
+eviction once the cache is over its size limit.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from app.models.model_loader import get_model_hash
+from app.services.feature_normalizer import get_feature_normalizer
+from app.services.koi_catalog import get_koi_catalog
+from app.services.lightcurve_preprocessor import PREPROCESSING_VERSION
+from app.services.lightcurve_store import get_flux_fingerprint
+
+PREDICTION_CACHE_PATH = os.getenv("EXCHRON_PREDICTION_CACHE", os.path.join("cache", "prediction_cache.sqlite3"))
+# Set EXCHRON_USE_PREDICTION_CACHE=0 to disable
+USE_PREDICTION_CACHE = os.getenv("EXCHRON_USE_PREDICTION_CACHE", "1") != "0"
+# Maximum number of cached predictions before least recently used entries are evicted
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("EXCHRON_PREDICTION_CACHE_MAX_ENTRIES", "100000"))
+
+# Entries evicted at once when the cache is full, so eviction is not run on every insert
+_EVICTION_BATCH = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    key TEXT PRIMARY KEY,
+    model_type TEXT NOT NULL,
+    kepid TEXT NOT NULL,
+    candidate_probability REAL NOT NULL,
+    non_candidate_probability REAL NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access);
+"""
+
+
+class PredictionCache:
+    """SQLite-backed LRU cache of (candidate, non_candidate) probabilities."""
+
+    def __init__(self, path: str = PREDICTION_CACHE_PATH, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # sqlite3 connections are not shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: Optional[int] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def make_key(model_type: str, source: str, kepid: str) -> str:
+        """Cache key for a model, input source and Kepler ID, tied to the current model file, preprocessing and data."""
+        model_type = model_type.lower()
+        preprocessing = f"p{PREPROCESSING_VERSION}"
+        if model_type == "dnn":
+            # DNN inputs also depend on the feature normalization statistics
+            preprocessing += f".{get_feature_normalizer().fingerprint}"
+        if source == "lightcurve":
+            data = get_flux_fingerprint(kepid)
+        elif source == "koi-test":
+            data = get_koi_catalog().fingerprint
+        else:
+            raise ValueError(f"Unknown prediction source: {source}")
+        return f"{model_type}:{get_model_hash(model_type)}:{preprocessing}:{source}@{data}:{kepid}"
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        """Return cached (candidate, non_candidate) probabilities, or None on a miss."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT candidate_probability, non_candidate_probability FROM predictions WHERE key = ?", (key,)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        connection.execute("UPDATE predictions SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0], row[1]
+
+    def put(self, key: str, model_type: str, kepid: str, candidate_prob: float, non_candidate_prob: float):
+        """Store a prediction, evicting the least recently used entries if the cache is full."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, model_type.lower(), str(kepid), candidate_prob, non_candidate_prob, now, now)
+        )
+        with self._lock:
+            if self._entries is not None:
+                self._entries += 1
+            check = self._entries is None or self._entries > self.max_entries
+        if check:
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        entries = connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        evicted = 0
+        if entries > self.max_entries:
+            # Evict a batch below the limit so the next inserts do not trigger eviction again
+            evicted = entries - self.max_entries + min(_EVICTION_BATCH, self.max_entries)
+            connection.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY last_access ASC LIMIT ?)", (evicted,)
+            )
+        with self._lock:
+            self.evictions += evicted
+            self._entries = entries - evicted
+
+    def clear(self):
+        self._connection().execute("DELETE FROM predictions")
+        with self._lock:
+            self._entries = 0
+
+    def stats(self) -> dict:
+        """Hit rate for this worker plus the shared entry count."""
+        entries = self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+
+# Global cache instance
+_prediction_cache: Optional[PredictionCache] = None
+_prediction_cache_lock = threading.Lock()
+_prediction_cache_failed = False
+
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Get the global prediction cache, or None if it is disabled or cannot be opened."""
+    global _prediction_cache, _prediction_cache_failed
+    if not USE_PREDICTION_CACHE or _prediction_cache_failed:
+        return None
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None and not _prediction_cache_failed:
+                try:
+                    _prediction_cache = PredictionCache()
+                except Exception as e:
+                    print(f"Warning: Could not open prediction cache {PREDICTION_CACHE_PATH}: {e}")
+                    _prediction_cache_failed = True
+    return _prediction_cache
+
+
+def get_cached_prediction(model_type: str, source: str, kepid: str) -> Optional[Tuple[float, float]]:
+    """Cached (candidate, non_candidate) probabilities, or None on a miss or if caching is unavailable."""
+    cache = get_prediction_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(cache.make_key(model_type, source, kepid))
+    except Exception as e:
+        print(f"Warning: Prediction cache lookup failed: {e}")
+        return None
+
+
+def cache_prediction(model_type: str, source: str, kepid: str, candidate_prob: float, non_candidate_prob: float):
+    """Store a prediction in the cache; failures only print a warning."""
+    cache = get_prediction_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(cache.make_key(model_type, source, kepid), model_type, kepid, candidate_prob, non_candidate_prob)
+    except Exception as e:
+        print(f"Warning: Could not cache prediction: {e}")
@@ -1,70 +1,99 @@
 from app.models.model_loader import get_model
 from app.services.data_service import (
-    get_time_series_data,
-    get_engineered_features,
-    get_feature_data_from_kepid,
+    get_preprocessed_lightcurve,
+    get_koi_features,
     process_manual_features,
+    process_manual_feature_sets,
     check_kepid_exists,
     get_ground_truth
 )
+from app.services.execution import run_inference, run_io
+from app.services.inference_scheduler import get_inference_scheduler
+from app.services.model_host import uses_model_host
+from app.services.prediction_cache import cache_prediction, get_cached_prediction
+from app.services.prediction_table import lookup_prediction
 from app.services.url_service import get_archive_links
 from app.schemas.responses import DLPredictionResponse, MLPredictionResponse, UploadMLPredictionResponse, UploadPrediction
 import numpy as np
-import pandas as pd
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 # Model Output Specifications:
 # - CNN: Uses sigmoid activation, outputs single probability for candidate class
 # - DNN: Uses softmax activation, outputs probability distribution [non_candidate_prob, candidate_prob]
 
-async def get_dl_prediction(model_type: str, kepid: str) -> DLPredictionResponse:
-    """Get prediction using deep learning models (CNN/DNN)"""
-    # Check if kepid exists in dataset
-    if not await check_kepid_exists(kepid):
-        raise ValueError(f"Kepler ID {kepid} not found in dataset")
+async def score_feature_matrix(model, feature_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Score an (N, 14) KOI feature matrix in one model call; returns (candidate, non_candidate) probabilities"""
+    if hasattr(model, 'predict_proba'):
+        prediction_proba = await run_inference(model.predict_proba, feature_matrix)
+        return prediction_proba[:, 1], prediction_proba[:, 0]
+    # Fallback for models without predict_proba
+    prediction = np.asarray(await run_inference(model.predict, feature_matrix), dtype=np.float64)
+    candidate_probs = np.where(prediction > 0.5, prediction, 0.0)
+    return candidate_probs, 1.0 - candidate_probs
+
+async def _run_dl_inference(model_type: str, kepid: str) -> Tuple[float, float]:
+    """Preprocess a lightcurve and run CNN/DNN inference; returns (candidate, non_candidate) probabilities"""
+    # Load model (batched inference below runs against the cached instance);
+    # with a model host the model lives in that process instead
+    if not uses_model_host(model_type):
+        await run_io(get_model, model_type)
     
-    # Load model
-    model = get_model(model_type)
+    # Read and preprocess the lightcurve once for both model inputs
+    lightcurve = await get_preprocessed_lightcurve(kepid)
     
     # Prepare inputs based on model type
     if model_type.lower() == "cnn":
         # CNN expects only time series data: shape (1, 3000, 1)
-        time_series_data = await get_time_series_data(kepid)
-        preprocessed_data = time_series_data.reshape(1, 3000, 1)
+        preprocessed_data = lightcurve.time_series.reshape(1, 3000, 1)
         
-        # Make prediction
-        prediction = model.predict(preprocessed_data)
+        # Make prediction; concurrent requests are batched into one model call
+        prediction = await get_inference_scheduler("cnn").submit([preprocessed_data])
         
     elif model_type.lower() == "dnn":
-        # DNN expects both time series and engineered features
-        time_series_data = await get_time_series_data(kepid)
-        engineered_features = await get_engineered_features(kepid)
-        
         # Prepare inputs for dual-input DNN model
-        time_series_input = time_series_data.flatten().reshape(1, -1)  # Shape: (1, 3000)
-        features_input = engineered_features  # Shape: (1, 12)
+        time_series_input = lightcurve.time_series.reshape(1, -1)  # Shape: (1, 3000)
+        features_input = lightcurve.features  # Shape: (1, 12)
         
         # Make prediction with both inputs
-        prediction = model.predict([time_series_input, features_input])
+        prediction = await get_inference_scheduler("dnn").submit([time_series_input, features_input])
     else:
         raise ValueError(f"Invalid deep learning model type: {model_type}")
     
-    # Process prediction results based on model type
+    # Process prediction results based on model type (prediction is this request's output row)
     if model_type.lower() == "cnn":
         # CNN still uses sigmoid output - single probability for positive class
-        candidate_prob = float(prediction[0][0])
+        candidate_prob = float(prediction[0])
         non_candidate_prob = 1.0 - candidate_prob
     elif model_type.lower() == "dnn":
         # DNN now uses softmax output - probability distribution over two classes
-        # prediction shape: (1, 2) where [0] = non-candidate prob, [1] = candidate prob
-        non_candidate_prob = float(prediction[0][0])  # Class 0: Non-candidate probability
-        candidate_prob = float(prediction[0][1])      # Class 1: Candidate probability
+        # prediction shape: (2,) where [0] = non-candidate prob, [1] = candidate prob
+        non_candidate_prob = float(prediction[0])  # Class 0: Non-candidate probability
+        candidate_prob = float(prediction[1])      # Class 1: Candidate probability
+    
+    return candidate_prob, non_candidate_prob
+
+async def get_dl_prediction(model_type: str, kepid: str) -> DLPredictionResponse:
+    """Get prediction using deep learning models (CNN/DNN)"""
+    # Check if kepid exists in dataset
+    if not await check_kepid_exists(kepid):
+        raise ValueError(f"Kepler ID {kepid} not found in dataset")
+    
+    # Serve precomputed scores when the prediction table is current for this model,
+    # then try the persistent cache shared by all workers
+    precomputed = await run_io(lookup_prediction, model_type, kepid)
+    if precomputed is None:
+        precomputed = await run_io(get_cached_prediction, model_type, "lightcurve", kepid)
+    if precomputed is not None:
+        candidate_prob, non_candidate_prob = precomputed
+    else:
+        candidate_prob, non_candidate_prob = await _run_dl_inference(model_type, kepid)
+        await run_io(cache_prediction, model_type, "lightcurve", kepid, candidate_prob, non_candidate_prob)
     
     # Get ground truth if available
     ground_truth = await get_ground_truth(kepid)
     
     # Generate NASA archive links using the new URL service
-    archive_links = get_archive_links(kepid)
+    archive_links = await run_io(get_archive_links, kepid)
     
     return DLPredictionResponse(
         candidate_probability=candidate_prob,
@@ -90,7 +119,7 @@ async def get_ml_prediction(
         raise ValueError(f"Invalid model type: {model_type}. Must be 'gb' or 'svm'")
     
     # Load model
-    model = get_model(model_type)
+    model = await run_io(get_model, model_type)
     
     # Prepare input features based on data source
     if datasource == "test":
@@ -98,27 +127,37 @@ async def get_ml_prediction(
             raise ValueError("Kepler ID required for test data source")
         if not await check_kepid_exists_in_koi_data(kepid):
             raise ValueError(f"Kepler ID {kepid} not found in KOI test data")
-        input_features = await get_feature_data_from_kepid(kepid)
+        
+        # Serve precomputed scores when the prediction table is current for this model,
+        # then try the persistent cache shared by all workers
+        precomputed = await run_io(lookup_prediction, model_type, kepid)
+        if precomputed is None:
+            precomputed = await run_io(get_cached_prediction, model_type, "koi-test", kepid)
+        if precomputed is not None:
+            return MLPredictionResponse(
+                candidate_probability=precomputed[0],
+                non_candidate_probability=precomputed[1]
+            )
+        
+        # (1, 14) float32 row from the indexed KOI catalog
+        feature_array = await get_koi_features(kepid)
     elif datasource == "manual":
         if not features:
             raise ValueError("Features required for manual data source")
         input_features = await process_manual_features(features)
+        
+        # Convert to numpy array for prediction
+        feature_array = input_features.values
     else:
         raise ValueError(f"Invalid data source: {datasource}")
     
-    # Convert to numpy array for prediction
-    feature_array = input_features.values
-    
     # Make prediction with probability
-    if hasattr(model, 'predict_proba'):
-        prediction_proba = model.predict_proba(feature_array)[0]
-        candidate_prob = float(prediction_proba[1])  # Probability of candidate class
-        non_candidate_prob = float(prediction_proba[0])  # Probability of non-candidate class
-    else:
-        # Fallback for models without predict_proba
-        prediction = model.predict(feature_array)[0]
-        candidate_prob = float(prediction) if prediction > 0.5 else 0.0
-        non_candidate_prob = 1.0 - candidate_prob
+    candidate_probs, non_candidate_probs = await score_feature_matrix(model, feature_array)
+    candidate_prob = float(candidate_probs[0])  # Probability of candidate class
+    non_candidate_prob = float(non_candidate_probs[0])  # Probability of non-candidate class
+    
+    if datasource == "test":
+        await run_io(cache_prediction, model_type, "koi-test", kepid, candidate_prob, non_candidate_prob)
     
     return MLPredictionResponse(
         candidate_probability=candidate_prob,
@@ -130,7 +169,7 @@ async def get_averaged_ml_prediction(
     data_type: str = "kepler"
 ):
     """Get averaged predictions from the first 10 records in KOI-Playground-Test-Data.csv"""
-    from app.services.data_service import get_first_ten_koi_records
+    from app.services.data_service import get_first_koi_feature_rows
     from app.schemas.responses import AveragedMLPredictionResponse, IndividualPrediction
     
     # Validate model type
@@ -138,47 +177,24 @@ async def get_averaged_ml_prediction(
         raise ValueError(f"Invalid model type: {model_type}. Must be 'gb' or 'svm'")
     
     # Load model
-    model = get_model(model_type)
+    model = await run_io(get_model, model_type)
     
-    # Get first 10 records from KOI data
-    records = await get_first_ten_koi_records(data_type)
+    # First 10 records from the KOI catalog as one (10, 14) matrix
+    kepids, feature_matrix = await get_first_koi_feature_rows(10)
     
-    individual_predictions = []
-    candidate_probs = []
-    non_candidate_probs = []
+    # Score all records in a single model call
+    candidate_probs, non_candidate_probs = await score_feature_matrix(model, feature_matrix)
+    candidate_probs = candidate_probs.tolist()
+    non_candidate_probs = non_candidate_probs.tolist()
     
-    # Process each of the 10 records
-    for record in records:
-        kepid = record["kepid"]
-        features = record["features"]
-        
-        # Convert features to DataFrame for processing
-        input_features = pd.DataFrame([features])
-        
-        # Convert to numpy array for prediction
-        feature_array = input_features.values
-        
-        # Make prediction with probability
-        if hasattr(model, 'predict_proba'):
-            prediction_proba = model.predict_proba(feature_array)[0]
-            candidate_prob = float(prediction_proba[1])  # Probability of candidate class
-            non_candidate_prob = float(prediction_proba[0])  # Probability of non-candidate class
-        else:
-            # Fallback for models without predict_proba
-            prediction = model.predict(feature_array)[0]
-            candidate_prob = float(prediction) if prediction > 0.5 else 0.0
-            non_candidate_prob = 1.0 - candidate_prob
-        
-        # Store individual prediction
-        individual_predictions.append(IndividualPrediction(
+    individual_predictions = [
+        IndividualPrediction(
             kepid=kepid,
             candidate_probability=candidate_prob,
             non_candidate_probability=non_candidate_prob
-        ))
-        
-        # Collect probabilities for averaging
-        candidate_probs.append(candidate_prob)
-        non_candidate_probs.append(non_candidate_prob)
+        )
+        for kepid, candidate_prob, non_candidate_prob in zip(kepids, candidate_probs, non_candidate_probs)
+    ]
     
     # Calculate averages
     avg_candidate_prob = sum(candidate_probs) / len(candidate_probs)
@@ -205,48 +221,33 @@ async def get_upload_ml_prediction(
     upload_features: Dict[str, Dict[str, float]]
 ) -> UploadMLPredictionResponse:
     """Get predictions for uploaded feature sets using machine learning models (GB/SVM)"""
-    from app.services.data_service import process_manual_features
-    
     # Validate model type
     if model_type not in ['gb', 'svm']:
         raise ValueError(f"Invalid model type: {model_type}. Must be 'gb' or 'svm'")
     
     # Load model
-    model = get_model(model_type)
+    model = await run_io(get_model, model_type)
     
     individual_predictions = {}
     candidate_probs = []
     non_candidate_probs = []
     
-    # Process each uploaded feature set
-    for target_name, features in upload_features.items():
-        # Process features using existing service function
-        input_features = await process_manual_features(features)
-        
-        # Convert to numpy array for prediction
-        feature_array = input_features.values
-        
-        # Make prediction with probability
-        if hasattr(model, 'predict_proba'):
-            prediction_proba = model.predict_proba(feature_array)[0]
-            candidate_prob = float(prediction_proba[1])  # Probability of candidate class
-            non_candidate_prob = float(prediction_proba[0])  # Probability of non-candidate class
-        else:
-            # Fallback for models without predict_proba
-            prediction = model.predict(feature_array)[0]
-            candidate_prob = float(prediction) if prediction > 0.5 else 0.0
-            non_candidate_prob = 1.0 - candidate_prob
+    if upload_features:
+        # Validate all feature sets and stack them into one (N, 14) matrix
+        target_names = list(upload_features)
+        feature_matrix = await process_manual_feature_sets(list(upload_features.values()))
         
-        # Store individual prediction
-        individual_predictions[target_name] = UploadPrediction(
-            target_name=target_name,
-            candidate_probability=candidate_prob,
-            non_candidate_probability=non_candidate_prob
-        )
+        # Score every uploaded target in a single model call
+        candidate_probs, non_candidate_probs = await score_feature_matrix(model, feature_matrix)
+        candidate_probs = candidate_probs.tolist()
+        non_candidate_probs = non_candidate_probs.tolist()
         
-        # Collect probabilities for averaging
-        candidate_probs.append(candidate_prob)
-        non_candidate_probs.append(non_candidate_prob)
+        for target_name, candidate_prob, non_candidate_prob in zip(target_names, candidate_probs, non_candidate_probs):
+            individual_predictions[target_name] = UploadPrediction(
+                target_name=target_name,
+                candidate_probability=candidate_prob,
+                non_candidate_probability=non_candidate_prob
+            )
     
     # Calculate averages
     avg_candidate_prob = sum(candidate_probs) / len(candidate_probs) if candidate_probs else 0.0
@@ -257,4 +258,4 @@ async def get_upload_ml_prediction(
         candidate_probability=avg_candidate_prob,
         non_candidate_probability=avg_non_candidate_prob,
         predictions=individual_predictions
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,215 @@
+"""
+Precomputed prediction table.
+
+``scripts.score_catalog`` scores every Kepler ID offline and writes the
+probabilities to a versioned NPZ file. For each model the table holds the
+scored Kepler IDs (sorted) and an (N, 2) float64 array of
+[non_candidate, candidate] probabilities, plus metadata recording the SHA-256
+of the model file, the preprocessing version (and, for the DNN, the feature
+normalization statistics) and the fingerprint of the input data (the
+lightcurve store build or the KOI file) the scores were produced with. The
+API serves a table entry instead of running inference only while those still
+match what is on disk, so a retrained model or rebuilt data never returns
+stale scores.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from app.models.model_loader import get_model_hash
+from app.services.feature_normalizer import get_feature_normalizer
+from app.services.koi_catalog import get_koi_catalog
+from app.services.lightcurve_preprocessor import PREPROCESSING_VERSION
+from app.services.lightcurve_store import get_flux_fingerprint
+
+PREDICTION_TABLE_PATH = os.getenv("EXCHRON_PREDICTION_TABLE", os.path.join("data", "prediction_table.npz"))
+# Serve scores from the table when it is present and current (set EXCHRON_USE_PREDICTION_TABLE=0 to disable)
+USE_PREDICTION_TABLE = os.getenv("EXCHRON_USE_PREDICTION_TABLE", "1") != "0"
+
+TABLE_FORMAT_VERSION = 1
+
+# Models whose inputs come from lightcurve preprocessing
+_PREPROCESSED_MODELS = ("cnn", "dnn")
+
+
+class PredictionTable:
+    """Read-only view of a prediction table file."""
+
+    def __init__(self, path: str = PREDICTION_TABLE_PATH):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+
+        with np.load(path, allow_pickle=False) as data:
+            self.metadata = json.loads(str(data["metadata"]))
+            if self.metadata.get("format_version") != TABLE_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported prediction table format {self.metadata.get('format_version')} "
+                    f"(expected {TABLE_FORMAT_VERSION})"
+                )
+            self._kepids: Dict[str, np.ndarray] = {}
+            self._probabilities: Dict[str, np.ndarray] = {}
+            for model_type in self.metadata["models"]:
+                self._kepids[model_type] = data[f"{model_type}_kepids"]
+                self._probabilities[model_type] = data[f"{model_type}_probabilities"]
+
+        # Model checks are cached per (model, hash, data fingerprint) so lookups only stat files
+        self._current: Dict[str, Tuple[Tuple[str, Optional[str]], bool]] = {}
+
+    @property
+    def models(self) -> list:
+        return list(self.metadata["models"])
+
+    def scores(self, model_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(kepids, (N, 2) [non_candidate, candidate] probabilities) stored for a model."""
+        return self._kepids[model_type], self._probabilities[model_type]
+
+    def is_current(self, model_type: str) -> bool:
+        """
+        True if the table's scores for a model were produced by the model file on disk.
+
+        For the GB/SVM models this also requires the current KOI file; the
+        lightcurve data of CNN/DNN scores is checked per Kepler ID in ``lookup``.
+        """
+        info = self.metadata["models"].get(model_type)
+        if info is None:
+            return False
+        try:
+            model_hash = get_model_hash(model_type)
+            data_fingerprint = None if model_type in _PREPROCESSED_MODELS else get_koi_catalog().fingerprint
+        except OSError:
+            return False
+
+        key = (model_hash, data_fingerprint)
+        cached = self._current.get(model_type)
+        if cached is None or cached[0] != key:
+            current = info["model_hash"] == model_hash and (
+                model_type in _PREPROCESSED_MODELS
+                or info.get("data_fingerprint") == data_fingerprint
+            ) and (
+                model_type not in _PREPROCESSED_MODELS
+                or info.get("preprocessing_version") == PREPROCESSING_VERSION
+            ) and (
+                model_type != "dnn"
+                or info.get("feature_stats") == get_feature_normalizer().fingerprint
+            )
+            cached = self._current[model_type] = (key, current)
+        return cached[1]
+
+    def lookup(self, model_type: str, kepid: Union[str, int]) -> Optional[Tuple[float, float]]:
+        """
+        Look up precomputed probabilities for a Kepler ID.
+
+        Args:
+            model_type: Model name (cnn, dnn, gb, svm)
+            kepid: Kepler ID
+
+        Returns:
+            (candidate_probability, non_candidate_probability), or None if the
+            Kepler ID is not in the table or the table is stale for this model
+        """
+        if not self.is_current(model_type):
+            return None
+        try:
+            key = int(kepid)
+        except (TypeError, ValueError):
+            return None
+
+        kepids = self._kepids[model_type]
+        row = int(np.searchsorted(kepids, key))
+        if row >= len(kepids) or kepids[row] != key:
+            return None
+        if model_type in _PREPROCESSED_MODELS:
+            # Scores are only valid for flux read from the lightcurve store build they were computed on
+            try:
+                fingerprint = get_flux_fingerprint(str(kepid))
+            except OSError:
+                return None
+            if fingerprint != self.metadata["models"][model_type].get("data_fingerprint"):
+                return None
+        non_candidate_prob, candidate_prob = self._probabilities[model_type][row].tolist()
+        return candidate_prob, non_candidate_prob
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "created": self.metadata.get("created"),
+            "models": {
+                model_type: {
+                    "n_scored": int(len(self._kepids[model_type])),
+                    "model_hash": info["model_hash"],
+                    "current": self.is_current(model_type)
+                }
+                for model_type, info in self.metadata["models"].items()
+            }
+        }
+
+
+def write_prediction_table(path: str, scores: Dict[str, Tuple[np.ndarray, np.ndarray]], metadata: dict):
+    """
+    Write a prediction table atomically.
+
+    Args:
+        path: Output .npz path
+        scores: Model name -> (kepids, (N, 2) [non_candidate, candidate] probabilities)
+        metadata: Table metadata; ``metadata["models"][model]`` must carry ``model_hash``
+            and the ``data_fingerprint`` of the data it was scored on
+    """
+    arrays = {}
+    for model_type, (kepids, probabilities) in scores.items():
+        kepids = np.asarray(kepids, dtype=np.int64)
+        order = np.argsort(kepids, kind="stable")
+        arrays[f"{model_type}_kepids"] = kepids[order]
+        arrays[f"{model_type}_probabilities"] = np.asarray(probabilities, dtype=np.float64)[order]
+
+    metadata = dict(metadata, format_version=TABLE_FORMAT_VERSION)
+    arrays["metadata"] = np.array(json.dumps(metadata))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+# Global table instance
+_prediction_table: Optional[PredictionTable] = None
+_prediction_table_lock = threading.Lock()
+# mtime of a table file that failed to load, so it is not retried on every request
+_failed_mtime: Optional[float] = None
+
+
+def get_prediction_table() -> Optional[PredictionTable]:
+    """Get the global prediction table, or None if disabled or not built; reloads when the file changes."""
+    global _prediction_table, _failed_mtime
+    if not USE_PREDICTION_TABLE:
+        return None
+    try:
+        mtime = os.path.getmtime(PREDICTION_TABLE_PATH)
+    except OSError:
+        _prediction_table = None
+        return None
+
+    table = _prediction_table
+    if table is not None and table.mtime == mtime:
+        return table
+    if mtime == _failed_mtime:
+        return None
+
+    with _prediction_table_lock:
+        if _prediction_table is None or _prediction_table.mtime != mtime:
+            try:
+                _prediction_table = PredictionTable(PREDICTION_TABLE_PATH)
+            except Exception as e:
+                print(f"Warning: Could not load prediction table {PREDICTION_TABLE_PATH}: {e}")
+                _prediction_table = None
+                _failed_mtime = mtime
+        return _prediction_table
+
+
+def lookup_prediction(model_type: str, kepid: Union[str, int]) -> Optional[Tuple[float, float]]:
+    """Precomputed (candidate, non_candidate) probabilities for a model and Kepler ID, if current."""
+    table = get_prediction_table()
+    return table.lookup(model_type.lower(), kepid) if table is not None else None
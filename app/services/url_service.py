@@ -5,7 +5,17 @@ Generates proper DV report URLs with correct directory structure and timestamps
 
 import pandas as pd
 import os
-from typing import Optional
+import threading
+from typing import Dict, List, Optional
+
+# Base URL for DV report paths from the archive CSV
+DV_REPORT_BASE_URL = "http://exoplanetarchive.ipac.caltech.edu:8000/data/KeplerData"
+DV_LINKS_CSV_PATH = "data/slected-2000-dnn-cnn.csv"
+
+# Kepler ID -> DV report path, built once by load_dv_paths()
+_dv_paths: Optional[Dict[int, str]] = None
+# Held while the index is built, so concurrent first lookups wait for one parse
+_dv_paths_lock = threading.Lock()
 
 
 def generate_dv_report_url(kepid: str) -> str:
@@ -22,11 +32,10 @@ def generate_dv_report_url(kepid: str) -> str:
         The complete DV report URL
     """
     
-    # First, try to get the exact URL from the CSV data
+    # First, try to get the exact URL from the CSV data (in-memory index)
     csv_url = get_dv_url_from_csv(kepid)
     if csv_url:
-        base_url = "http://exoplanetarchive.ipac.caltech.edu:8000/data/KeplerData"
-        return f"{base_url}/{csv_url}"
+        return f"{DV_REPORT_BASE_URL}/{csv_url}"
     
     # Fallback: generate URL using the standard format
     # For Kepler IDs, the directory structure is based on zero-padded segments
@@ -45,42 +54,66 @@ def generate_dv_report_url(kepid: str) -> str:
     return url
 
 
+def load_dv_paths(csv_path: str = DV_LINKS_CSV_PATH) -> Dict[int, str]:
+    """
+    Build the Kepler ID -> DV report path index from the archive CSV.
+    
+    The CSV is parsed once; the first row wins for Kepler IDs with several
+    KOIs, and rows without a DV report path are skipped so those IDs use the
+    generated fallback URL.
+    
+    Args:
+        csv_path: Path to the NASA Exoplanet Archive export
+        
+    Returns:
+        Dictionary mapping Kepler IDs to DV report paths
+    """
+    global _dv_paths
+    
+    with _dv_paths_lock:
+        _dv_paths = _read_dv_paths(csv_path)
+        return _dv_paths
+
+
+def _read_dv_paths(csv_path: str) -> Dict[int, str]:
+    dv_paths: Dict[int, str] = {}
+    if os.path.exists(csv_path):
+        df = pd.read_csv(csv_path, comment='#', usecols=['kepid', 'koi_datalink_dvr'])
+        df = df.dropna(subset=['kepid', 'koi_datalink_dvr'])
+        for kepid, dv_path in zip(df['kepid'].astype('int64').tolist(), df['koi_datalink_dvr'].tolist()):
+            dv_paths.setdefault(kepid, dv_path)
+    return dv_paths
+
+
 def get_dv_url_from_csv(kepid: str) -> Optional[str]:
     """
     Get the exact DV report path from the CSV data file.
     
+    Looks the Kepler ID up in the in-memory index built by ``load_dv_paths``;
+    the index is built on first use if it was not loaded at startup.
+    
     Args:
         kepid: The Kepler ID as a string
         
     Returns:
         The DV report path from the CSV, or None if not found
     """
+    global _dv_paths
+    
+    if _dv_paths is None:
+        with _dv_paths_lock:
+            if _dv_paths is None:
+                try:
+                    _dv_paths = _read_dv_paths(DV_LINKS_CSV_PATH)
+                except Exception as e:
+                    # If there's any error reading the CSV, use the fallback for every ID
+                    print(f"Warning: Could not read DV URLs from CSV: {e}")
+                    _dv_paths = {}
+    
     try:
-        csv_path = "data/slected-2000-dnn-cnn.csv"
-        
-        if not os.path.exists(csv_path):
-            return None
-            
-        # Read the CSV file, skipping header comments
-        df = pd.read_csv(csv_path, comment='#')
-        
-        # Convert kepid to integer for comparison
-        kepid_int = int(kepid)
-        
-        # Find the row with matching kepid
-        matching_rows = df[df['kepid'] == kepid_int]
-        
-        if not matching_rows.empty:
-            # Get the DV report path from koi_datalink_dvr column
-            dv_path = matching_rows.iloc[0]['koi_datalink_dvr']
-            return dv_path
-            
-    except Exception as e:
-        # If there's any error reading the CSV, return None to use fallback
-        print(f"Warning: Could not read DV URL from CSV for kepid {kepid}: {e}")
+        return _dv_paths.get(int(kepid))
+    except (TypeError, ValueError):
         return None
-    
-    return None
 
 
 def generate_lightcurve_url(kepid: str) -> str:
@@ -143,4 +176,18 @@ def get_archive_links(kepid: str) -> dict:
         "dv_report_link": generate_dv_report_url(kepid),
         "lightcurve_link": generate_lightcurve_url(kepid),
         "target_pixel_file_link": generate_target_pixel_file_url(kepid)
-    }
\ No newline at end of file
+    }
+
+
+def get_bulk_archive_links(kepids: List[str]) -> List[dict]:
+    """
+    Get archive URLs for many Kepler IDs at once.
+    
+    Args:
+        kepids: Kepler IDs as strings
+        
+    Returns:
+        One dictionary per Kepler ID, in input order, with the ``kepid`` and
+        the same links as ``get_archive_links``
+    """
+    return [{"kepid": kepid, **get_archive_links(kepid)} for kepid in kepids]
@@ -0,0 +1,411 @@
+"""
+Micro-benchmarks for the request hot paths.
+
+``run`` times each stage on fixed inputs (the first Kepler IDs with
+lightcurves in ``data/lightkurve_data`` and the first rows of
+``KOI-Playground-Test-Data.csv``) and writes the results as JSON:
+
+- ``stages.*``: ``get_time_series_data`` and ``get_engineered_features``
+  (preprocessing cache cleared before every call), ``FeatureNormalizer.normalize``
+  at batch sizes 1/32/256 and ``get_archive_links``
+- ``models.<model>.predict[b<n>]``: each loaded model on its configured
+  backend at batch sizes 1/32/256 (serving functions for CNN/DNN,
+  ``predict_proba`` for GB/SVM)
+- ``handlers.*``: end-to-end requests through the FastAPI app over httpx's
+  ASGI transport, shaped like ``API_REQUEST_EXAMPLES.md``
+
+The prediction cache, the prediction table and the preprocessing cache are
+bypassed unless ``--with-caches`` is given, so handlers time the actual work. ``compare``
+reports the change of each benchmark between two runs and exits non-zero on
+a regression: a slowdown beyond the benchmark's threshold that a one-sided
+Mann-Whitney U test on the raw timings also finds significant, so run-to-run
+noise on a busy host is not reported:
+
+    python -m scripts.benchmark run [--output bench.json] [--repeats 30] [--models gb svm]
+    python -m scripts.benchmark compare base.json new.json [--default-threshold 0.1] [--threshold 'handlers.*=0.25']
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+RESULTS_FORMAT_VERSION = 1
+BATCH_SIZES = [1, 32, 256]
+METRICS = ["median_ms", "mean_ms", "p95_ms", "min_ms"]
+
+
+def summarize(timings: List[float], rows: int = 1) -> Dict[str, Any]:
+    """Latency statistics in milliseconds for one benchmark's timed calls."""
+    ms = np.array(timings) * 1000
+    median = float(np.median(ms))
+    return {
+        "repeats": len(ms),
+        "rows": rows,
+        "median_ms": median,
+        "mean_ms": float(ms.mean()),
+        "p95_ms": float(np.quantile(ms, 0.95)),
+        "min_ms": float(ms.min()),
+        "max_ms": float(ms.max()),
+        "stdev_ms": float(statistics.stdev(ms)) if len(ms) > 1 else 0.0,
+        "rows_per_second": rows / (median / 1000) if median > 0 else None,
+        # Raw timings, for the significance test in ``compare``
+        "samples_ms": [round(value, 6) for value in ms.tolist()]
+    }
+
+
+async def measure(
+    fn: Callable,
+    repeats: int,
+    warmup: int,
+    setup: Optional[Callable] = None,
+    rows: int = 1
+) -> Dict[str, Any]:
+    """
+    Time ``repeats`` calls of ``fn`` (sync or async) after ``warmup`` untimed ones.
+
+    ``setup`` runs untimed before every call, e.g. to clear a cache.
+    """
+    timings = []
+    for i in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        if i >= warmup:
+            timings.append(time.perf_counter() - start)
+    return summarize(timings, rows)
+
+
+def cycle(items: list) -> Callable[[], Any]:
+    """Return a function yielding the items in turn, forever."""
+    state = {"i": -1}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return next_item
+
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+        "env": {name: value for name, value in sorted(os.environ.items()) if name.startswith("EXCHRON_")}
+    }
+
+
+async def benchmark_stages(results: dict, kepids: List[str], args):
+    from app.services.data_service import get_engineered_features, get_time_series_data
+    from app.services.feature_normalizer import get_feature_normalizer
+    from app.services.lightcurve_preprocessor import get_lightcurve_preprocessor
+    from app.services.url_service import get_archive_links
+
+    preprocessor = get_lightcurve_preprocessor()
+    next_kepid = cycle(kepids)
+    # Both read the same preprocessed lightcurve; clearing the cache times the parse and transform
+    for name, fn in (("get_time_series_data", get_time_series_data), ("get_engineered_features", get_engineered_features)):
+        results[f"stages.data_service.{name}"] = await measure(
+            lambda: fn(next_kepid()), args.repeats, args.warmup, setup=preprocessor.clear
+        )
+
+    raw_features = np.stack([preprocessor.process(kepid).raw_features for kepid in kepids])
+    normalizer = get_feature_normalizer()
+    for batch_size in BATCH_SIZES:
+        batch = np.resize(raw_features, (batch_size, raw_features.shape[1]))
+        results[f"stages.FeatureNormalizer.normalize[b{batch_size}]"] = await measure(
+            lambda: normalizer.normalize(batch), args.repeats, args.warmup, rows=batch_size
+        )
+
+    results["stages.url_service.get_archive_links"] = await measure(
+        lambda: get_archive_links(next_kepid()), args.repeats, args.warmup
+    )
+
+
+async def benchmark_models(results: dict, model_types: List[str], kepids: List[str], koi_rows: np.ndarray, args):
+    from app.models.model_loader import SERVING_INPUTS, get_model, get_model_backend, get_serving_fn
+    from app.services.lightcurve_preprocessor import get_lightcurve_preprocessor
+
+    preprocessor = get_lightcurve_preprocessor()
+    lightcurves = [preprocessor.process(kepid) for kepid in kepids]
+    for model_type in model_types:
+        if model_type in SERVING_INPUTS:
+            predict = get_serving_fn(model_type)
+            inputs = [np.stack([lc.time_series for lc in lightcurves])]
+            if model_type == "dnn":
+                inputs = [inputs[0][..., 0], np.stack([lc.features[0] for lc in lightcurves])]
+        else:
+            predict = get_model(model_type).predict_proba
+            # Distinct rows: tree traversal gets faster on repeated rows
+            inputs = [koi_rows]
+
+        for batch_size in BATCH_SIZES:
+            # Lightcurve inputs are repeated up to the batch size
+            batch = [np.ascontiguousarray(np.resize(x, (batch_size,) + x.shape[1:])) for x in inputs]
+            result = await measure(lambda: predict(*batch), args.repeats, args.warmup, rows=batch_size)
+            result["backend"] = get_model_backend(model_type)
+            results[f"models.{model_type}.predict[b{batch_size}]"] = result
+
+
+def handler_requests(model_types: List[str], kepids: List[str], koi_kepids: List[str], koi_features: np.ndarray) -> Dict[str, tuple]:
+    """(method, path, payloads) per handler benchmark, shaped like API_REQUEST_EXAMPLES.md."""
+    from app.main import DL_ROUTER_ENABLED
+    from app.services.koi_catalog import get_koi_feature_names
+
+    feature_names = get_koi_feature_names()
+    feature_sets = [dict(zip(feature_names, row)) for row in koi_features.astype(float).tolist()]
+    requests = {}
+    for model_type in model_types:
+        if model_type in ("cnn", "dnn"):
+            requests[f"handlers.dl.predict.{model_type}"] = (
+                "POST", "/api/dl/predict", [{"model": model_type, "kepid": kepid, "predict": True} for kepid in kepids]
+            )
+            continue
+        requests[f"handlers.ml.predict.{model_type}.manual"] = (
+            "POST", "/api/ml/predict",
+            [{"model": model_type, "datasource": "manual", "features": features, "predict": True} for features in feature_sets]
+        )
+        requests[f"handlers.ml.predict.{model_type}.test"] = (
+            "POST", "/api/ml/predict",
+            [{"model": model_type, "datasource": "test", "kepid": kepid, "predict": True} for kepid in koi_kepids]
+        )
+        requests[f"handlers.ml.predict.{model_type}.pre-loaded"] = (
+            "POST", "/api/ml/predict", [{"model": model_type, "datasource": "pre-loaded", "data": "kepler", "predict": True}]
+        )
+        upload = {f"features-target-{i + 1}": features for i, features in enumerate(feature_sets[:3])}
+        requests[f"handlers.ml.predict.{model_type}.upload"] = (
+            "POST", "/api/ml/predict", [{"model": model_type, "datasource": "upload", **upload, "predict": True}]
+        )
+    # /api/dl is only mounted when a CNN/DNN model is enabled
+    if DL_ROUTER_ENABLED:
+        requests["handlers.dl.archive-links"] = ("POST", "/api/dl/archive-links", [{"kepids": kepids}])
+    return requests
+
+
+async def benchmark_handlers(results: dict, client, requests: Dict[str, tuple], args):
+    from app.services.lightcurve_preprocessor import get_lightcurve_preprocessor
+
+    # Without caches, every DL request parses its lightcurve again
+    setup = None if args.with_caches else get_lightcurve_preprocessor().clear
+    for name, (method, path, payloads) in requests.items():
+        next_payload = cycle(payloads)
+        failures = []
+
+        async def call():
+            response = await client.request(method, path, json=next_payload())
+            body = response.json()
+            if response.status_code != 200 or (isinstance(body, dict) and body.get("error")):
+                failures.append(f"{response.status_code}: {body}")
+
+        result = await measure(call, args.repeats, args.warmup, setup=setup)
+        result.update(method=method, path=path, errors=len(failures))
+        if failures:
+            print(f"Warning: {name}: {len(failures)} failed requests, e.g. {failures[0][:200]}", file=sys.stderr)
+        results[name] = result
+
+
+async def run_benchmarks(args) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.models.model_loader import ENABLED_MODELS, get_model_path
+    from app.services.kepid_catalog import get_kepid_catalog
+    from app.services.koi_catalog import get_koi_catalog
+
+    requested = args.models or ENABLED_MODELS
+    model_types = [m for m in requested if m in ENABLED_MODELS and os.path.exists(get_model_path(m))]
+    skipped = sorted(set(requested) - set(model_types))
+    if skipped:
+        print(f"Skipping models that are not enabled or not built: {', '.join(skipped)}", file=sys.stderr)
+
+    kepids = [str(kepid) for kepid in get_kepid_catalog().kepids()[:args.kepids]]
+    koi_catalog = get_koi_catalog()
+    koi_kepids = [str(kepid) for kepid in koi_catalog.kepids[:args.kepids].tolist()]
+    koi_features = koi_catalog.features[:args.kepids]
+
+    results: Dict[str, dict] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Wait for the lifespan preload so model loading is not timed
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+            ready = (await client.get("/health/ready")).json()
+
+            groups = [
+                ("stages", lambda: benchmark_stages(results, kepids, args)),
+                ("models", lambda: benchmark_models(results, model_types, kepids, koi_catalog.features[:max(BATCH_SIZES)], args)),
+                ("handlers", lambda: benchmark_handlers(
+                    results, client, handler_requests(model_types, kepids, koi_kepids, koi_features), args
+                ))
+            ]
+            for group, run_group in groups:
+                if args.only and group not in args.only:
+                    continue
+                start = time.perf_counter()
+                await run_group()
+                print(f"{group}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    return {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": environment_info(),
+        "config": {
+            "repeats": args.repeats,
+            "warmup": args.warmup,
+            "kepids": kepids,
+            "koi_kepids": koi_kepids,
+            "models": model_types,
+            "with_caches": args.with_caches,
+            "startup": ready.get("startup")
+        },
+        "results": results
+    }
+
+
+def run(args) -> int:
+    if not args.with_caches:
+        # Read by the services at import time
+        os.environ.setdefault("EXCHRON_USE_PREDICTION_CACHE", "0")
+        os.environ.setdefault("EXCHRON_USE_PREDICTION_TABLE", "0")
+    if args.models:
+        os.environ["EXCHRON_MODELS"] = ",".join(args.models)
+    # The GB/SVM estimators were fitted on DataFrames and warn on every plain-array call
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    report = asyncio.run(run_benchmarks(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(report['results'])} benchmarks to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+def parse_thresholds(specs: List[str], default: float) -> List[tuple]:
+    """``['0.1', 'handlers.*=0.25']`` -> [(pattern, threshold), ...]; the last matching pattern wins."""
+    thresholds = [("*", default)]
+    for spec in specs:
+        pattern, _, value = spec.rpartition("=")
+        thresholds.append((pattern or "*", float(value)))
+    return thresholds
+
+
+def threshold_for(name: str, thresholds: List[tuple]) -> float:
+    matched = [value for pattern, value in thresholds if fnmatch.fnmatchcase(name, pattern)]
+    return matched[-1]
+
+
+def significant(before: dict, after: dict, alternative: str, alpha: float) -> bool:
+    """Whether ``after``'s timings are stochastically greater/less than ``before``'s (Mann-Whitney U)."""
+    if not before.get("samples_ms") or not after.get("samples_ms"):
+        return True
+    from scipy import stats
+
+    return stats.mannwhitneyu(after["samples_ms"], before["samples_ms"], alternative=alternative).pvalue < alpha
+
+
+def compare(args) -> int:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    thresholds = parse_thresholds(args.threshold, args.default_threshold)
+
+    regressions = []
+    rows = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        before, after = base["results"].get(name), new["results"].get(name)
+        if before is None or after is None:
+            rows.append((name, before, after, None, "added" if before is None else "removed"))
+            continue
+        old, current = before[args.metric], after[args.metric]
+        change = (current - old) / old if old > 0 else 0.0
+        threshold = threshold_for(name, thresholds)
+        if change > threshold and current - old > args.min_delta_ms and significant(before, after, "greater", args.alpha):
+            status = f"REGRESSION (>{threshold:.0%})"
+            regressions.append(name)
+        elif change < -threshold and old - current > args.min_delta_ms and significant(before, after, "less", args.alpha):
+            status = "improved"
+        elif abs(change) > threshold:
+            status = "ok (noise)"
+        else:
+            status = "ok"
+        rows.append((name, old, current, change, status))
+
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"{args.metric}: {args.base} ({base['environment'].get('git_commit')}) -> {args.new} ({new['environment'].get('git_commit')})")
+    for name, old, current, change, status in rows:
+        if change is None:
+            print(f"  {name:<{width}}  {status}")
+            continue
+        print(f"  {name:<{width}}  {old:10.3f} -> {current:10.3f} ms  {change:+7.1%}  {status}")
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the request hot paths")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Time every stage, model and handler; write JSON")
+    run_parser.add_argument("--output", help="JSON file to write (default: stdout)")
+    run_parser.add_argument("--repeats", type=int, default=30, help="Timed calls per benchmark")
+    run_parser.add_argument("--warmup", type=int, default=3, help="Untimed calls before timing")
+    run_parser.add_argument("--kepids", type=int, default=8, help="Fixed Kepler IDs / KOI rows to cycle through")
+    run_parser.add_argument("--models", nargs="+", choices=["cnn", "dnn", "gb", "svm"], help="Default: EXCHRON_MODELS")
+    run_parser.add_argument("--only", nargs="+", choices=["stages", "models", "handlers"], help="Benchmark groups to run")
+    run_parser.add_argument("--with-caches", action="store_true", help="Keep the prediction cache and table enabled")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two runs; exit 1 on a regression")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--metric", choices=METRICS, default="median_ms")
+    compare_parser.add_argument(
+        "--default-threshold", type=float, default=0.10, help="Allowed relative slowdown (default 0.10 = 10%%)"
+    )
+    compare_parser.add_argument(
+        "--threshold", action="append", default=[], metavar="PATTERN=FRACTION",
+        help="Per-benchmark threshold for names matching a glob, e.g. 'handlers.*=0.25' (repeatable)"
+    )
+    compare_parser.add_argument(
+        "--min-delta-ms", type=float, default=0.01, help="Ignore absolute changes smaller than this"
+    )
+    compare_parser.add_argument(
+        "--alpha", type=float, default=0.01, help="Significance level of the Mann-Whitney U test on the raw timings"
+    )
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+Parity checks for the optimized inference paths.
+
+Each check compares an optimized path against the reference implementation
+on the repository's labeled data and exits non-zero if they disagree.
+
+    python -m scripts.check_parity serving [--models cnn dnn] [--atol 1e-5]
+    python -m scripts.check_parity preprocess [--batch-size 256]
+    python -m scripts.check_parity features [--rtol 1e-9]
+    python -m scripts.check_parity numpy [--models cnn dnn] [--atol 1e-5]
+    python -m scripts.check_parity backends [--models cnn dnn] [--max-accuracy-drop 0.01]
+    python -m scripts.check_parity gb [--models gb svm]
+    python -m scripts.check_parity svm [--atol 0.005] [--max-probability-error 0.05]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from app.models.model_loader import (
+    CNN_MODEL_PATH,
+    DNN_MODEL_PATH,
+    SUPPORTED_BACKENDS,
+    ServingFunction,
+    get_model,
+    get_model_path,
+    get_serving_fn
+)
+from app.models.svm_backend import KERNEL_BACKENDS
+from app.services.data_service import TEST_METADATA_PATH
+from app.services.kepid_catalog import get_kepid_catalog
+from app.services.koi_catalog import get_koi_catalog
+from app.services.feature_kernel import FEATURE_NAMES, engineered_features
+from app.services.lightcurve_preprocessor import (
+    clip_outliers,
+    get_lightcurve_preprocessor,
+    pack_flux,
+    preprocess_lightcurve,
+    preprocess_lightcurves
+)
+from app.services.lightcurve_store import get_flux_mtime, load_flux
+
+MODEL_PATHS = {"cnn": CNN_MODEL_PATH, "dnn": DNN_MODEL_PATH}
+
+
+def labeled_kepids() -> list:
+    """Return labeled Kepler IDs from the test metadata that have lightcurve data."""
+    metadata = pd.read_csv(TEST_METADATA_PATH)
+    kepids = []
+    for kepid in metadata["kepid"].astype(str):
+        try:
+            get_flux_mtime(kepid)
+        except FileNotFoundError:
+            continue
+        kepids.append(kepid)
+    return kepids
+
+
+def model_inputs(model_type: str, kepids: list) -> list:
+    """Build batched model inputs for a list of Kepler IDs."""
+    preprocessor = get_lightcurve_preprocessor()
+    lightcurves = [preprocessor.get(kepid) for kepid in kepids]
+    time_series = np.stack([lc.time_series for lc in lightcurves])
+    if model_type == "cnn":
+        return [time_series]
+    features = np.concatenate([lc.features for lc in lightcurves])
+    return [time_series.reshape(len(kepids), -1), features]
+
+
+def labeled_targets(kepids: list) -> np.ndarray:
+    """True where the test metadata labels a Kepler ID as a candidate."""
+    metadata = pd.read_csv(TEST_METADATA_PATH).drop_duplicates("kepid")
+    dispositions = metadata.set_index(metadata["kepid"].astype(str))["koi_disposition"]
+    return dispositions.loc[kepids].isin(["CANDIDATE", "CONFIRMED"]).to_numpy()
+
+
+def candidate_probability(model_type: str, outputs: np.ndarray) -> np.ndarray:
+    """The output column the prediction service reports as the candidate probability."""
+    return outputs[:, 0] if model_type == "cnn" else outputs[:, 1]
+
+
+def report(name: str, expected: np.ndarray, actual: np.ndarray, atol: float) -> bool:
+    diff = np.abs(np.asarray(expected, dtype=np.float64) - np.asarray(actual, dtype=np.float64))
+    ok = bool(diff.max(initial=0.0) <= atol)
+    print(
+        f"{name}: n={len(expected)} max_abs_diff={diff.max(initial=0.0):.3e} "
+        f"mean_abs_diff={diff.mean() if diff.size else 0.0:.3e} atol={atol:g} {'OK' if ok else 'FAIL'}"
+    )
+    return ok
+
+
+def check_serving(args) -> bool:
+    """Compare the compiled serving functions against model.predict."""
+    kepids = labeled_kepids()
+    ok = True
+    for model_type in args.models:
+        if not os.path.exists(MODEL_PATHS[model_type]):
+            print(f"{model_type}: skipped, {MODEL_PATHS[model_type]} not found")
+            continue
+
+        inputs = model_inputs(model_type, kepids)
+        model = get_model(model_type)
+        expected = model.predict(inputs[0] if len(inputs) == 1 else inputs, batch_size=args.batch_size, verbose=0)
+
+        serving_fn = get_serving_fn(model_type)
+        actual = np.concatenate([
+            serving_fn(*[x[i:i + args.batch_size] for x in inputs])
+            for i in range(0, len(kepids), args.batch_size)
+        ])
+        ok &= report(f"{model_type} serving (xla={serving_fn.jit_compile})", expected, actual, args.atol)
+    return ok
+
+
+def check_preprocess(args) -> bool:
+    """Compare batched preprocessing against the single-target path; must be bit-identical."""
+    kepids = [str(kepid) for kepid in get_kepid_catalog().kepids()]
+    mismatches = {"time_series": 0, "raw_features": 0, "features": 0}
+    for i in range(0, len(kepids), args.batch_size):
+        chunk = kepids[i:i + args.batch_size]
+        for kepid, batched in zip(chunk, preprocess_lightcurves(chunk)):
+            single = preprocess_lightcurve(kepid)
+            for name in mismatches:
+                if not np.array_equal(getattr(single, name), getattr(batched, name), equal_nan=True):
+                    mismatches[name] += 1
+
+    ok = not any(mismatches.values())
+    print(f"preprocess: n={len(kepids)} batch_size={args.batch_size} mismatches={mismatches} {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def reference_features(flux_clean: np.ndarray) -> np.ndarray:
+    """The 12 features computed one at a time with NumPy and scipy.stats."""
+    q25, median, q75 = np.quantile(flux_clean, [0.25, 0.5, 0.75])
+    return np.array([
+        flux_clean.mean(), flux_clean.std(ddof=1), stats.skew(flux_clean), stats.kurtosis(flux_clean),
+        flux_clean.min(), flux_clean.max(), flux_clean.max() - flux_clean.min(),
+        median, q25, q75, q75 - q25, np.mean(np.abs(flux_clean - flux_clean.mean()))
+    ], dtype=np.float64)
+
+
+def pandas_features(flux_clean: np.ndarray) -> np.ndarray:
+    """The 12 features as originally computed on a pandas Series."""
+    series = pd.Series(flux_clean)
+    return np.array([
+        series.mean(), series.std(), stats.skew(series), stats.kurtosis(series),
+        series.min(), series.max(), series.max() - series.min(),
+        series.median(), series.quantile(0.25), series.quantile(0.75),
+        series.quantile(0.75) - series.quantile(0.25), np.mean(np.abs(series - series.mean()))
+    ], dtype=np.float64)
+
+
+def check_features(args) -> bool:
+    """Compare the fused feature kernel (single and batched) against scipy/NumPy (exact) and pandas (rtol)."""
+    kepids = [str(kepid) for kepid in get_kepid_catalog().kepids()]
+    fluxes = [clip_outliers(load_flux(kepid)) for kepid in kepids]
+
+    expected = np.stack([reference_features(flux) for flux in fluxes])
+    original = np.stack([pandas_features(flux) for flux in fluxes])
+    single = np.stack([engineered_features(flux) for flux in fluxes])
+    values, lengths = pack_flux(fluxes)
+    batched = engineered_features(values, lengths)
+
+    ok = True
+    for name, actual in (("single", single), ("batched", batched)):
+        differs = ~((expected == actual) | (np.isnan(expected) & np.isnan(actual)))
+        mismatches = {FEATURE_NAMES[j]: int(count) for j, count in enumerate(differs.sum(axis=0)) if count}
+        ok &= not mismatches
+        print(f"features {name} vs scipy/numpy: n={len(kepids)} mismatches={mismatches or 0} {'OK' if not mismatches else 'FAIL'}")
+
+    relative = np.abs(original - batched) / np.maximum(np.abs(original), np.finfo(np.float64).tiny)
+    worst = relative.max(axis=0)
+    pandas_ok = bool(worst.max() <= args.rtol)
+    print(
+        f"features batched vs pandas: max_rel_diff={worst.max():.3e} "
+        f"({FEATURE_NAMES[int(worst.argmax())]}) rtol={args.rtol:g} {'OK' if pandas_ok else 'FAIL'}"
+    )
+    return ok and pandas_ok
+
+
+def time_serving(serving_fn, inputs: list, batch_size: int, repeats: int) -> float:
+    """Median seconds per serving call on the first ``batch_size`` rows."""
+    batch = [x[:batch_size] for x in inputs]
+    serving_fn(*batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        serving_fn(*batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def check_numpy(args) -> bool:
+    """Compare the NumPy forward pass against the Keras model, in batches of several sizes."""
+    kepids = labeled_kepids()
+    ok = True
+    for model_type in args.models:
+        if not os.path.exists(MODEL_PATHS[model_type]):
+            print(f"{model_type}: skipped, {MODEL_PATHS[model_type]} not found")
+            continue
+
+        inputs = model_inputs(model_type, kepids)
+        keras_model = get_model(model_type, "keras")
+        numpy_model = get_model(model_type, "numpy")
+        expected = keras_model.predict(inputs[0] if len(inputs) == 1 else inputs, batch_size=args.batch_size, verbose=0)
+        for batch_size in sorted({1, 7, args.batch_size}):
+            actual = numpy_model.predict(inputs, batch_size=batch_size)
+            ok &= report(f"{model_type} numpy (batch_size={batch_size})", expected, actual, args.atol)
+    return ok
+
+
+def check_backends(args) -> bool:
+    """Accuracy, agreement and latency of each serving backend against the Keras model on the labeled Kepler IDs."""
+    kepids = labeled_kepids()
+    targets = labeled_targets(kepids)
+    ok = True
+    for model_type in args.models:
+        if not os.path.exists(MODEL_PATHS[model_type]):
+            print(f"{model_type}: skipped, {MODEL_PATHS[model_type]} not found")
+            continue
+
+        inputs = model_inputs(model_type, kepids)
+        x = inputs[0] if len(inputs) == 1 else inputs
+        reference = None
+        rows = []
+        for backend in SUPPORTED_BACKENDS[model_type]:
+            path = get_model_path(model_type, backend)
+            if not os.path.exists(path):
+                print(f"{model_type} {backend}: skipped, {path} not found")
+                continue
+
+            # model.predict, so Keras and TFLite both run over the same batches
+            model = get_model(model_type, backend)
+            outputs = model.predict(x, batch_size=args.batch_size, verbose=0)
+            predicted = candidate_probability(model_type, outputs) > 0.5
+            # Latency as served: the compiled function for Keras, the interpreter for TFLite
+            serving_fn = ServingFunction(model_type, model) if backend == "keras" else model
+            if reference is None:
+                reference = (outputs, predicted)
+            diff = np.abs(outputs - reference[0])
+            rows.append({
+                "backend": backend,
+                "size_mb": os.path.getsize(path) / 1e6,
+                "accuracy": float((predicted == targets).mean()),
+                "flips": int((predicted != reference[1]).sum()),
+                "max_abs_diff": float(diff.max()),
+                "mean_abs_diff": float(diff.mean()),
+                "latency_ms": time_serving(serving_fn, inputs, 1, args.repeats) * 1000.0,
+                "rows_per_s": args.batch_size / time_serving(serving_fn, inputs, args.batch_size, args.repeats)
+            })
+
+        print(f"{model_type}: n={len(kepids)} candidates={int(targets.sum())} batch_size={args.batch_size}")
+        print(
+            f"  {'backend':<16}{'size MB':>9}{'accuracy':>10}{'delta':>8}{'flips':>7}"
+            f"{'max diff':>11}{'mean diff':>11}{'b1 ms':>9}{'rows/s':>9}"
+        )
+        acceptable = []
+        for row in rows:
+            delta = row["accuracy"] - rows[0]["accuracy"]
+            within = -delta <= args.max_accuracy_drop
+            ok &= within
+            if within:
+                acceptable.append(row)
+            print(
+                f"  {row['backend']:<16}{row['size_mb']:>9.2f}{row['accuracy']:>10.4f}{delta:>+8.4f}{row['flips']:>7}"
+                f"{row['max_abs_diff']:>11.2e}{row['mean_abs_diff']:>11.2e}{row['latency_ms']:>9.2f}"
+                f"{row['rows_per_s']:>9.0f}{'' if within else '  FAIL'}"
+            )
+        if acceptable:
+            fastest = min(acceptable, key=lambda row: row["latency_ms"])
+            print(
+                f"  fastest within {args.max_accuracy_drop:g} accuracy drop: {fastest['backend']} "
+                f"(EXCHRON_MODEL_BACKENDS={model_type}={fastest['backend']})"
+            )
+    return ok
+
+
+def check_gb(args) -> bool:
+    """Compare the compiled gradient-boosting predictor against scikit-learn on the KOI test data (exact)."""
+    features = get_koi_catalog().features
+    ok = True
+    for model_type in args.models:
+        path = get_model_path(model_type, "compiled")
+        if not os.path.exists(path):
+            print(f"{model_type}: skipped, {path} not found (not gradient boosting, or not compiled)")
+            continue
+
+        reference = get_model(model_type, "sklearn")
+        compiled = get_model(model_type, "compiled")
+        with warnings.catch_warnings():
+            # The estimators were fitted on a DataFrame; the catalog is a plain array
+            warnings.simplefilter("ignore", UserWarning)
+            expected_proba = reference.predict_proba(features)
+            expected_labels = reference.predict(features)
+            sklearn_ms = {
+                batch_size: time_serving(reference.predict_proba, [features], batch_size, args.repeats) * 1000
+                for batch_size in (1, 32, 256)
+            }
+        for batch_size in sorted({1, 7, args.batch_size, len(features)}):
+            batches = range(0, len(features), batch_size)
+            proba = np.concatenate([compiled.predict_proba(features[i:i + batch_size]) for i in batches])
+            labels = np.concatenate([compiled.predict(features[i:i + batch_size]) for i in batches])
+            mismatches = int((proba != expected_proba).any(axis=1).sum())
+            label_mismatches = int((labels != expected_labels).sum())
+            exact = mismatches == 0 and label_mismatches == 0
+            ok &= exact
+            print(
+                f"{model_type} compiled (batch_size={batch_size}): n={len(features)} "
+                f"proba_mismatches={mismatches} label_mismatches={label_mismatches} {'OK' if exact else 'FAIL'}"
+            )
+
+        timings = []
+        for batch_size, reference_ms in sklearn_ms.items():
+            compiled_ms = time_serving(compiled.predict_proba, [features], batch_size, args.repeats) * 1000
+            timings.append(f"b{batch_size} {reference_ms:.3f} -> {compiled_ms:.3f} ms")
+        print(f"  {model_type} predict_proba sklearn -> compiled: {', '.join(timings)}")
+    return ok
+
+
+def check_svm(args) -> bool:
+    """Compare the batched kernel SVM (exact and approximate) against scikit-learn on the KOI test data."""
+    features = get_koi_catalog().features
+    ok = True
+    reference = None
+    for backend in KERNEL_BACKENDS:
+        path = get_model_path("svm", backend)
+        if not os.path.exists(path):
+            print(f"svm {backend}: skipped, {path} not found (not an SVM, or not compiled)")
+            continue
+        if reference is None:
+            reference = get_model("svm", "sklearn")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                expected = reference.predict_proba(features)[:, 1]
+                expected_labels = reference.predict(features)
+                sklearn_ms = {
+                    batch_size: time_serving(reference.predict_proba, [features], batch_size, args.repeats) * 1000
+                    for batch_size in (1, 32, 256, len(features))
+                }
+
+        model = get_model("svm", backend)
+        diff = np.abs(model.predict_proba(features)[:, 1] - expected)
+        flips = int((model.predict(features) != expected_labels).sum())
+        if backend == "kernel":
+            passed = flips == 0 and diff.max() <= args.atol
+            limit = f"atol={args.atol:g}"
+        else:
+            # The error measured at compile time, unless a tighter limit is given
+            bound = model.error["max"] if args.max_probability_error is None else args.max_probability_error
+            passed = diff.max() <= bound + 1e-12
+            limit = f"bound={bound:.3e}"
+        ok &= passed
+        print(
+            f"svm {backend} ({model.method}, {model.metadata['n_components']} of {model.metadata['n_support']} vectors): "
+            f"n={len(features)} max_prob_diff={diff.max():.3e} p99={np.quantile(diff, 0.99):.3e} "
+            f"mean={diff.mean():.3e} decision_flips={flips} {limit} {'OK' if passed else 'FAIL'}"
+        )
+
+        timings = []
+        for batch_size, reference_ms in sklearn_ms.items():
+            model_ms = time_serving(model.predict_proba, [features], batch_size, args.repeats) * 1000
+            timings.append(f"b{batch_size} {reference_ms:.3f} -> {model_ms:.3f} ms")
+        print(f"  predict_proba sklearn -> {backend}: {', '.join(timings)}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check optimized inference paths against the reference")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serving_parser = subparsers.add_parser("serving", help="Compiled Keras serving functions vs model.predict")
+    serving_parser.add_argument("--models", nargs="+", choices=["cnn", "dnn"], default=["cnn", "dnn"])
+    serving_parser.add_argument("--batch-size", type=int, default=32)
+    serving_parser.add_argument("--atol", type=float, default=1e-5)
+    serving_parser.set_defaults(check=check_serving)
+
+    preprocess_parser = subparsers.add_parser("preprocess", help="Batched preprocessing vs preprocess_lightcurve (exact)")
+    preprocess_parser.add_argument("--batch-size", type=int, default=256)
+    preprocess_parser.set_defaults(check=check_preprocess)
+
+    features_parser = subparsers.add_parser("features", help="Fused feature kernel vs scipy/NumPy (exact) and pandas")
+    features_parser.add_argument("--rtol", type=float, default=1e-9)
+    features_parser.set_defaults(check=check_features)
+
+    numpy_parser = subparsers.add_parser("numpy", help="NumPy forward pass vs the Keras model")
+    numpy_parser.add_argument("--models", nargs="+", choices=["cnn", "dnn"], default=["cnn", "dnn"])
+    numpy_parser.add_argument("--batch-size", type=int, default=32)
+    numpy_parser.add_argument("--atol", type=float, default=1e-5)
+    numpy_parser.set_defaults(check=check_numpy)
+
+    backends_parser = subparsers.add_parser(
+        "backends", aliases=["tflite"], help="Every serving backend vs the Keras model: accuracy, agreement, latency"
+    )
+    backends_parser.add_argument("--models", nargs="+", choices=["cnn", "dnn"], default=["cnn", "dnn"])
+    backends_parser.add_argument("--batch-size", type=int, default=32)
+    backends_parser.add_argument("--repeats", type=int, default=20, help="Timed calls per batch size")
+    backends_parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    backends_parser.set_defaults(check=check_backends)
+
+    gb_parser = subparsers.add_parser("gb", help="Compiled gradient-boosting predictor vs scikit-learn (exact)")
+    gb_parser.add_argument("--models", nargs="+", choices=["gb", "svm"], default=["gb", "svm"])
+    gb_parser.add_argument("--batch-size", type=int, default=32)
+    gb_parser.add_argument("--repeats", type=int, default=200, help="Timed calls per batch size")
+    gb_parser.set_defaults(check=check_gb)
+
+    svm_parser = subparsers.add_parser("svm", help="Batched kernel SVM (exact and approximate) vs scikit-learn")
+    svm_parser.add_argument("--atol", type=float, default=5e-3, help="Probability tolerance of the exact kernel backend")
+    svm_parser.add_argument(
+        "--max-probability-error", type=float, default=None,
+        help="Limit for the approximate backend (default: the error measured when it was compiled)"
+    )
+    svm_parser.add_argument("--repeats", type=int, default=20, help="Timed calls per batch size")
+    svm_parser.set_defaults(check=check_svm)
+
+    args = parser.parse_args(argv)
+    sys.exit(0 if args.check(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Fit the DNN feature normalization statistics over the lightcurve store.
+
+Computes the mean and standard deviation of each of the 12 engineered
+features over every stored lightcurve in one streaming pass. Chunks of
+Kepler IDs are preprocessed on a process pool; each worker reduces its
+chunk to (count, mean, M2) per feature and the chunks are merged with
+Chan et al.'s parallel form of Welford's update, so no more than one chunk
+of flux per worker is ever in memory.
+
+The statistics are written to ``FEATURE_STATS_PATH``, which the API loads at
+startup (restart workers to pick up new statistics).
+
+    python -m scripts.fit_feature_stats [--output models/dnn/feature_stats.npz] [--workers N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+
+from app.services.feature_kernel import FEATURE_NAMES, engineered_features
+from app.services.feature_normalizer import FEATURE_STATS_PATH, write_feature_stats
+from app.services.kepid_catalog import get_kepid_catalog
+from app.services.lightcurve_preprocessor import (
+    BATCH_BUCKET_SIZE,
+    PREPROCESSING_VERSION,
+    SIGMA,
+    clip_outliers_batch,
+    pack_flux
+)
+from app.services.lightcurve_store import load_flux
+
+
+class RunningStats:
+    """Per-feature count, mean and sum of squared deviations (M2), mergeable across chunks."""
+
+    def __init__(self, n_features: int = len(FEATURE_NAMES)):
+        self.count = 0
+        self.mean = np.zeros(n_features, dtype=np.float64)
+        self.m2 = np.zeros(n_features, dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "RunningStats":
+        stats = cls(rows.shape[1])
+        stats.count = len(rows)
+        if stats.count:
+            stats.mean = rows.mean(axis=0)
+            stats.m2 = ((rows - stats.mean) ** 2).sum(axis=0)
+        return stats
+
+    def merge(self, other: "RunningStats"):
+        """Combine with another chunk's statistics (Chan et al. pairwise update)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta * delta * (self.count * other.count / count)
+        self.count = count
+
+    def std(self) -> np.ndarray:
+        """Population standard deviation (as StandardScaler); constant features get 1.0."""
+        std = np.sqrt(self.m2 / max(self.count, 1))
+        return np.where(std > 0, std, 1.0)
+
+
+def _chunk_stats(kepids: List[str]) -> Tuple[RunningStats, int]:
+    """Worker entry point: feature statistics for a chunk of Kepler IDs, and how many were skipped."""
+    fluxes = []
+    skipped = 0
+    for kepid in kepids:
+        try:
+            fluxes.append(load_flux(kepid))
+        except Exception:
+            skipped += 1
+    if not fluxes:
+        return RunningStats(), skipped
+
+    values, lengths = pack_flux(fluxes)
+    clean_values, clean_lengths = clip_outliers_batch(values, lengths, SIGMA)
+    features = engineered_features(clean_values, clean_lengths)
+
+    # Near-constant lightcurves have undefined skewness/kurtosis
+    finite = np.isfinite(features).all(axis=1)
+    return RunningStats.from_rows(features[finite]), skipped + int((~finite).sum())
+
+
+def fit_feature_stats(workers: int, chunk_size: int) -> Tuple[RunningStats, int]:
+    """Stream every stored lightcurve through the feature kernel and accumulate per-feature statistics."""
+    catalog = get_kepid_catalog()
+    # Sorting by length keeps each chunk's padded batch small
+    kepids = sorted(
+        (str(kepid) for kepid in catalog.kepids()),
+        key=lambda kepid: catalog.get_entry(kepid)["n_cadences"] or 0
+    )
+    chunks = [kepids[i:i + chunk_size] for i in range(0, len(kepids), chunk_size)]
+
+    total = RunningStats()
+    skipped = 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for done, (stats, chunk_skipped) in enumerate(executor.map(_chunk_stats, chunks), 1):
+            total.merge(stats)
+            skipped += chunk_skipped
+            if done % 10 == 0 or done == len(chunks):
+                print(f"  {total.count + skipped}/{len(kepids)} lightcurves")
+    return total, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit DNN feature normalization statistics over the lightcurve store")
+    parser.add_argument("--output", default=FEATURE_STATS_PATH, help="Feature stats path (.npz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Preprocessing processes")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_BUCKET_SIZE, help="Lightcurves per job")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats, skipped = fit_feature_stats(args.workers, args.chunk_size)
+    if stats.count == 0:
+        raise SystemExit("No lightcurves could be processed")
+    means, stds = stats.mean, stats.std()
+
+    write_feature_stats(args.output, means, stds, {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "n_samples": stats.count,
+        "n_skipped": skipped,
+        "preprocessing_version": PREPROCESSING_VERSION,
+        "sigma": SIGMA
+    })
+    print(f"{stats.count} lightcurves ({skipped} skipped) in {time.perf_counter() - start:.1f}s")
+    for name, mean, std in zip(FEATURE_NAMES, means, stds):
+        print(f"  {name:>9}: mean={mean: .6g} std={std:.6g}")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Concurrent load generator for the prediction endpoints.
+
+Replays the request shapes from ``API_REQUEST_EXAMPLES.md`` against the
+in-process FastAPI app (over httpx's ASGI transport) or a running server
+(``--url``), ramping through the given concurrency levels:
+
+- ``POST /api/dl/predict`` for each ready CNN/DNN model, with random Kepler
+  IDs from the target's ``/api/dl/available-ids``
+- ``POST /api/ml/predict`` for each ready GB/SVM model: ``manual`` and
+  ``upload`` (three targets) with random rows of
+  ``KOI-Playground-Test-Data.csv``, ``test`` with their Kepler IDs, and
+  ``pre-loaded``
+
+At each level, ``--concurrency`` workers send requests back to back for
+``--duration`` seconds. The report gives throughput, p50/p95/p99 latency, a
+latency histogram and the error rate (non-200 statuses, ``{"error": ...}``
+bodies and transport errors) for each endpoint, model and request shape:
+
+    python -m scripts.load_test [--url http://localhost:8000] [--concurrency 1 4 16 64] [--duration 10]
+        [--models cnn gb] [--endpoints dl ml] [--output load.json]
+
+The in-process app runs with this process's ``EXCHRON_*`` settings; pass
+``--no-caches`` to bypass the prediction cache and table there. A running
+server keeps its own configuration.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import warnings
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Upper bucket edges of the latency histogram, in milliseconds (plus an overflow bucket)
+HISTOGRAM_EDGES_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+DL_MODELS = ["cnn", "dnn"]
+ML_MODELS = ["gb", "svm"]
+ML_SHAPES = ["manual", "test", "pre-loaded", "upload"]
+UPLOAD_TARGETS = 3
+
+
+class Scenario:
+    """One request shape: endpoint, model and a payload builder."""
+
+    def __init__(self, path: str, model: str, shape: str, build: Callable[[random.Random], dict]):
+        self.path = path
+        self.model = model
+        self.shape = shape
+        self.build = build
+
+    @property
+    def key(self) -> str:
+        return f"POST {self.path} {self.model} {self.shape}"
+
+
+def build_scenarios(models: List[str], endpoints: List[str], kepids: List[str], koi_kepids: List[str], feature_sets: List[dict]) -> List[Scenario]:
+    scenarios = []
+    if "dl" in endpoints:
+        for model in [m for m in models if m in DL_MODELS]:
+            scenarios.append(Scenario(
+                "/api/dl/predict", model, "kepid",
+                lambda rng, model=model: {"model": model, "kepid": rng.choice(kepids), "predict": True}
+            ))
+    if "ml" in endpoints:
+        for model in [m for m in models if m in ML_MODELS]:
+            builders = {
+                "manual": lambda rng, model=model: {
+                    "model": model, "datasource": "manual", "features": rng.choice(feature_sets), "predict": True
+                },
+                "test": lambda rng, model=model: {
+                    "model": model, "datasource": "test", "kepid": rng.choice(koi_kepids), "predict": True
+                },
+                "pre-loaded": lambda rng, model=model: {
+                    "model": model, "datasource": "pre-loaded", "data": "kepler", "predict": True
+                },
+                "upload": lambda rng, model=model: {
+                    "model": model, "datasource": "upload", "predict": True,
+                    **{f"features-target-{i + 1}": features for i, features in enumerate(rng.sample(feature_sets, UPLOAD_TARGETS))}
+                }
+            }
+            scenarios.extend(Scenario("/api/ml/predict", model, shape, builders[shape]) for shape in ML_SHAPES)
+    return scenarios
+
+
+def scenario_weights(scenarios: List[Scenario]) -> List[float]:
+    """Equal traffic per endpoint, split equally between its models, then between their request shapes."""
+    per_endpoint = defaultdict(set)
+    per_model = defaultdict(int)
+    for scenario in scenarios:
+        per_endpoint[scenario.path].add(scenario.model)
+        per_model[(scenario.path, scenario.model)] += 1
+    return [
+        1.0 / len(per_endpoint) / len(per_endpoint[s.path]) / per_model[(s.path, s.model)]
+        for s in scenarios
+    ]
+
+
+def histogram(latencies_ms: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, latencies_ms, side="left"), minlength=len(HISTOGRAM_EDGES_MS) + 1)
+    labels = [f"<={edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}ms"]
+    return dict(zip(labels, counts.tolist()))
+
+
+def summarize(samples: List[Tuple[float, Optional[str]]], seconds: float) -> dict:
+    """Throughput, latency percentiles, histogram and errors of one group's (latency, error) samples."""
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    errors = defaultdict(int)
+    for _, error in samples:
+        if error is not None:
+            errors[error] += 1
+    n_errors = sum(errors.values())
+    return {
+        "requests": len(samples),
+        "errors": n_errors,
+        "error_rate": n_errors / len(samples),
+        "error_kinds": dict(errors),
+        "throughput_rps": len(samples) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "max_ms": float(latencies.max()),
+        "histogram": histogram(latencies)
+    }
+
+
+async def send(client, scenario: Scenario, rng: random.Random) -> Tuple[float, Optional[str]]:
+    """Send one request; returns (seconds, error kind or None)."""
+    import httpx
+
+    payload = scenario.build(rng)
+    start = time.perf_counter()
+    try:
+        response = await client.post(scenario.path, json=payload)
+    except httpx.HTTPError as e:
+        return time.perf_counter() - start, type(e).__name__
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        return elapsed, f"HTTP {response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return elapsed, "invalid JSON"
+    # Handlers report some failures as a 200 with an ErrorResponse body
+    if isinstance(body, dict) and body.get("error"):
+        return elapsed, "error response"
+    return elapsed, None
+
+
+async def run_level(client, scenarios: List[Scenario], weights: List[float], concurrency: int, duration: float, rng: random.Random) -> dict:
+    samples: Dict[str, list] = defaultdict(list)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            samples[scenario.key].append(await send(client, scenario, rng))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    groups = {key: summarize(group, seconds) for key, group in sorted(samples.items())}
+    all_samples = [sample for group in samples.values() for sample in group]
+    return {"concurrency": concurrency, "seconds": seconds, "total": summarize(all_samples, seconds), "groups": groups}
+
+
+def print_level(level: dict):
+    total = level["total"]
+    print(
+        f"\nconcurrency {level['concurrency']}: {total['requests']} requests in {level['seconds']:.1f}s, "
+        f"{total['throughput_rps']:.1f} req/s, p50 {total['p50_ms']:.1f} ms, p95 {total['p95_ms']:.1f} ms, "
+        f"p99 {total['p99_ms']:.1f} ms, errors {total['error_rate']:.1%}"
+    )
+    width = max(len(key) for key in level["groups"])
+    print(f"  {'endpoint model shape':<{width}}  {'req':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for key, group in level["groups"].items():
+        print(
+            f"  {key:<{width}}  {group['requests']:6d} {group['throughput_rps']:7.1f} {group['p50_ms']:8.1f} "
+            f"{group['p95_ms']:8.1f} {group['p99_ms']:8.1f} {group['error_rate']:7.1%}"
+        )
+        buckets = " ".join(f"{label}:{count}" for label, count in group["histogram"].items() if count)
+        print(f"  {'':<{width}}  histogram {buckets}")
+        if group["error_kinds"]:
+            print(f"  {'':<{width}}  errors {dict(group['error_kinds'])}")
+
+
+async def fetch_kepids(client, limit: int = 1000) -> List[str]:
+    """Every Kepler ID the target can predict on, paging through /api/dl/available-ids."""
+    kepids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        body = (await client.get("/api/dl/available-ids", params=params)).json()
+        kepids.extend(str(entry["kepid"]) for entry in body.get("sample_ids", []))
+        cursor = body.get("next_cursor")
+        if not cursor:
+            return kepids
+
+
+async def wait_until_ready(client, timeout: float) -> dict:
+    deadline = time.perf_counter() + timeout
+    while True:
+        response = await client.get("/health/ready")
+        if response.status_code == 200:
+            return response.json()
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Target not ready after {timeout:.0f}s: {response.text[:500]}")
+        await asyncio.sleep(0.1)
+
+
+async def load_test(client, args) -> dict:
+    from app.services.koi_catalog import KOI_TEST_DATA_PATH, KOICatalog
+
+    ready = await wait_until_ready(client, args.ready_timeout)
+    ready_models = [model for model, status in ready.get("models", {}).items() if status.get("state") == "ready"]
+    models = [model for model in (args.models or ready_models) if model in ready_models]
+    skipped = sorted(set(args.models or []) - set(models))
+    if skipped:
+        print(f"Skipping models the target has not loaded: {', '.join(skipped)}", file=sys.stderr)
+
+    kepids = await fetch_kepids(client) if "dl" in args.endpoints else []
+    koi = KOICatalog(KOI_TEST_DATA_PATH)
+    feature_sets = [dict(zip(koi.feature_names, row)) for row in koi.features.astype(float).tolist()]
+    koi_kepids = [str(kepid) for kepid in koi.kepids.tolist()]
+
+    scenarios = build_scenarios(models, args.endpoints, kepids, koi_kepids, feature_sets)
+    if not scenarios:
+        raise SystemExit("No request shapes to send: no matching model is ready on the target")
+    weights = scenario_weights(scenarios)
+    rng = random.Random(args.seed)
+
+    # One untimed request per shape, so first-use costs are not in the first level
+    for scenario in scenarios:
+        await send(client, scenario, rng)
+
+    levels = []
+    for concurrency in args.concurrency:
+        level = await run_level(client, scenarios, weights, concurrency, args.duration, rng)
+        print_level(level)
+        levels.append(level)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "models": models,
+            "endpoints": args.endpoints,
+            "seed": args.seed,
+            "kepids": len(kepids),
+            "koi_rows": len(koi_kepids)
+        },
+        "histogram_edges_ms": HISTOGRAM_EDGES_MS,
+        "levels": levels
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+
+    timeout = httpx.Timeout(args.timeout)
+    # Enough pooled connections for the largest level
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            return await load_test(client, args)
+
+    from app.main import app
+
+    # The in-process app shares this process's warning filters
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout, limits=limits) as client:
+            return await load_test(client, args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp concurrent load on the prediction endpoints and report latency percentiles")
+    parser.add_argument("--url", help="Base URL of a running server (default: the in-process app)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64], help="Concurrent clients per level")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--models", nargs="+", choices=DL_MODELS + ML_MODELS, help="Default: every model the target has ready")
+    parser.add_argument("--endpoints", nargs="+", choices=["dl", "ml"], default=["dl", "ml"])
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Seconds to wait for /health/ready")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-caches", action="store_true", help="In-process only: bypass the prediction cache and table")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.url is None:
+        # Read by the services at import time
+        if args.no_caches:
+            os.environ.setdefault("EXCHRON_USE_PREDICTION_CACHE", "0")
+            os.environ.setdefault("EXCHRON_USE_PREDICTION_TABLE", "0")
+        if args.models:
+            os.environ["EXCHRON_MODELS"] = ",".join(args.models)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
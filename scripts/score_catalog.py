@@ -0,0 +1,217 @@
+"""
+Offline batch scoring of the whole catalog.
+
+Scores every Kepler ID with lightcurve data (CNN/DNN) and every Kepler ID in
+the KOI test data (GB/SVM), and writes the results to the prediction table
+the API serves from (see ``app.services.prediction_table``).
+
+Lightcurves are preprocessed in chunks with the batched kernels on a process
+pool using all cores. Results are prefetched ahead of the model so parsing and inference overlap, and then
+collected into fixed-size batches for the compiled serving functions.
+
+    python -m scripts.score_catalog [--models cnn dnn gb svm] [--output data/prediction_table.npz]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from app.models.model_loader import get_model, get_model_backend, get_model_hash, get_model_path, get_serving_fn
+from app.services.feature_normalizer import get_feature_normalizer
+from app.services.kepid_catalog import get_kepid_catalog
+from app.services.koi_catalog import KOI_TEST_DATA_PATH, get_koi_catalog
+from app.services.lightcurve_store import get_lightcurve_store
+from app.services.lightcurve_preprocessor import (
+    BATCH_BUCKET_SIZE,
+    PREPROCESSING_VERSION,
+    SIGMA,
+    TARGET_LENGTH,
+    preprocess_lightcurves
+)
+from app.services.prediction_table import PREDICTION_TABLE_PATH, PredictionTable, write_prediction_table
+
+DL_MODELS = ["cnn", "dnn"]
+ML_MODELS = ["gb", "svm"]
+
+
+def _preprocess(kepids: List[str]) -> List[tuple]:
+    """Worker entry point: model inputs for a chunk of Kepler IDs, or the error message for each."""
+    results = []
+    for kepid, lightcurve in zip(kepids, preprocess_lightcurves(kepids)):
+        if isinstance(lightcurve, Exception):
+            results.append((kepid, None, None, str(lightcurve)))
+        else:
+            results.append((kepid, lightcurve.time_series, lightcurve.features[0], None))
+    return results
+
+
+def prefetch(executor: Executor, fn: Callable, items: Iterable, depth: int) -> Iterator:
+    """Map ``fn`` over ``items`` on ``executor``, keeping up to ``depth`` jobs in flight; yields in order."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _dl_probabilities(model_type: str, outputs: np.ndarray) -> np.ndarray:
+    """Model outputs -> (N, 2) [non_candidate, candidate], computed as the API does."""
+    outputs = outputs.astype(np.float64)
+    if model_type == "cnn":
+        # Sigmoid output: single candidate probability
+        return np.stack([1.0 - outputs[:, 0], outputs[:, 0]], axis=1)
+    # Softmax output: [non_candidate, candidate]
+    return outputs[:, :2]
+
+
+def score_lightcurves(
+    model_types: List[str],
+    batch_size: int,
+    workers: int,
+    prefetch_depth: int,
+    chunk_size: int = BATCH_BUCKET_SIZE
+) -> Dict[str, tuple]:
+    """Score every lightcurve Kepler ID with the given DL models; each target is preprocessed once."""
+    kepids = [str(kepid) for kepid in get_kepid_catalog().kepids()]
+    serving_fns = {model_type: get_serving_fn(model_type) for model_type in model_types}
+    scored: List[int] = []
+    probabilities = {model_type: [] for model_type in model_types}
+    failed = 0
+
+    def run_batch(batch: list):
+        time_series = np.stack([item[1] for item in batch])
+        features = np.stack([item[2] for item in batch])
+        for model_type, serving_fn in serving_fns.items():
+            if model_type == "cnn":
+                outputs = serving_fn(time_series)
+            else:
+                outputs = serving_fn(time_series.reshape(len(batch), -1), features)
+            probabilities[model_type].append(_dl_probabilities(model_type, outputs))
+        scored.extend(int(item[0]) for item in batch)
+        print(f"  lightcurves: {len(scored)}/{len(kepids)} scored")
+
+    start = time.perf_counter()
+    # Spawned workers do not inherit TensorFlow's threads from this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        chunks = [kepids[i:i + chunk_size] for i in range(0, len(kepids), chunk_size)]
+        batch = []
+        for chunk in prefetch(executor, _preprocess, chunks, prefetch_depth):
+            for result in chunk:
+                if result[3] is not None:
+                    failed += 1
+                    print(f"Warning: Skipping Kepler ID {result[0]}: {result[3]}")
+                    continue
+                batch.append(result)
+                if len(batch) == batch_size:
+                    run_batch(batch)
+                    batch = []
+        if batch:
+            run_batch(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"lightcurves: {len(scored)} scored, {failed} failed in {elapsed:.1f}s ({len(scored) / max(elapsed, 1e-9):.0f}/s)")
+    empty = np.empty((0, 2), dtype=np.float64)
+    return {
+        model_type: (np.asarray(scored, dtype=np.int64), np.concatenate(chunks) if chunks else empty, failed)
+        for model_type, chunks in probabilities.items()
+    }
+
+
+def score_koi_catalog(model_types: List[str], batch_size: int) -> Dict[str, tuple]:
+    """Score the first KOI row of every Kepler ID in the KOI test data (as the test datasource does)."""
+    catalog = get_koi_catalog()
+    kepids, rows = np.unique(catalog.kepids, return_index=True)
+    features = catalog.features[rows]
+
+    results = {}
+    for model_type in model_types:
+        start = time.perf_counter()
+        model = get_model(model_type)
+        probabilities = np.concatenate([
+            model.predict_proba(features[i:i + batch_size]) for i in range(0, len(features), batch_size)
+        ])
+        print(f"{model_type}: {len(kepids)} scored in {time.perf_counter() - start:.2f}s")
+        results[model_type] = (kepids, probabilities, 0)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the whole catalog and write the prediction table")
+    parser.add_argument("--models", nargs="+", choices=DL_MODELS + ML_MODELS, default=DL_MODELS + ML_MODELS)
+    parser.add_argument("--output", default=PREDICTION_TABLE_PATH, help="Prediction table path (.npz)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per model call")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Preprocessing processes")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_BUCKET_SIZE, help="Lightcurves per preprocessing job")
+    parser.add_argument("--prefetch", type=int, default=None, help="Preprocessing jobs in flight (default 4 x workers)")
+    args = parser.parse_args(argv)
+
+    models = []
+    for model_type in args.models:
+        if os.path.exists(get_model_path(model_type)):
+            models.append(model_type)
+        else:
+            print(f"{model_type}: skipped, {get_model_path(model_type)} not found")
+    if not models:
+        print("No models to score")
+        sys.exit(1)
+
+    # Keep scores for models not rescored in this run
+    scores, model_info = {}, {}
+    if os.path.exists(args.output):
+        try:
+            previous = PredictionTable(args.output)
+            for model_type in previous.models:
+                if model_type not in models:
+                    scores[model_type] = previous.scores(model_type)
+                    model_info[model_type] = previous.metadata["models"][model_type]
+        except Exception as e:
+            print(f"Warning: Not merging with existing table {args.output}: {e}")
+
+    results: Dict[str, Tuple[np.ndarray, np.ndarray, int]] = {}
+    dl_models = [m for m in models if m in DL_MODELS]
+    ml_models = [m for m in models if m in ML_MODELS]
+    if dl_models:
+        results.update(score_lightcurves(dl_models, args.batch_size, args.workers, args.prefetch or 4 * args.workers, args.chunk_size))
+    if ml_models:
+        results.update(score_koi_catalog(ml_models, args.batch_size))
+
+    # Lightcurve scores are served only for targets in this store build (none when scored from CSVs)
+    store = get_lightcurve_store()
+    lightcurve_fingerprint = store.fingerprint if store is not None else None
+    for model_type, (kepids, probabilities, failed) in results.items():
+        scores[model_type] = (kepids, probabilities)
+        model_info[model_type] = {
+            "model_hash": get_model_hash(model_type),
+            "model_path": get_model_path(model_type),
+            "backend": get_model_backend(model_type),
+            "source": "lightcurves" if model_type in DL_MODELS else KOI_TEST_DATA_PATH,
+            "data_fingerprint": lightcurve_fingerprint if model_type in DL_MODELS else get_koi_catalog().fingerprint,
+            "n_scored": int(len(kepids)),
+            "n_failed": int(failed)
+        }
+        if model_type in DL_MODELS:
+            model_info[model_type]["preprocessing_version"] = PREPROCESSING_VERSION
+        if model_type == "dnn":
+            model_info[model_type]["feature_stats"] = get_feature_normalizer().fingerprint
+
+    write_prediction_table(args.output, scores, {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "preprocessing": {"target_length": TARGET_LENGTH, "sigma": SIGMA},
+        "models": model_info
+    })
+    print(f"Wrote {args.output} ({', '.join(f'{m}: {len(scores[m][0])}' for m in scores)})")
+
+
+if __name__ == "__main__":
+    main()